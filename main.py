@@ -12,6 +12,9 @@ sys.path.append(str(Path(__file__).parent))
 
 from scripts.train import main as train_main
 from scripts.prepare_dataset import main as prepare_main
+from yolo_detector.data_utils import LINK_MODES, SPLIT_METHODS
+from yolo_detector.training import SAMPLING_MODES
+from yolo_detector.profiles import PROFILES, parse_overrides
 
 def main():
     parser = argparse.ArgumentParser(description='Manga Bubble Detector')
@@ -21,13 +24,79 @@ def main():
                       help='Input directory for prepare mode (default: data/raw)')
     parser.add_argument('--output', type=str, default='data',
                       help='Output directory for prepare mode (default: data)')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Threads used to read label files and copy files (default: automatic)',
+    )
+    parser.add_argument(
+        '--link_mode',
+        type=str,
+        default='auto',
+        choices=LINK_MODES,
+        help='How prepare mode materializes samples: copy, hardlink, symlink, '
+        'reflink, auto, or manifest to only write list files of '
+        'absolute image paths (default: auto)',
+    )
+    parser.add_argument('--sampling', type=str, default='none', choices=SAMPLING_MODES,
+                      help='Class-balanced sampling for train mode: repeat oversamples '
+                           'images holding rare classes (default: none)')
+    parser.add_argument(
+        '--profile',
+        type=str,
+        default='auto',
+        help=f'Training profile for train mode, one of {", ".join(PROFILES)} '
+        'or a YAML file (default: auto)',
+    )
+    parser.add_argument(
+        '--set',
+        dest='overrides',
+        nargs='*',
+        default=[],
+        metavar='KEY=VALUE',
+        help='Training settings overriding the profile, e.g. batch=8 cache=disk',
+    )
+    parser.add_argument(
+        '--split_method',
+        type=str,
+        default='greedy',
+        choices=SPLIT_METHODS,
+        help='Stratification algorithm for prepare mode; iterative places '
+        'rare classes first for a closer balance (default: greedy)',
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='In prepare mode, only process new or changed pages and keep '
+        'the existing train/val split',
+    )
+    parser.add_argument(
+        '--resize_cache',
+        action='store_true',
+        help='In train mode, train on a copy of the dataset pre-resized to '
+        'the training image size',
+    )
     
     args = parser.parse_args()
     
     if args.mode == 'prepare':
-        prepare_main(args.input, args.output)
+        prepare_main(
+            args.input,
+            args.output,
+            args.workers,
+            args.link_mode,
+            args.incremental,
+            split_method=args.split_method,
+        )
     elif args.mode == 'train':
-        train_main()
+        train_main(
+            args.workers,
+            args.sampling,
+            profile=args.profile,
+            overrides=parse_overrides(args.overrides),
+            resize_cache=args.resize_cache,
+        )
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
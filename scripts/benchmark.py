@@ -0,0 +1,411 @@
+"""
+Micro-benchmarks for the dataset and detection pipeline.
+
+Usage:
+    python scripts/benchmark.py split --sizes 1000 10000 100000
+    python scripts/benchmark.py postprocess --sizes 1 100 1000
+    python scripts/benchmark.py overlaps --sizes 100 300 1000
+    python scripts/benchmark.py rules --sizes 10000 1000000 --extra_rules 8
+    python scripts/benchmark.py draw --width 4000 --height 6000
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import statistics
+import argparse
+import tempfile
+from types import SimpleNamespace
+from pathlib import Path
+import numpy as np
+
+# Add the parent directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from yolo_detector.data_utils import SPLIT_METHODS, stratified_split
+from yolo_detector.labels import scan_labels
+from yolo_detector.splits import split_balance
+from yolo_detector.postprocessing import (
+    CLASS_PRIORITY,
+    DEFAULT_RULES,
+    apply_post_processing_rules,
+    apply_rules,
+    compile_rules,
+    suppress_overlaps
+)
+from yolo_detector.inference import draw_detections, draw_detections_on_image
+from yolo_detector.detections import Detections
+
+def make_synthetic_dataset(root: str, n_images: int, seed: int = 0) -> tuple:
+    """
+    Write *n_images* empty images and random YOLO label files under *root*.
+
+    Class frequencies are skewed so that ``other`` and ``ui`` stay rare, like
+    in the real corpus.
+
+    Returns:
+        Tuple of (images_dir, labels_dir)
+    """
+    rng = random.Random(seed)
+    images_dir = os.path.join(root, "raw_images")
+    labels_dir = os.path.join(root, "raw_labels")
+    os.makedirs(images_dir, exist_ok=True)
+    os.makedirs(labels_dir, exist_ok=True)
+    for i in range(n_images):
+        name = f"page_{i:06d}"
+        open(os.path.join(images_dir, name + ".jpg"), "wb").close()
+        lines = []
+        for _ in range(rng.randint(1, 12)):
+            cls = rng.choices(range(5), weights=(40, 10, 2, 45, 3))[0]
+            w, h = rng.uniform(0.02, 0.3), rng.uniform(0.02, 0.3)
+            cx, cy = rng.uniform(w / 2, 1 - w / 2), rng.uniform(h / 2, 1 - h / 2)
+            lines.append(f"{cls} {cx:.6f} {cy:.6f} {w:.6f} {h:.6f}\n")
+        with open(os.path.join(labels_dir, name + ".txt"), "w") as f:
+            f.writelines(lines)
+    return images_dir, labels_dir
+
+def bench_split(args):
+    print(f"{'files':>7} {'method':>9} {'time':>9} {'train':>7} {'val':>7} "
+          f"{'other err':>9} {'ui err':>8} {'max err':>8}")
+    for n in args.sizes:
+        root = tempfile.mkdtemp(prefix="bench_split_")
+        try:
+            images_dir, labels_dir = make_synthetic_dataset(root, n)
+            table = scan_labels(labels_dir, cache=True)
+            for method in args.methods:
+                start = time.perf_counter()
+                train_files, val_files, _ = stratified_split(images_dir, labels_dir,
+                                                             cache=True, method=method)
+                elapsed = time.perf_counter() - start
+                files = train_files + val_files
+                balance = split_balance(
+                    table.presence([os.path.splitext(f)[0] for f in files]),
+                    np.arange(len(files)) >= len(train_files),
+                    0.2,
+                )
+                error = balance["error"]
+                print(f"{n:>7} {method:>9} {elapsed:>8.3f}s {len(train_files):>7} "
+                      f"{len(val_files):>7} {error[2]:>+9.4f} {error[4]:>+8.4f} "
+                      f"{balance['max_error']:>8.4f}")
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+def make_fake_results(n_boxes: int, n_images: int = 1, seed: int = 0) -> list:
+    """
+    Build objects shaped like Ultralytics ``Results`` holding random boxes.
+    """
+    import torch
+
+    gen = torch.Generator().manual_seed(seed)
+    results = []
+    for _ in range(n_images):
+        xy = torch.rand(n_boxes, 2, generator=gen) * 1000
+        wh = torch.rand(n_boxes, 2, generator=gen) * 200 + 1
+        boxes = SimpleNamespace(
+            xyxy=torch.cat([xy, xy + wh], dim=1),
+            conf=torch.rand(n_boxes, generator=gen),
+            cls=torch.randint(0, 5, (n_boxes,), generator=gen).float(),
+        )
+        results.append(SimpleNamespace(boxes=boxes))
+    return results
+
+def legacy_post_processing_rules(results):
+    """The original box-by-box implementation, kept as a baseline."""
+    all_processed = []
+    for result in results:
+        processed_results = []
+        for box, conf, cls in zip(
+            result.boxes.xyxy, result.boxes.conf, result.boxes.cls
+        ):
+            x1, y1, x2, y2 = box.tolist()
+            conf = conf.item()
+            cls = int(cls.item())
+            width = x2 - x1
+            height = y2 - y1
+            aspect_ratio = width / height if height else 0
+            if 0.9 < aspect_ratio < 1.1 and cls == 0 and conf < 0.9:
+                cls = 1
+            if width / height > 3.0 and cls != 3 and conf < 0.85:
+                cls = 3
+            processed_results.append(
+                {
+                    'x': x1,
+                    'y': y1,
+                    'width': width,
+                    'height': height,
+                    'confidence': conf,
+                    'class': cls,
+                }
+            )
+        all_processed.append(processed_results)
+    return all_processed
+
+def time_call(func, repeats: int) -> float:
+    """Median wall time of ``func()`` over *repeats* calls, in seconds."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def bench_postprocess(args):
+    print(f"{'boxes':>6} {'legacy':>10} {'arrays':>10} {'dicts':>10} {'speedup':>8}")
+    for n in args.sizes:
+        results = make_fake_results(n)
+        legacy = time_call(lambda: legacy_post_processing_rules(results), args.repeats)
+        # The legacy rules never resolved overlaps, see the overlaps command
+        arrays = time_call(lambda: apply_post_processing_rules(results, overlaps=None),
+                           args.repeats)
+        dicts = time_call(lambda: apply_post_processing_rules(results, as_dicts=True,
+                                                              overlaps=None),
+                          args.repeats)
+        print(f"{n:>6} {legacy * 1e3:>8.3f}ms {arrays * 1e3:>8.3f}ms "
+              f"{dicts * 1e3:>8.3f}ms {legacy / arrays:>7.1f}x")
+
+def fixed_rules(xyxy, conf, cls):
+    """The hardcoded vectorized rules the rule engine replaced, as a baseline."""
+    width = xyxy[:, 2] - xyxy[:, 0]
+    height = xyxy[:, 3] - xyxy[:, 1]
+    aspect_ratio = np.divide(width, height, out=np.zeros_like(width), where=height != 0)
+    cls = np.where(
+        (aspect_ratio > 0.9) & (aspect_ratio < 1.1) & (cls == 0) & (conf < 0.9), 1, cls
+    )
+    cls = np.where((aspect_ratio > 3.0) & (cls != 3) & (conf < 0.85), 3, cls)
+    return np.stack([xyxy[:, 0], xyxy[:, 1], width, height], axis=1), conf, cls
+
+def bench_rules(args):
+    # Extra rules that never fire, so every configuration keeps all boxes
+    extra = [{"name": f"extra_{i}", "when": {"cls": [i % 5], "area": {"lt": -1.0}},
+              "set_cls": (i + 1) % 5} for i in range(args.extra_rules)]
+    configs = {
+        "default": compile_rules(),
+        f"+{args.extra_rules} rules": compile_rules(
+            {"rules": DEFAULT_RULES["rules"] + extra}
+        ),
+    }
+    print(f"{'boxes':>9} {'fixed':>14} " + " ".join(f"{name:>14}" for name in configs)
+          + "   (boxes/s)")
+    for n in args.sizes:
+        rng = np.random.default_rng(0)
+        xy = rng.random((n, 2), dtype=np.float32) * 1000
+        xyxy = np.concatenate(
+            [xy, xy + rng.random((n, 2), dtype=np.float32) * 200 + 1], axis=1
+        )
+        conf = rng.random(n, dtype=np.float32)
+        cls = rng.integers(0, 5, n)
+        repeats = max(3, args.repeats * 10_000 // n)
+        fixed = time_call(lambda: fixed_rules(xyxy, conf, cls), repeats)
+        rates = [n / time_call(lambda: apply_rules(xyxy, conf, cls, rules), repeats)
+                 for rules in configs.values()]
+        print(f"{n:>9} {n / fixed:>14,.0f} " + " ".join(f"{r:>14,.0f}" for r in rates))
+
+def make_overlapping_detections(n_boxes: int, seed: int = 0) -> Detections:
+    """
+    Struct-of-arrays detections where boxes come in clusters of near
+    duplicates with mixed classes, as after relabelling.
+    """
+    rng = np.random.default_rng(seed)
+    n_objects = max(1, n_boxes // 4)
+    centres = rng.random((n_objects, 2)) * 2000
+    sizes = rng.random((n_objects, 2)) * 200 + 30
+    obj = rng.integers(0, n_objects, n_boxes)
+    xy = centres[obj] + rng.normal(0, 6, (n_boxes, 2))
+    wh = sizes[obj] + rng.normal(0, 6, (n_boxes, 2))
+    return Detections(np.concatenate([xy, np.abs(wh)], axis=1), rng.random(n_boxes),
+                      rng.integers(0, 5, n_boxes))
+
+def pairwise_suppress_overlaps(detections: Detections, threshold: float = 0.6) -> list:
+    """Box-by-box class-priority suppression, kept as a baseline."""
+    rank = {c: i for i, c in enumerate(CLASS_PRIORITY)}
+    boxes = [(rank[int(c)], -float(p), (x, y, x + w, y + h), i)
+             for i, ((x, y, w, h), p, c) in enumerate(zip(detections.xywh.tolist(),
+                                                          detections.conf,
+                                                          detections.cls))]
+    kept = []
+    for _, _, (x1, y1, x2, y2), i in sorted(boxes):
+        for kx1, ky1, kx2, ky2 in (b for _, _, b, _ in kept):
+            iw = max(0.0, min(x2, kx2) - max(x1, kx1))
+            ih = max(0.0, min(y2, ky2) - max(y1, ky1))
+            inter = iw * ih
+            union = (x2 - x1) * (y2 - y1) + (kx2 - kx1) * (ky2 - ky1) - inter
+            if union > 0 and inter / union > threshold:
+                break
+        else:
+            kept.append((None, None, (x1, y1, x2, y2), i))
+    return sorted(i for *_, i in kept)
+
+def bench_overlaps(args):
+    print(f"{'boxes':>6} {'kept':>6} {'pairwise':>10} {'suppress':>10} {'merge':>10} "
+          f"{'speedup':>8} {'boxes/s':>12}")
+    for n in args.sizes:
+        detections = make_overlapping_detections(n)
+        kept = suppress_overlaps(detections, args.threshold)
+        expected = detections.conf[
+            pairwise_suppress_overlaps(detections, args.threshold)
+        ]
+        if not np.array_equal(kept.conf, expected):
+            print(f"  warning: vectorized and pairwise results differ at {n} boxes")
+        pairwise = time_call(
+            lambda: pairwise_suppress_overlaps(detections, args.threshold),
+            max(1, args.repeats // 10),
+        )
+        suppress = time_call(lambda: suppress_overlaps(detections, args.threshold),
+                             args.repeats)
+        merge = time_call(
+            lambda: suppress_overlaps(detections, args.threshold, mode="merge"),
+            args.repeats,
+        )
+        print(
+            f"{n:>6} {len(kept):>6} {pairwise * 1e3:>8.3f}ms {suppress * 1e3:>8.3f}ms "
+            f"{merge * 1e3:>8.3f}ms {pairwise / suppress:>7.1f}x {n / suppress:>12,.0f}"
+        )
+
+def bench_draw(args):
+    import cv2
+
+    rng = np.random.default_rng(0)
+    h, w = args.height, args.width
+    # Manga-like page: white paper, dark ink strokes and grey screentone.
+    page = np.full((h, w, 3), 255, dtype=np.uint8)
+    for x1, y1, x2, y2 in rng.integers(0, max(h, w), (400, 4)):
+        cv2.line(
+            page,
+            (int(x1) % w, int(y1) % h),
+            (int(x2) % w, int(y2) % h),
+            (20, 20, 20),
+            6,
+        )
+    page[h // 3 : h // 2, :, :] = rng.integers(
+        150, 200, (h // 2 - h // 3, w, 1), dtype=np.uint8
+    )
+    detections = [
+        {'x': float(x), 'y': float(y), 'width': 300.0, 'height': 200.0,
+         'confidence': 0.9, 'class': int(c)}
+        for x, y, c in zip(rng.integers(0, w - 300, args.boxes),
+                           rng.integers(10, h - 200, args.boxes),
+                           rng.integers(0, 5, args.boxes))
+    ]
+    root = tempfile.mkdtemp(prefix="bench_draw_")
+    try:
+        src = os.path.join(root, "page.jpg")
+        dst = os.path.join(root, "out.jpg")
+        cv2.imwrite(src, page)
+        decoded = cv2.imread(src)
+        from_path = time_call(
+            lambda: draw_detections(src, detections, dst), args.repeats
+        )
+        from_buffer = time_call(
+            lambda: draw_detections(src, detections, dst, image=decoded), args.repeats
+        )
+        decode_only = time_call(lambda: cv2.imread(src), args.repeats)
+        draw_only = time_call(lambda: draw_detections_on_image(decoded, detections),
+                              args.repeats)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print(f"{w}x{h} page, {args.boxes} boxes (median of {args.repeats})")
+    print(f"  path-based (decode+draw+encode): {from_path * 1e3:8.1f}ms")
+    print(f"  buffer-based (draw+encode):      {from_buffer * 1e3:8.1f}ms")
+    print(f"  decode avoided by buffer API:    {decode_only * 1e3:8.1f}ms")
+    print(f"  draw only, in place:             {draw_only * 1e3:8.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark detector pipeline stages')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    split_parser = subparsers.add_parser(
+        'split', help='Time stratified_split on synthetic labels'
+    )
+    split_parser.add_argument(
+        '--sizes',
+        type=int,
+        nargs='+',
+        default=[1000, 10000, 100000],
+        help='Number of synthetic label files (default: 1000 10000 100000)',
+    )
+    split_parser.add_argument(
+        '--methods',
+        nargs='+',
+        default=list(SPLIT_METHODS),
+        choices=SPLIT_METHODS,
+        help='Stratification algorithms to compare (default: all)',
+    )
+    split_parser.set_defaults(func=bench_split)
+
+    post_parser = subparsers.add_parser(
+        'postprocess', help='Compare box-by-box and vectorized post-processing'
+    )
+    post_parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 1000],
+                             help='Boxes per image (default: 1 100 1000)')
+    post_parser.add_argument(
+        '--repeats',
+        type=int,
+        default=50,
+        help='Timing repeats, the median is reported (default: 50)',
+    )
+    post_parser.set_defaults(func=bench_postprocess)
+
+    overlap_parser = subparsers.add_parser('overlaps',
+                                           help='Time cross-class overlap suppression')
+    overlap_parser.add_argument(
+        '--sizes',
+        type=int,
+        nargs='+',
+        default=[100, 300, 1000],
+        help='Boxes per image (default: 100 300 1000)',
+    )
+    overlap_parser.add_argument(
+        '--threshold',
+        type=float,
+        default=0.6,
+        help='IoU above which boxes are resolved (default: 0.6)',
+    )
+    overlap_parser.add_argument(
+        '--repeats',
+        type=int,
+        default=200,
+        help='Timing repeats, the median is reported (default: 200)',
+    )
+    overlap_parser.set_defaults(func=bench_overlaps)
+
+    rules_parser = subparsers.add_parser('rules', help='Measure rule engine throughput')
+    rules_parser.add_argument(
+        '--sizes',
+        type=int,
+        nargs='+',
+        default=[1000, 100000, 1000000],
+        help='Boxes per call (default: 1000 100000 1000000)',
+    )
+    rules_parser.add_argument('--extra_rules', type=int, default=8,
+                              help='Rules added to the default ones (default: 8)')
+    rules_parser.add_argument(
+        '--repeats',
+        type=int,
+        default=20,
+        help='Timing repeats at 10k boxes, scaled by size (default: 20)',
+    )
+    rules_parser.set_defaults(func=bench_rules)
+
+    draw_parser = subparsers.add_parser(
+        'draw', help='Compare drawing from a path and from a decoded buffer'
+    )
+    draw_parser.add_argument(
+        '--width', type=int, default=4000, help='Page width (default: 4000)'
+    )
+    draw_parser.add_argument(
+        '--height', type=int, default=6000, help='Page height (default: 6000)'
+    )
+    draw_parser.add_argument(
+        '--boxes', type=int, default=100, help='Detections (default: 100)'
+    )
+    draw_parser.add_argument('--repeats', type=int, default=9,
+                             help='Timing repeats, the median is reported (default: 9)')
+    draw_parser.set_defaults(func=bench_draw)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,8 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from yolo_detector.inference import run_folder_inference
+from yolo_detector.postprocessing import OVERLAP_MODES
+from yolo_detector.export import EXPORT_FORMATS
 
 def main():
     parser = argparse.ArgumentParser(description='Run inference on test images')
@@ -18,6 +20,62 @@ def main():
                       help='Path to the model weights (default: models/best.pt)')
     parser.add_argument('--test_dir', type=str, default='data/test_set',
                       help='Path to test images directory (default: data/test_set)')
+    parser.add_argument(
+        '--batch_size',
+        type=str,
+        default='1',
+        help="Pages per forward pass, or 'auto' to fit available RAM (default: 1)",
+    )
+    parser.add_argument('--imgsz', type=int, default=None,
+                      help="Inference image size (default: the model's training size)")
+    parser.add_argument('--max_in_flight', type=int, default=4,
+                      help='Pages queued between pipeline stages (default: 4)')
+    parser.add_argument('--decode_workers', type=int, default=2,
+                      help='Threads decoding input images (default: 2)')
+    parser.add_argument('--write_workers', type=int, default=2,
+                      help='Threads drawing and writing output images (default: 2)')
+    parser.add_argument(
+        '--tile',
+        type=int,
+        default=None,
+        help='Run pages as overlapping tiles of this size, for webtoon strips '
+        'and high-resolution scans (default: whole pages)',
+    )
+    parser.add_argument('--tile_overlap', type=int, default=128,
+                      help='Pixels shared by neighbouring tiles (default: 128)')
+    parser.add_argument(
+        '--tile_batch',
+        type=str,
+        default='8',
+        help="Tiles per forward pass, or 'auto' to fit available RAM (default: 8)",
+    )
+    parser.add_argument(
+        '--overlaps',
+        type=str,
+        default='suppress',
+        choices=list(OVERLAP_MODES) + ['none'],
+        help='Resolve boxes of different classes covering the same region '
+        'by class priority (default: suppress)',
+    )
+    parser.add_argument(
+        '--rules',
+        type=str,
+        default=None,
+        help='YAML rule spec replacing the default relabelling rules, e.g. '
+        'thresholds tuned for one series',
+    )
+    parser.add_argument(
+        '--export',
+        type=str,
+        nargs='*',
+        default=[],
+        choices=EXPORT_FORMATS,
+        help='Stream detections to these formats for downstream services',
+    )
+    parser.add_argument('--export_dir', type=str, default=None,
+                      help='Folder of the exports (default: predictions/test_set)')
+    parser.add_argument('--no_draw', action='store_true',
+                      help='Skip writing annotated images, e.g. for export-only runs')
     
     args = parser.parse_args()
     
@@ -32,7 +90,25 @@ def main():
         sys.exit(1)
     
     print(f"Running inference on {args.test_dir} using model {args.model}...")
-    run_folder_inference(args.model, args.test_dir)
+    batch_size = args.batch_size if args.batch_size == 'auto' else int(args.batch_size)
+    tile_batch = args.tile_batch if args.tile_batch == 'auto' else int(args.tile_batch)
+    run_folder_inference(
+        args.model,
+        args.test_dir,
+        max_in_flight=args.max_in_flight,
+        batch_size=batch_size,
+        imgsz=args.imgsz,
+        decode_workers=args.decode_workers,
+        write_workers=args.write_workers,
+        tile=args.tile,
+        tile_overlap=args.tile_overlap,
+        tile_batch=tile_batch,
+        overlaps=None if args.overlaps == 'none' else args.overlaps,
+        rules=args.rules,
+        draw=not args.no_draw,
+        export=args.export,
+        export_dir=args.export_dir,
+    )
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""
+Script to generate K-fold and multi-seed splits as list-file manifests.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+
+# Add the parent directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from yolo_detector.data_utils import (
+    SPLIT_METHODS,
+    generate_splits,
+    write_split_manifests,
+)
+
+def print_balance(splits: dict, balance: dict) -> None:
+    """
+    Print the validation share of every class for each split.
+
+    Args:
+        splits: ``{name: (train_files, val_files)}``
+        balance: ``{name: split_balance(...)}`` for the same names
+    """
+    n_classes = len(next(iter(balance.values()))["val_share"])
+    header = " ".join(f"{'cls ' + str(c):>7}" for c in range(n_classes))
+    print(f"\n{'split':<8} {'train':>7} {'val':>7} {header} {'max err':>8}")
+    for name, (train_files, val_files) in splits.items():
+        shares = " ".join(f"{s:>7.3f}" for s in balance[name]["val_share"])
+        print(f"{name:<8} {len(train_files):>7} {len(val_files):>7} {shares} "
+              f"{balance[name]['max_error']:>8.3f}")
+
+def main(input_dir: str = "data/raw", output_dir: str = "data", folds: int = 5,
+         seeds: list = (), split_ratio: float = 0.8, workers: int = None,
+         method: str = "greedy"):
+    """
+    Generate the splits and write them as manifests under *output_dir*.
+
+    Args:
+        input_dir: Directory containing raw_images and raw_labels
+        output_dir: Dataset directory receiving ``images/<split>_train.txt``,
+            ``images/<split>_val.txt`` and ``splits.json``
+        folds: Number of cross-validation folds (0 for none)
+        seeds: Seeds of additional train/val splits
+        split_ratio: Train fraction of the seeded splits
+        workers: Threads used to read label files (None for automatic)
+        method: Stratification algorithm, "greedy" or "iterative"
+    """
+    raw_images_dir = os.path.join(input_dir, "raw_images")
+    raw_labels_dir = os.path.join(input_dir, "raw_labels")
+
+    start = time.perf_counter()
+    splits, balance = generate_splits(raw_images_dir, raw_labels_dir, folds, seeds,
+                                      split_ratio, workers=workers, method=method)
+    manifests = write_split_manifests(
+        output_dir, splits, raw_images_dir, raw_labels_dir
+    )
+    print(f"Generated {len(splits)} splits in {time.perf_counter() - start:.2f}s")
+    print_balance(splits, balance)
+
+    meta = {
+        name: {
+            **manifests[name],
+            "train_images": len(splits[name][0]),
+            "val_images": len(splits[name][1]),
+            "val_share": [None if np.isnan(s) else round(float(s), 4)
+                          for s in balance[name]["val_share"]],
+            "max_error": round(balance[name]["max_error"], 4),
+        }
+        for name in splits
+    }
+    meta_path = os.path.join(output_dir, "splits.json")
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"\nManifests and balance report written to {meta_path}")
+    print("Train on one with write_data_yaml(base_dir, weights, "
+          "train='images/<split>_train.txt', val='images/<split>_val.txt')")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Generate K-fold and multi-seed splits'
+    )
+    parser.add_argument(
+        '--input',
+        type=str,
+        default='data/raw',
+        help='Directory containing raw_images and raw_labels (default: data/raw)',
+    )
+    parser.add_argument('--output', type=str, default='data',
+                      help='Dataset directory receiving the manifests (default: data)')
+    parser.add_argument('--folds', type=int, default=5,
+                      help='Number of cross-validation folds, 0 for none (default: 5)')
+    parser.add_argument('--seeds', type=int, nargs='*', default=[],
+                      help='Seeds of additional train/val splits')
+    parser.add_argument('--split_ratio', type=float, default=0.8,
+                      help='Train fraction of the seeded splits (default: 0.8)')
+    parser.add_argument('--workers', type=int, default=None,
+                      help='Threads used to read label files (default: automatic)')
+    parser.add_argument('--method', type=str, default='greedy', choices=SPLIT_METHODS,
+                      help='Stratification algorithm; iterative balances rare classes '
+                           'best (default: greedy)')
+    args = parser.parse_args()
+    main(
+        args.input,
+        args.output,
+        args.folds,
+        args.seeds,
+        args.split_ratio,
+        args.workers,
+        args.method,
+    )
@@ -4,26 +4,112 @@ Script to prepare the dataset for training.
 
 import os
 import sys
+import json
+import argparse
+from collections import Counter
 from pathlib import Path
 from glob import glob
+import numpy as np
 
 # Add the parent directory to the Python path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from yolo_detector.data_utils import (
-    count_classes_in_label_file,
+    LINK_MODES,
+    SPLIT_METHODS,
+    link_pool,
     move_files,
-    reload_and_save_images,
+    repair_images,
+    split_source,
     stratified_split
 )
+from yolo_detector.labels import scan_labels
+from yolo_detector.splits import split_balance
 
-def main(input_dir: str, output_dir: str):
+PREPARE_MANIFEST = ".prepare_manifest.json"
+DATASET_META = "dataset.json"
+
+def load_prepare_manifest(output_dir: str) -> dict:
+    """
+    Read the record of a previous preparation of *output_dir*.
+
+    Args:
+        output_dir: Directory of the prepared dataset
+
+    Returns:
+        Dictionary with the ``split_ratio`` used and, under ``files``, the
+        split and source file stats of every prepared image; empty if the
+        dataset was never prepared
+    """
+    try:
+        with open(os.path.join(output_dir, PREPARE_MANIFEST), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_prepare_manifest(output_dir: str, manifest: dict) -> None:
+    """
+    Atomically write the preparation record of *output_dir*.
+
+    Args:
+        output_dir: Directory of the prepared dataset
+        manifest: Record as returned by :func:`load_prepare_manifest`
+    """
+    path = os.path.join(output_dir, PREPARE_MANIFEST)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+def write_dataset_meta(output_dir: str, meta: dict) -> str:
+    """
+    Write the summary of a prepared dataset to ``dataset.json``.
+    
+    Args:
+        output_dir: Directory of the prepared dataset
+        meta: Format, sources and per-split image and class counts
+        
+    Returns:
+        Path to the written file
+    """
+    path = os.path.join(output_dir, DATASET_META)
+    with open(path, "w") as f:
+        json.dump(meta, f, indent=2)
+    return path
+
+def source_stats(folder: str) -> dict:
+    """
+    Map each file in *folder* to its ``[size, mtime_ns]``.
+    """
+    with os.scandir(folder) as entries:
+        return {e.name: [e.stat().st_size, e.stat().st_mtime_ns] for e in entries}
+
+def main(
+    input_dir: str,
+    output_dir: str,
+    workers: int = None,
+    link_mode: str = "auto",
+    incremental: bool = False,
+    split_ratio: float = 0.8,
+    split_method: str = "greedy",
+):
     """
     Prepare the dataset for training.
     
     Args:
         input_dir: Directory containing raw images and labels
         output_dir: Directory to save the prepared dataset
+        workers: Threads used to read and copy files (None for automatic)
+        link_mode: How samples are materialized, see ``move_files``; "auto"
+            reflinks or hard-links on the same filesystem and copies otherwise,
+            "manifest" only writes ``images/train.txt`` and ``images/val.txt``
+            lists of absolute image paths into the raw folders
+        incremental: Keep the split of pages prepared by an earlier run and
+            only place, copy and repair new or changed pages; outputs whose
+            source is gone are removed
+        split_ratio: Fraction of each class's images that goes to train
+        split_method: Stratification algorithm, "greedy" or "iterative"
+            (see ``stratified_split``)
     """
     # Configuration
     raw_images_dir = os.path.join(input_dir, "raw_images")
@@ -36,30 +122,192 @@ def main(input_dir: str, output_dir: str):
         os.makedirs(os.path.join(images_dir, split), exist_ok=True)
         os.makedirs(os.path.join(labels_dir, split), exist_ok=True)
     
+    previous = load_prepare_manifest(output_dir)
+    prepared = previous.get("files", {})
+    layout = "manifest" if link_mode == "manifest" else "tree"
+    # Pages only have outputs to reuse or remove if the last run copied them
+    placed = prepared if previous.get("format", "tree") == "tree" else {}
+    if layout == "tree" and not placed:
+        # Copies from a tree run before a manifest run are in no record, and
+        # their sources may have been removed since
+        placed = {
+            f: {"split": split}
+            for split in ("train", "val")
+            for f in os.listdir(os.path.join(images_dir, split))
+            if f.lower().endswith((".jpg", ".jpeg", ".png"))
+        }
+    keep = incremental and bool(prepared)
+    if keep and previous.get("split_ratio") != split_ratio:
+        print(
+            f"Split ratio changed from {previous.get('split_ratio')} to {split_ratio}; "
+            "re-splitting from scratch"
+        )
+        keep = False
+    
     # Step 1: Split dataset into train/val sets
     print("\nStep 1: Splitting dataset...")
-    train_files, val_files, total_class_counts = stratified_split(raw_images_dir, raw_labels_dir)
-    move_files(train_files, raw_images_dir, raw_labels_dir, 
-              os.path.join(images_dir, "train"), os.path.join(labels_dir, "train"))
-    move_files(val_files, raw_images_dir, raw_labels_dir,
-              os.path.join(images_dir, "val"), os.path.join(labels_dir, "val"))
+    train_files, val_files, total_class_counts = stratified_split(
+        raw_images_dir, raw_labels_dir, split_ratio, workers=workers, cache=True,
+        assigned={f: entry["split"] for f, entry in prepared.items()} if keep else None,
+        method=split_method,
+    )
+    image_stats = source_stats(raw_images_dir)
+    label_stats = source_stats(raw_labels_dir)
+    files = {}
+    for split, split_files in (("train", train_files), ("val", val_files)):
+        for file in split_files:
+            label = os.path.splitext(file)[0] + ".txt"
+            files[file] = {"split": split, "image": image_stats[file],
+                           "label": label_stats[label]}
+    
+    # Incrementally, only pages that are new or whose image or label changed
+    # need placing
+    delta = {"train": [], "val": []}
+    for file, entry in files.items():
+        if not incremental or placed.get(file) != entry:
+            delta[entry["split"]].append(file)
+    
+    # Remove the outputs of pages that left the raw dataset or changed split
+    removed = [f for f, entry in placed.items()
+               if f not in files or files[f]["split"] != entry["split"]]
+    for file in removed:
+        split = placed[file]["split"]
+        for path in (
+            os.path.join(images_dir, split, file),
+            os.path.join(labels_dir, split, os.path.splitext(file)[0] + ".txt"),
+        ):
+            if os.path.lexists(path):
+                os.remove(path)
+    
+    if link_mode == "manifest":
+        # List files of absolute paths into per-split pools linking the raw
+        # folders, so no image is duplicated and re-splitting is instant
+        used = Counter()
+        for split, split_files in (("train", train_files), ("val", val_files)):
+            pool_images, pool_labels = link_pool(output_dir, f"pool_{split}",
+                                                 raw_images_dir, raw_labels_dir)
+            used += move_files(
+                split_files,
+                pool_images,
+                pool_labels,
+                os.path.join(images_dir, split),
+                os.path.join(labels_dir, split),
+                mode="manifest",
+            )
+    else:
+        used = move_files(
+            delta["train"],
+            raw_images_dir,
+            raw_labels_dir,
+            os.path.join(images_dir, "train"),
+            os.path.join(labels_dir, "train"),
+            mode=link_mode,
+            workers=workers,
+        )
+        used += move_files(
+            delta["val"],
+            raw_images_dir,
+            raw_labels_dir,
+            os.path.join(images_dir, "val"),
+            os.path.join(labels_dir, "val"),
+            mode=link_mode,
+            workers=workers,
+        )
+    
+    table = scan_labels(raw_labels_dir, workers=workers, cache=True)
+    meta = {"format": layout,
+            "source": {"images": os.path.abspath(raw_images_dir),
+                       "labels": os.path.abspath(raw_labels_dir)},
+            "split_ratio": split_ratio, "splits": {}}
+    for split, split_files in (("train", train_files), ("val", val_files)):
+        instances = table.class_totals([os.path.splitext(f)[0] for f in split_files])
+        meta["splits"][split] = {"images": len(split_files),
+                                 "source": split_source(output_dir, split),
+                                 "instances": dict(sorted(instances.items()))}
+    labelled = train_files + val_files
+    balance = split_balance(
+        table.presence([os.path.splitext(f)[0] for f in labelled]),
+        np.arange(len(labelled)) >= len(train_files),
+        1 - split_ratio,
+    )
+    meta["balance_error"] = {"per_class": [None if np.isnan(e) else round(float(e), 4)
+                                           for e in balance["error"]],
+                             "max": round(balance["max_error"], 4)}
+    write_dataset_meta(output_dir, meta)
     
     print(f"Total images: {len(train_files) + len(val_files)}")
     print(f"Train images: {len(train_files)}")
     print(f"Val images:   {len(val_files)}")
+    if incremental:
+        print(f"New or changed: {len(delta['train'])} train, {len(delta['val'])} val; "
+              f"removed: {len(removed)}")
+    errors = ", ".join(
+        f"{c}: {e:+.3f}" for c, e in enumerate(balance["error"]) if not np.isnan(e)
+    )
+    print(f"Val share error per class ({split_method}): {errors} "
+          f"(max {balance['max_error']:.3f})")
+    unchanged = used.pop("unchanged", 0)
+    methods = ", ".join(f"{n} by {m}" for m, n in used.items()) or "none"
+    print(f"Files materialized: {methods} ({unchanged} already up to date)")
     
     # Step 2: Fix any corrupted images
     print("\nStep 2: Fixing corrupted images...")
-    n_fixed_train = reload_and_save_images(os.path.join(images_dir, "train"))
-    n_fixed_val = reload_and_save_images(os.path.join(images_dir, "val"))
-    print(f"Fixed {n_fixed_train} training images and {n_fixed_val} validation images")
+    if link_mode == "manifest":
+        # Repairs rewrite files in place, which here would be the raw images
+        print("Skipped: the list files point at the raw images, which are never "
+              "rewritten; run scripts/repair_images.py on a copy if needed")
+    else:
+        train_images_dir = os.path.join(images_dir, "train")
+        report = repair_images([train_images_dir, os.path.join(images_dir, "val")])
+        n_fixed_train = sum(
+            os.path.dirname(p) == train_images_dir for p, _ in report["fixed"]
+        )
+        n_fixed_val = len(report["fixed"]) - n_fixed_train
+        print(
+            f"Fixed {n_fixed_train} training images and {n_fixed_val} validation images"
+        )
+        print(f"Skipped {len(report['skipped'])} already-checked images, "
+              f"{len(report['failed'])} could not be repaired")
+    
+    save_prepare_manifest(output_dir, {"format": layout, "split_ratio": split_ratio,
+                                       "files": files})
     
     print("\nDataset preparation complete!")
     print(f"Prepared dataset saved to: {output_dir}")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python prepare_dataset.py <input_dir> <output_dir>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='Prepare the dataset for training')
+    parser.add_argument(
+        'input_dir', help='Directory containing raw_images and raw_labels'
+    )
+    parser.add_argument('output_dir', help='Directory to save the prepared dataset')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Threads used to read label files and copy files (default: automatic)',
+    )
+    parser.add_argument('--link_mode', type=str, default='auto', choices=LINK_MODES,
+                      help='How samples are materialized (default: auto)')
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only process new or changed pages, keeping the existing split',
+    )
+    parser.add_argument(
+        '--split_method',
+        type=str,
+        default='greedy',
+        choices=SPLIT_METHODS,
+        help='Stratification algorithm (default: greedy)',
+    )
+    args = parser.parse_args()
     
-    main(sys.argv[1], sys.argv[2]) 
\ No newline at end of file
+    main(
+        args.input_dir,
+        args.output_dir,
+        args.workers,
+        args.link_mode,
+        args.incremental,
+        split_method=args.split_method,
+    )
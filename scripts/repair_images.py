@@ -4,27 +4,49 @@ Script to repair corrupted images in the dataset.
 
 import os
 import sys
+import argparse
 from pathlib import Path
 
 # Add the parent directory to the Python path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from yolo_detector.data_utils import reload_and_save_images
+from yolo_detector.data_utils import repair_images
 
-def main():
+def main(verify_only: bool = False, workers: int = None):
     # Configuration
     base_dir = "data"
     images_dir = os.path.join(base_dir, "images")
+    splits = {"training": os.path.join(images_dir, "train"),
+              "validation": os.path.join(images_dir, "val")}
     
-    # Repair training images
-    print("Repairing training images...")
-    n_fixed_train = reload_and_save_images(os.path.join(images_dir, "train"))
-    print(f"Fixed {n_fixed_train} training images")
+    # Repair training and validation images in one worker pool
+    print("Checking images..." if verify_only else "Repairing images...")
+    report = repair_images(
+        list(splits.values()), workers=workers, verify_only=verify_only
+    )
     
-    # Repair validation images
-    print("\nRepairing validation images...")
-    n_fixed_val = reload_and_save_images(os.path.join(images_dir, "val"))
-    print(f"Fixed {n_fixed_val} validation images")
+    key, action = ("broken", "need repair") if verify_only else ("fixed", "fixed")
+    for split, folder in splits.items():
+        n = sum(os.path.dirname(p) == folder for p, _ in report[key])
+        print(f"{n} {split} images {action}")
+    for path, reason in report["broken"]:
+        print(f"  {path}: {reason}")
+    print(f"Skipped {len(report['skipped'])} unchanged images, "
+          f"{len(report['failed'])} could not be repaired")
+    if report["fixed"]:
+        print(f"Rewritten files: {report['bytes_before'] / 1e6:.1f} MB -> "
+              f"{report['bytes_after'] / 1e6:.1f} MB")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        description='Repair corrupted images in the dataset'
+    )
+    parser.add_argument(
+        '--verify_only',
+        action='store_true',
+        help='Only check image headers and structure, do not rewrite anything',
+    )
+    parser.add_argument('--workers', type=int, default=None,
+                      help='Worker processes (default: one per CPU)')
+    args = parser.parse_args()
+    main(args.verify_only, args.workers)
\ No newline at end of file
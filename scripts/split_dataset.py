@@ -4,6 +4,7 @@ Script to split the dataset into training and validation sets.
 
 import os
 import sys
+import argparse
 from pathlib import Path
 
 # Add the parent directory to the Python path
@@ -11,7 +12,7 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from yolo_detector.data_utils import stratified_split, move_files
 
-def main():
+def main(workers: int = None):
     # Configuration
     base_dir = "data"
     raw_images_dir = os.path.join(base_dir, "raw_images")
@@ -26,13 +27,17 @@ def main():
     
     # Split dataset
     print("Splitting dataset...")
-    train_files, val_files, total_class_counts = stratified_split(raw_images_dir, raw_labels_dir)
+    train_files, val_files, total_class_counts = stratified_split(
+        raw_images_dir, raw_labels_dir, workers=workers, cache=True
+    )
     
     # Move files to their respective directories
     move_files(train_files, raw_images_dir, raw_labels_dir, 
-              os.path.join(images_dir, "train"), os.path.join(labels_dir, "train"))
+              os.path.join(images_dir, "train"), os.path.join(labels_dir, "train"),
+              workers=workers)
     move_files(val_files, raw_images_dir, raw_labels_dir,
-              os.path.join(images_dir, "val"), os.path.join(labels_dir, "val"))
+              os.path.join(images_dir, "val"), os.path.join(labels_dir, "val"),
+              workers=workers)
     
     # Print statistics
     print(f"Total images: {len(train_files) + len(val_files)}")
@@ -43,4 +48,14 @@ def main():
         print(f"Class {class_id}: {count}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        description='Split the dataset into train/val sets'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Threads used to read label files and copy files (default: automatic)',
+    )
+    args = parser.parse_args()
+    main(args.workers)
\ No newline at end of file
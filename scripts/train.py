@@ -5,14 +5,20 @@ Script to train the YOLO model on the prepared dataset.
 import os
 import sys
 from pathlib import Path
-from collections import Counter
 import shutil
+import argparse
 
 # Add the parent directory to the Python path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from yolo_detector.data_utils import count_classes_in_label_file
-from yolo_detector.training import compute_class_weights, write_data_yaml, train_model
+from yolo_detector.training import (
+    SAMPLING_MODES,
+    compute_class_weights,
+    split_class_counts,
+    write_data_yaml,
+    train_model
+)
+from yolo_detector.profiles import PROFILES, parse_overrides
 
 def get_next_run_name(models_dir: str) -> str:
     """
@@ -40,10 +46,10 @@ def get_next_run_name(models_dir: str) -> str:
     next_num = max(run_numbers) + 1 if run_numbers else 1
     return f'run{next_num}'
 
-def main():
+def main(workers: int = None, sampling: str = "none", repeat_threshold: float = 0.1,
+         profile: str = "auto", overrides: dict = None, resize_cache: bool = False):
     # Configuration
     base_dir = "data"
-    labels_dir = os.path.join(base_dir, "labels")
     models_dir = "models"
     
     # Create models directory if it doesn't exist
@@ -54,12 +60,7 @@ def main():
     print(f"Starting training run: {run_name}")
     
     # Compute class weights from training labels
-    train_labels_dir = os.path.join(labels_dir, "train")
-    class_counts = Counter()
-    for label_file in os.listdir(train_labels_dir):
-        if label_file.endswith(".txt"):
-            label_path = os.path.join(train_labels_dir, label_file)
-            class_counts.update(count_classes_in_label_file(label_path))
+    class_counts = split_class_counts(base_dir, "train", workers)
     
     class_weights = compute_class_weights(class_counts)
     
@@ -68,7 +69,15 @@ def main():
     
     # Train model
     print("Training model...")
-    best_weights_path = train_model(run_name, data_yaml_path)
+    best_weights_path = train_model(
+        run_name,
+        data_yaml_path,
+        sampling,
+        repeat_threshold,
+        profile,
+        overrides,
+        resize_cache,
+    )
     
     # Copy the best weights to models directory
     best_weights_name = os.path.basename(best_weights_path)
@@ -77,4 +86,38 @@ def main():
     print(f"Best model copied to: {final_weights_path}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        description='Train the YOLO model on the prepared dataset'
+    )
+    parser.add_argument('--workers', type=int, default=None,
+                      help='Threads used to read label files (default: automatic)')
+    parser.add_argument('--sampling', type=str, default='none', choices=SAMPLING_MODES,
+                      help='Class-balanced sampling: repeat oversamples images holding '
+                           'rare classes (default: none)')
+    parser.add_argument(
+        '--repeat_threshold',
+        type=float,
+        default=0.1,
+        help='Image frequency below which a class is oversampled (default: 0.1)',
+    )
+    parser.add_argument(
+        '--profile',
+        type=str,
+        default='auto',
+        help=f'Training profile, one of {", ".join(PROFILES)} or a YAML file '
+        '(default: auto)',
+    )
+    parser.add_argument(
+        '--set',
+        dest='overrides',
+        nargs='*',
+        default=[],
+        metavar='KEY=VALUE',
+        help='Training settings overriding the profile, e.g. batch=8 cache=disk',
+    )
+    parser.add_argument('--resize_cache', action='store_true',
+                      help='Train on a copy of the dataset pre-resized to the training '
+                           'image size, rebuilt only for changed images')
+    args = parser.parse_args()
+    main(args.workers, args.sampling, args.repeat_threshold, args.profile,
+         parse_overrides(args.overrides), args.resize_cache)
\ No newline at end of file
@@ -5,7 +5,7 @@ Pipeline:
 1. Load the best fine‑tuned weights
 2. Ensure a test_set folder exists (create and pre‑fill with a few val images if necessary)
 3. Re‑save test images to catch hidden corruptions
-4. Run YOLOv8 inference, then apply heuristic post‑processing
+4. Run batched YOLOv8 inference, then apply heuristic post‑processing
 5. Save visualised predictions to disk
 """
 
@@ -15,7 +15,7 @@ from glob import glob
 from ultralytics import YOLO
 from yolo_detector.data_utils import reload_and_save_images
 from yolo_detector.postprocessing import apply_post_processing_rules
-from yolo_detector.inference import draw_detections
+from yolo_detector.inference import draw_detections, list_images, run_batched_inference
 
 def run_inference_and_visualize():
     # --------------------------------------------------------------------------- #
@@ -50,7 +50,9 @@ def run_inference_and_visualize():
     # --------------------------------------------------------------------------- #
     # 4. Run inference and apply rule‑based clean‑up
     # --------------------------------------------------------------------------- #
-    results = best_model.predict(test_dir, save=False)  # Don't save to runs/predict
+    results = list(
+        run_batched_inference(best_model, list_images(test_dir), batch_size="auto")
+    )
     processed_results = apply_post_processing_rules(results)
 
     # --------------------------------------------------------------------------- #
@@ -58,20 +60,18 @@ def run_inference_and_visualize():
     # --------------------------------------------------------------------------- #
     os.makedirs(predictions_dir, exist_ok=True)
     
-    for result, detections in zip(results, processed_results):
+    for result, detections in zip(results, processed_results.iter_pages()):
         img_path = result.path
         base_name = os.path.splitext(os.path.basename(img_path))[0]
         output_path = os.path.join(predictions_dir, f"processed_{base_name}.jpg")
         
         # Print detected classes for debugging
         print(f"\nProcessing {base_name}:")
-        for det in detections:
-            class_idx = det.get('class', 0)
-            conf = det.get('confidence', 0)
+        for class_idx, conf in zip(detections.cls.tolist(), detections.conf.tolist()):
             print(f"  Class {class_idx} with confidence {conf:.2f}")
         
         # Draw detections using our custom function
-        draw_detections(img_path, detections, output_path)
+        draw_detections(img_path, detections, output_path, image=result.orig_img)
         print(f"Saved processed image to: {output_path}")
 
     print("\nInference complete with post-processing rules applied")
@@ -0,0 +1,56 @@
+"""
+Shared fixtures for the test suite.
+"""
+
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+# Add the repository root to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+def _write_dataset(
+    root: Path, n_images: int = 60, n_classes: int = 5, seed: int = 0
+) -> tuple:
+    """
+    Write a raw dataset of empty ``.jpg`` files and random YOLO labels.
+
+    A few images get no label file and a few an empty one.
+
+    Returns:
+        Tuple of (raw_images_dir, raw_labels_dir)
+    """
+    rng = np.random.default_rng(seed)
+    images, labels = root / "raw_images", root / "raw_labels"
+    images.mkdir(parents=True)
+    labels.mkdir(parents=True)
+    for i in range(n_images):
+        (images / f"page{i:03d}.jpg").write_bytes(b"")
+        if i % 13 == 5:
+            continue                    # unlabelled image
+        n_boxes = 0 if i % 17 == 3 else int(rng.integers(1, 6))
+        # Skewed class frequencies so some classes are rare
+        classes = rng.choice(n_classes, n_boxes, p=np.linspace(2, 0.2, n_classes)
+                             / np.linspace(2, 0.2, n_classes).sum())
+        rows = [
+            f"{c} {rng.uniform(0.2, 0.8):.4f} {rng.uniform(0.2, 0.8):.4f} "
+            f"{rng.uniform(0.01, 0.2):.4f} {rng.uniform(0.01, 0.2):.4f}"
+            for c in classes
+        ]
+        (labels / f"page{i:03d}.txt").write_text(
+            "\n".join(rows) + ("\n" if rows else "")
+        )
+    return str(images), str(labels)
+
+@pytest.fixture
+def raw_dataset(tmp_path):
+    """Raw image and label folders of a small random dataset."""
+    return _write_dataset(tmp_path)
+
+@pytest.fixture
+def make_dataset(tmp_path):
+    """Factory writing more datasets below ``tmp_path``, see ``_write_dataset``."""
+    def make(name: str, **kwargs) -> tuple:
+        return _write_dataset(tmp_path / name, **kwargs)
+    return make
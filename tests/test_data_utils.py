@@ -0,0 +1,174 @@
+"""
+Tests for materializing dataset files and checking images.
+"""
+
+import os
+import pytest
+from PIL import Image, ImageFile
+from yolo_detector.data_utils import (
+    JPEG_EOI_BLOCK,
+    check_image,
+    manifest_path,
+    move_files,
+    repair_images,
+)
+
+@pytest.fixture
+def source(tmp_path):
+    """Images and labels in the ``images``/``labels`` layout; c.jpg has no label."""
+    images, labels = tmp_path / "src" / "images", tmp_path / "src" / "labels"
+    images.mkdir(parents=True)
+    labels.mkdir(parents=True)
+    for name in ("a", "b", "c"):
+        (images / f"{name}.jpg").write_bytes(name.encode() * 100)
+    for name in ("a", "b"):
+        (labels / f"{name}.txt").write_text(f"0 0.5 0.5 0.1 0.1  # {name}\n")
+    return str(images), str(labels)
+
+@pytest.fixture
+def dest(tmp_path):
+    images, labels = (
+        tmp_path / "out" / "images" / "train",
+        tmp_path / "out" / "labels" / "train",
+    )
+    images.mkdir(parents=True)
+    labels.mkdir(parents=True)
+    return str(images), str(labels)
+
+FILES = ["a.jpg", "b.jpg", "c.jpg"]
+
+def _placed(source, dest):
+    """(source, destination) path pairs of the labelled images and their labels."""
+    return [(os.path.join(s, name), os.path.join(d, name))
+            for s, d in zip(source, dest) for name in os.listdir(s)
+            if os.path.splitext(name)[0] != "c"]
+
+def test_copy(source, dest):
+    used = move_files(FILES, *source, *dest, mode="copy", workers=1)
+    assert used == {"copy": 4}
+    assert sorted(os.listdir(dest[0])) == ["a.jpg", "b.jpg"]
+    for src, dst in _placed(source, dest):
+        assert not os.path.samefile(src, dst)
+        assert open(src, "rb").read() == open(dst, "rb").read()
+        assert os.stat(src).st_mtime_ns == os.stat(dst).st_mtime_ns
+
+def test_hardlink(source, dest):
+    assert move_files(FILES, *source, *dest, mode="hardlink") == {"hardlink": 4}
+    for src, dst in _placed(source, dest):
+        assert os.path.samefile(src, dst) and not os.path.islink(dst)
+
+def test_symlink(source, dest):
+    assert move_files(FILES, *source, *dest, mode="symlink") == {"symlink": 4}
+    for src, dst in _placed(source, dest):
+        assert os.readlink(dst) == os.path.abspath(src)
+
+def test_auto_falls_back_to_a_working_method(source, dest):
+    used = move_files(FILES, *source, *dest, mode="auto")
+    assert sum(used.values()) == 4 and set(used) <= {"reflink", "hardlink", "copy"}
+    for src, dst in _placed(source, dest):
+        assert open(src, "rb").read() == open(dst, "rb").read()
+
+@pytest.mark.parametrize("mode", ["copy", "hardlink", "symlink"])
+def test_rerun_leaves_up_to_date_files_alone(source, dest, mode):
+    move_files(FILES, *source, *dest, mode=mode)
+    assert move_files(FILES, *source, *dest, mode=mode) == {"unchanged": 4}
+
+def test_changed_source_is_copied_again(source, dest):
+    move_files(FILES, *source, *dest, mode="copy")
+    with open(os.path.join(source[1], "a.txt"), "a") as f:
+        f.write("1 0.5 0.5 0.1 0.1\n")
+    assert move_files(FILES, *source, *dest, mode="copy") == {"copy": 1, "unchanged": 3}
+
+def test_switching_mode_never_writes_through_old_links(source, dest):
+    move_files(FILES, *source, *dest, mode="symlink")
+    move_files(FILES, *source, *dest, mode="copy", compare="hash")
+    for src, dst in _placed(source, dest):
+        assert not os.path.islink(dst) and not os.path.samefile(src, dst)
+    with open(os.path.join(dest[1], "a.txt"), "w") as f:
+        f.write("")
+    assert open(os.path.join(source[1], "a.txt")).read()
+
+def test_manifest_lists_source_images(source, dest):
+    assert move_files(FILES, *source, *dest, mode="manifest") == {"manifest": 2}
+    with open(manifest_path(dest[0])) as f:
+        assert f.read().splitlines() == [
+            os.path.join(source[0], n) for n in ("a.jpg", "b.jpg")
+        ]
+    assert os.listdir(dest[0]) == []
+
+    # A later link run removes the stale list file
+    move_files(FILES, *source, *dest, mode="copy")
+    assert not os.path.exists(manifest_path(dest[0]))
+
+def test_manifest_needs_the_label_layout_ultralytics_expects(tmp_path, source, dest):
+    other_labels = tmp_path / "elsewhere"
+    other_labels.mkdir()
+    (other_labels / "a.txt").write_text("0 0.5 0.5 0.1 0.1\n")
+    with pytest.raises(ValueError):
+        move_files(FILES, source[0], str(other_labels), *dest, mode="manifest")
+
+def test_unknown_mode(source, dest):
+    with pytest.raises(ValueError):
+        move_files(FILES, *source, *dest, mode="teleport")
+
+@pytest.fixture
+def jpeg(tmp_path):
+    path = tmp_path / "page.jpg"
+    Image.new("RGB", (64, 48), (200, 30, 30)).save(path, quality=90)
+    return path
+
+@pytest.mark.parametrize("full_decode", [True, False])
+def test_check_image_accepts_trailing_data(jpeg, full_decode):
+    with open(jpeg, "ab") as f:
+        f.write(b"\x00TRAILER" * 50)
+    assert check_image(str(jpeg), full_decode) is None
+
+@pytest.mark.parametrize("full_decode", [True, False])
+def test_check_image_flags_truncation(jpeg, full_decode):
+    data = jpeg.read_bytes()
+    jpeg.write_bytes(data[:len(data) // 2])
+    assert check_image(str(jpeg), full_decode) is not None
+
+def test_check_image_accepts_trailers_larger_than_a_block(jpeg):
+    # Motion photos append their video after the end marker
+    with open(jpeg, "ab") as f:
+        f.write(b"\x00" * (3 * JPEG_EOI_BLOCK + 7))
+    assert check_image(str(jpeg), full_decode=False) is None
+
+def test_check_image_ignores_the_thumbnail_end_marker(tmp_path):
+    path, thumb = tmp_path / "page.jpg", tmp_path / "thumb.jpg"
+    Image.new("RGB", (8, 8)).save(thumb)
+    # A JPEG with a whole thumbnail, and so an end marker, in its header
+    image = Image.effect_noise((256, 256), 64).convert("RGB")
+    image.save(path, exif=b"Exif\x00\x00" + thumb.read_bytes(), quality=90)
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) - len(data) // 4])
+    assert check_image(str(path), full_decode=False) == "truncated JPEG"
+
+def test_check_image_leaves_truncated_loading_alone(tmp_path, monkeypatch):
+    # Only the end of the scan data is missing, so the header checks pass
+    path = tmp_path / "page.jpg"
+    Image.effect_noise((256, 256), 64).convert("RGB").save(path, quality=90)
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) - len(data) // 4])
+    for allowed in (True, False):
+        monkeypatch.setattr(ImageFile, "LOAD_TRUNCATED_IMAGES", allowed)
+        assert check_image(str(path)).startswith("unreadable")
+        assert ImageFile.LOAD_TRUNCATED_IMAGES is allowed
+
+def test_check_image_flags_non_rgb(tmp_path):
+    path = tmp_path / "grey.png"
+    Image.new("L", (8, 8)).save(path)
+    assert check_image(str(path)) == "mode L"
+
+def test_repair_images_accepts_a_trailing_slash(tmp_path, jpeg):
+    Image.new("L", (8, 8)).save(tmp_path / "grey.jpg")
+    report = repair_images([str(tmp_path) + os.sep], workers=1)
+    assert [path for path, _ in report["fixed"]] == [str(tmp_path / "grey.jpg")]
+    assert report["clean"] == [str(tmp_path / "page.jpg")]
+    # The manifest was saved under the same folder and is used on the next run
+    report = repair_images([str(tmp_path)], workers=1)
+    assert sorted(report["skipped"]) == [
+        str(tmp_path / "grey.jpg"),
+        str(tmp_path / "page.jpg"),
+    ]
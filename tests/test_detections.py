@@ -0,0 +1,86 @@
+"""
+Tests for the struct-of-arrays Detections container.
+"""
+
+import numpy as np
+import pytest
+from yolo_detector.detections import Detections
+
+def _detections(seed: int = 0) -> Detections:
+    rng = np.random.default_rng(seed)
+    n = 50
+    return Detections(rng.random((n, 4)) * 500, rng.random(n), rng.integers(0, 5, n),
+                      page=rng.integers(0, 6, n), n_pages=8)
+
+def _assert_equal(a: Detections, b: Detections) -> None:
+    np.testing.assert_array_equal(a.xywh, b.xywh)
+    np.testing.assert_array_equal(a.conf, b.conf)
+    np.testing.assert_array_equal(a.cls, b.cls)
+    np.testing.assert_array_equal(a.page, b.page)
+    assert a.n_pages == b.n_pages
+
+def test_boxes_are_grouped_by_page():
+    detections = _detections()
+    assert (np.diff(detections.page) >= 0).all()
+    assert detections.xywh.dtype == np.float32 and detections.cls.dtype == np.uint8
+    assert detections.offsets[-1] == len(detections) and len(detections.offsets) == 9
+
+def test_page_view_shares_memory():
+    detections = _detections()
+    for i, page in enumerate(detections.iter_pages()):
+        part = detections.page_slice(i)
+        assert np.shares_memory(page.xywh, detections.xywh) or part.start == part.stop
+        np.testing.assert_array_equal(page.conf, detections.conf[part])
+        assert page.n_pages == 1 and (page.page == 0).all()
+    with pytest.raises(IndexError):
+        detections.page_view(8)
+
+def test_single_page_defaults():
+    assert Detections(np.empty((0, 4)), [], []).n_pages == 1
+    assert Detections([[0, 0, 1, 1]], [0.5], [2]).n_pages == 1
+
+@pytest.mark.parametrize("cls", [[300], [-1]])
+def test_out_of_range_class_ids_are_rejected(cls):
+    with pytest.raises(ValueError):
+        Detections([[0, 0, 1, 1]], [0.5], cls)
+
+def test_length_mismatch():
+    with pytest.raises(ValueError):
+        Detections([[0, 0, 1, 1]], [0.5, 0.6], [1])
+
+def test_concatenate_shifts_pages():
+    a, b = _detections(0), _detections(1)
+    joined = Detections.concatenate([a, b])
+    assert joined.n_pages == 16 and len(joined) == len(a) + len(b)
+    _assert_equal(joined.page_view(9), b.page_view(1))
+
+def test_dict_round_trip():
+    detections = _detections()
+    pages = detections.to_page_dicts()
+    assert len(pages) == 8
+    rebuilt = Detections.concatenate([Detections.from_dicts(page) for page in pages])
+    _assert_equal(rebuilt, detections)
+
+def test_filter_keeps_pages():
+    detections = _detections()
+    kept = detections.filter(detections.conf > 0.5)
+    assert kept.n_pages == 8 and (kept.conf > 0.5).all()
+
+@pytest.mark.parametrize("suffix", [".npz", ".arrow", ".feather"])
+def test_save_load_round_trip(tmp_path, suffix):
+    if suffix != ".npz":
+        pytest.importorskip("pyarrow")
+    detections = _detections()
+    path = str(tmp_path / f"detections{suffix}")
+    detections.save(path)
+    _assert_equal(Detections.load(path), detections)
+
+def test_save_load_empty(tmp_path):
+    empty = Detections(np.empty((0, 4)), [], [], n_pages=3)
+    path = str(tmp_path / "empty.npz")
+    empty.save(path)
+    _assert_equal(Detections.load(path), empty)
+
+def test_unsupported_file_type(tmp_path):
+    with pytest.raises(ValueError):
+        _detections().save(str(tmp_path / "detections.csv"))
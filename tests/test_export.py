@@ -0,0 +1,103 @@
+"""
+Tests for streaming detection export.
+"""
+
+import json
+import numpy as np
+import pytest
+from yolo_detector.detections import Detections
+from yolo_detector import export
+from yolo_detector.export import (
+    DEFAULT_EXPORT_FORMATS,
+    DetectionExporter,
+    _BufferedWriter
+)
+
+def _pages() -> list:
+    rng = np.random.default_rng(0)
+    pages = []
+    for i, n in enumerate([3, 0, 5, 2]):
+        xy = rng.random((n, 2)) * 400
+        pages.append(
+            (
+                f"/data/ch{i % 2}/p{i}.jpg",
+                Detections(
+                    np.concatenate([xy, rng.random((n, 2)) * 100 + 1], axis=1),
+                    rng.random(n),
+                    rng.integers(0, 5, n),
+                ),
+                (1000, 800),
+            )
+        )
+    return pages
+
+def test_writer_base_is_abstract():
+    with pytest.raises(TypeError):
+        _BufferedWriter()
+
+def test_all_formats(tmp_path):
+    formats = ["jsonl", "coco", "yolo"]
+    try:
+        import pyarrow  # noqa: F401
+        formats.append("parquet")
+    except ImportError:
+        pass
+    pages = _pages()
+    with DetectionExporter(
+        str(tmp_path), formats, buffer_pages=3, save_conf=True
+    ) as ex:
+        for page in pages:
+            ex.write(*page)
+
+    lines = (tmp_path / "detections.jsonl").read_text().splitlines()
+    assert [json.loads(line)["image"] for line in lines] == [p[0] for p in pages]
+    assert [len(json.loads(line)["detections"]) for line in lines] == [3, 0, 5, 2]
+
+    coco = json.loads((tmp_path / "detections_coco.json").read_text())
+    assert [image["id"] for image in coco["images"]] == [1, 2, 3, 4]
+    assert [a["id"] for a in coco["annotations"]] == list(range(1, 11))
+    assert [a["image_id"] for a in coco["annotations"]] == [1] * 3 + [3] * 5 + [4] * 2
+    assert len(coco["categories"]) == 5
+
+    rows = np.loadtxt(tmp_path / "labels" / "p2.txt", ndmin=2)
+    detections = pages[2][1]
+    np.testing.assert_array_equal(rows[:, 0], detections.cls)
+    np.testing.assert_allclose(
+        rows[:, 3:5], detections.xywh[:, 2:] / [800, 1000], atol=1e-6
+    )
+    assert (tmp_path / "labels" / "p1.txt").read_text() == ""
+
+    if "parquet" in formats:
+        import pyarrow.parquet as pq
+        table = pq.read_table(tmp_path / "detections.parquet")
+        assert table.num_rows == 10
+        assert table.column("image").to_pylist() == (
+            [pages[0][0]] * 3 + [pages[2][0]] * 5 + [pages[3][0]] * 2
+        )
+
+def test_label_name_collision_raises(tmp_path):
+    detections = Detections([[0, 0, 10, 10]], [0.5], [0])
+    with DetectionExporter(str(tmp_path), ["yolo"]) as ex:
+        ex.write("/a/p1.jpg", detections, (100, 100))
+        with pytest.raises(ValueError, match="p1.txt"):
+            ex.write("/b/p1.jpg", detections, (100, 100))
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        DetectionExporter(str(tmp_path), ["csv"])
+
+def _no_pyarrow():
+    raise ImportError("pyarrow is required for Parquet")
+
+def test_default_formats_need_no_pyarrow(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "_import_pyarrow", _no_pyarrow)
+    with DetectionExporter(str(tmp_path)) as ex:
+        assert tuple(ex.writers) == DEFAULT_EXPORT_FORMATS
+        ex.write(*_pages()[0])
+    assert (tmp_path / "detections.jsonl").exists()
+
+def test_failed_writer_removes_the_others(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "_import_pyarrow", _no_pyarrow)
+    with pytest.raises(ImportError):
+        DetectionExporter(str(tmp_path), ["jsonl", "coco", "yolo", "parquet"])
+    assert not any(tmp_path.iterdir())
@@ -0,0 +1,106 @@
+"""
+Tests for the pre-resized image cache.
+"""
+
+import os
+import re
+import numpy as np
+import pytest
+import yaml
+from PIL import Image
+from yolo_detector.data_utils import split_image_paths
+from yolo_detector.image_cache import build_resized_cache, resized_shape
+
+@pytest.fixture
+def dataset(tmp_path):
+    """Data YAML of a tree dataset: three train pages and one val page."""
+    base = tmp_path / "data"
+    for split, names in (("train", ["a", "b", "c"]), ("val", ["d"])):
+        (base / "images" / split).mkdir(parents=True)
+        (base / "labels" / split).mkdir(parents=True)
+        for i, name in enumerate(names):
+            Image.new("RGB", (100 + 20 * i, 60)).save(
+                base / "images" / split / f"{name}.jpg"
+            )
+            label = base / "labels" / split / f"{name}.txt"
+            label.write_text(f"{i} 0.5 0.5 0.2 0.2\n")
+    data_yaml = base / "data.yaml"
+    data_yaml.write_text(yaml.safe_dump({"path": str(base), "train": "images/train",
+                                         "val": "images/val", "names": {0: "bubble"}}))
+    return data_yaml
+
+def _build(data_yaml, capsys, imgsz=32, **kwargs) -> tuple:
+    """Cached data YAML and the ``(resized, reused, removed)`` counts."""
+    cached_yaml = build_resized_cache(str(data_yaml), imgsz, workers=1, **kwargs)
+    report = re.findall(r"(\d+) images resized, (\d+) reused, (\d+) removed",
+                        capsys.readouterr().out)
+    with open(cached_yaml) as f:
+        return yaml.safe_load(f), tuple(int(n) for n in report[-1])
+
+def test_first_build_resizes_every_image(dataset, capsys):
+    cached, counts = _build(dataset, capsys)
+    assert counts == (4, 0, 0)
+    assert cached["path"].endswith("cache_32")
+    train = split_image_paths(cached["path"], cached["train"])
+    assert [os.path.basename(p) for p in train] == ["a.jpg", "b.jpg", "c.jpg"]
+    for path, width in zip(train, (100, 120, 140)):
+        h, w = resized_shape(60, width, 32)
+        with Image.open(path) as im:
+            assert im.size == (w, h) and w == 32
+        assert np.load(os.path.splitext(path)[0] + ".npy").shape == (h, w, 3)
+    label = os.path.join(cached["path"], "labels", "train", "b.txt")
+    assert open(label).read() == "1 0.5 0.5 0.2 0.2\n"
+
+def test_unchanged_sources_are_reused(dataset, capsys):
+    _build(dataset, capsys)
+    _, counts = _build(dataset, capsys)
+    assert counts == (0, 4, 0)
+
+def test_changed_source_is_resized_again(dataset, capsys):
+    cached, _ = _build(dataset, capsys)
+    # A taller page: the copy's long side moves from width to height
+    Image.new("RGB", (40, 80)).save(dataset.parent / "images" / "train" / "b.jpg")
+    os.utime(dataset.parent / "images" / "train" / "b.jpg", ns=(1, 1))
+    cached, counts = _build(dataset, capsys)
+    assert counts == (1, 3, 0)
+    with Image.open(os.path.join(cached["path"], "images", "train", "b.jpg")) as im:
+        assert im.size == (16, 32)
+
+def test_removed_source_removes_its_copy(dataset, capsys):
+    cached, _ = _build(dataset, capsys)
+    os.remove(dataset.parent / "images" / "train" / "c.jpg")
+    _, counts = _build(dataset, capsys)
+    assert counts == (0, 3, 1)
+    for rel in ("images/train/c.jpg", "images/train/c.npy", "labels/train/c.txt"):
+        assert not os.path.exists(os.path.join(cached["path"], rel))
+
+def test_list_files_keep_order_and_repeats(dataset, capsys):
+    base = dataset.parent
+    images = base / "images" / "train"
+    (base / "images" / "train_rfs.txt").write_text(
+        "".join(f"{images / name}.jpg\n" for name in ("c", "a", "c", "b"))
+    )
+    data = yaml.safe_load(dataset.read_text())
+    dataset.write_text(yaml.safe_dump(dict(data, train="images/train_rfs.txt")))
+    cached, counts = _build(dataset, capsys)
+    assert counts == (4, 0, 0)
+    train = split_image_paths(cached["path"], cached["train"])
+    assert [os.path.basename(p) for p in train] == ["c.jpg", "a.jpg", "c.jpg", "b.jpg"]
+    assert all(p.startswith(cached["path"]) and os.path.exists(p) for p in train)
+
+def test_each_image_size_has_its_own_cache(dataset, capsys):
+    small, _ = _build(dataset, capsys, imgsz=32)
+    large, counts = _build(dataset, capsys, imgsz=48)
+    assert counts == (4, 0, 0)
+    assert small["path"] != large["path"]
+    assert os.path.isdir(small["path"])
+    _, counts = _build(dataset, capsys, imgsz=32)
+    assert counts == (0, 4, 0)
+
+def test_shared_cache_root_is_rebuilt_for_a_new_size(dataset, capsys, tmp_path):
+    root = str(tmp_path / "cache")
+    _build(dataset, capsys, imgsz=32, cache_root=root)
+    cached, counts = _build(dataset, capsys, imgsz=48, cache_root=root)
+    assert counts == (4, 0, 0)
+    with Image.open(os.path.join(root, "images", "val", "d.jpg")) as im:
+        assert max(im.size) == 48
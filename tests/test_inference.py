@@ -0,0 +1,105 @@
+"""
+Tests for tiled inference, with a stand-in model.
+"""
+
+import tracemalloc
+import numpy as np
+import pytest
+import torch
+from yolo_detector.inference import run_tiled_inference, tile_windows
+
+class _Boxes:
+    def __init__(self, rows):
+        rows = torch.tensor(rows, dtype=torch.float32).reshape(-1, 6)
+        self.xyxy, self.conf, self.cls = rows[:, :4], rows[:, 4], rows[:, 5]
+
+class _Result:
+    def __init__(self, rows):
+        self.boxes = _Boxes(rows)
+
+class PageModel:
+    """
+    Returns the parts of fixed page-coordinate boxes that fall inside each
+    tile, in tile coordinates, as a detector would see them.
+    """
+
+    def __init__(self, page_boxes):
+        self.page_boxes = np.asarray(page_boxes, dtype=np.float32)
+
+    def predict(self, views, **kwargs):
+        results = []
+        for view in views:
+            # Tiles are views into the page, so their offset is recoverable
+            x1, y1 = view[0, 0, :2]
+            rows = []
+            for bx1, by1, bx2, by2, conf, cls in self.page_boxes.tolist():
+                cx1, cy1 = max(bx1, x1), max(by1, y1)
+                cx2, cy2 = min(bx2, x1 + view.shape[1]), min(by2, y1 + view.shape[0])
+                if cx2 - cx1 > 2 and cy2 - cy1 > 2:
+                    rows.append([cx1 - x1, cy1 - y1, cx2 - x1, cy2 - y1, conf, cls])
+            results.append(_Result(rows))
+        return results
+
+def _page(height, width):
+    """Page whose first two channels hold each pixel's x and y, for PageModel."""
+    ys, xs = np.mgrid[:height, :width]
+    return np.stack([xs, ys, np.zeros_like(xs)], axis=-1).astype(np.int32)
+
+def test_tile_windows_cover_the_page():
+    windows = tile_windows(1400, 640, tile=640, overlap=128)
+    np.testing.assert_array_equal(windows, [[0, 0, 640, 640], [0, 512, 640, 1152],
+                                            [0, 760, 640, 1400]])
+    np.testing.assert_array_equal(tile_windows(300, 200, 640), [[0, 0, 200, 300]])
+    with pytest.raises(ValueError):
+        tile_windows(100, 100, tile=64, overlap=64)
+
+def _run(page_boxes, height=1400, width=640):
+    model = PageModel(page_boxes)
+    (xyxy, conf, cls), = run_tiled_inference(model, [_page(height, width)], tile=640,
+                                             overlap=128, batch_size=2)
+    order = np.lexsort((xyxy[:, 1], xyxy[:, 0]))
+    return xyxy[order], conf[order], cls[order]
+
+def test_box_cut_by_a_seam_is_fused():
+    # Crosses the bottom of the first tile; the band shared with the second is y 512-640
+    xyxy, conf, cls = _run([[100, 480, 300, 700, 0.9, 0]])
+    np.testing.assert_allclose(xyxy, [[100, 480, 300, 700]])
+    np.testing.assert_array_equal(cls, [0])
+
+def test_neighbouring_boxes_in_one_tile_stay_apart():
+    boxes = [[100, 100, 400, 400, 0.9, 3], [300, 300, 420, 420, 0.8, 3],
+             [450, 100, 600, 300, 0.7, 3]]
+    xyxy, conf, _ = _run(boxes)
+    np.testing.assert_allclose(xyxy, np.array(boxes)[[0, 1, 2], :4])
+
+def test_box_inside_the_overlap_is_reported_once():
+    xyxy, conf, cls = _run([[100, 530, 300, 620, 0.9, 1], [100, 800, 300, 900, 0.8, 2]])
+    np.testing.assert_allclose(xyxy, [[100, 530, 300, 620], [100, 800, 300, 900]])
+    np.testing.assert_array_equal(cls, [1, 2])
+
+def test_seam_pieces_of_different_classes_are_not_fused():
+    xyxy, _, cls = _run([[100, 480, 300, 600, 0.9, 0], [100, 560, 300, 700, 0.8, 3]])
+    assert len(xyxy) == 2
+
+def _strip_peak(height, width=800):
+    """Boxes found and peak traced bytes of tiled inference on a tall strip."""
+    rng = np.random.default_rng(0)
+    n = height // 40
+    x, y = rng.random(n) * (width - 150), rng.random(n) * (height - 100)
+    w, h = rng.random(n) * 120 + 30, rng.random(n) * 80 + 20
+    model = PageModel(np.stack([x, y, x + w, y + h, rng.random(n),
+                                rng.integers(0, 3, n)], axis=1))
+    page = _page(height, width)
+    tracemalloc.start()
+    try:
+        (_, conf, _), = run_tiled_inference(model, [page], tile=640, overlap=128)
+        return len(conf), tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def test_merge_memory_per_box_stays_flat_as_the_strip_grows():
+    short_boxes, short_peak = _strip_peak(3000)
+    tall_boxes, tall_peak = _strip_peak(12000)
+    assert tall_boxes > 3 * short_boxes
+    # Pairwise matrices over the whole page would make this ~4x
+    assert tall_peak / tall_boxes < 1.5 * short_peak / short_boxes
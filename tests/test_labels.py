@@ -0,0 +1,163 @@
+"""
+Tests for reading and scanning YOLO label files.
+"""
+
+import os
+import numpy as np
+import pytest
+from yolo_detector import labels
+from yolo_detector.labels import (
+    count_classes_in_label_file,
+    default_index_path,
+    read_label_file,
+    read_label_files,
+    scan_labels
+)
+
+def _write(folder, name: str, text: str, mtime_ns: int = None) -> None:
+    path = os.path.join(folder, name + ".txt")
+    with open(path, "w") as f:
+        f.write(text)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_detection_rows(tmp_path):
+    _write(tmp_path, "a", "0 0.5 0.4 0.2 0.1\n\n  3 1 0 1e-1 .25  \n")
+    boxes, bad = read_label_file(str(tmp_path / "a.txt"))
+    assert boxes.dtype == np.float32
+    np.testing.assert_allclose(boxes, [[0, 0.5, 0.4, 0.2, 0.1], [3, 1, 0, 0.1, 0.25]])
+    assert bad == []
+
+def test_polygon_rows_become_bounding_boxes(tmp_path):
+    _write(tmp_path, "a", "2 0.1 0.2 0.5 0.2 0.5 0.6 0.1 0.6\n1 0.5 0.5 0.2 0.2\n")
+    boxes, bad = read_label_file(str(tmp_path / "a.txt"))
+    np.testing.assert_allclose(
+        boxes, [[2, 0.3, 0.4, 0.4, 0.4], [1, 0.5, 0.5, 0.2, 0.2]], atol=1e-6
+    )
+    assert bad == []
+
+@pytest.mark.parametrize("row", [
+    "0 0.5 0.5 0.1",                        # too few fields
+    "0 0.5 0.5 0.1 0.1 0.3",                # six fields: neither box nor polygon
+    "0 0.1 0.1 0.2 0.2 0.3 0.3 0.4",        # polygon with an odd coordinate count
+    "a 0.5 0.5 0.1 0.1",                    # non-numeric class
+    "0 0.5 nan 0.1 0.1",
+    "0 0.5 0.5 x 0.1",
+    "-1 0.5 0.5 0.1 0.1",                   # negative class
+    "1.5 0.5 0.5 0.1 0.1",                  # fractional class
+    "0 1.5 0.5 0.1 0.1",                    # outside the normalized range
+    "0 0.1 0.2 0.5 y 0.5 0.6 0.1 0.6",      # non-numeric polygon point
+    "0 0.1 0.2 1.5 0.2 0.5 0.6 0.1 0.6",
+])
+def test_malformed_rows_are_skipped_and_reported(tmp_path, row):
+    _write(tmp_path, "a", f"0 0.5 0.5 0.1 0.1\n{row}\n\n1 0.2 0.2 0.1 0.1\n")
+    boxes, bad = read_label_file(str(tmp_path / "a.txt"))
+    np.testing.assert_array_equal(boxes[:, 0], [0, 1])
+    assert bad == [2]
+
+def test_batch_read_keeps_files_apart(tmp_path):
+    _write(tmp_path, "a", "0 0.5 0.5 0.1 0.1\nbad row\n")
+    _write(tmp_path, "b", "")
+    _write(tmp_path, "c", "1 0.5 0.5 0.1 0.1\n2 0.1 0.1 0.2 0.1 0.2 0.2\n0 2 0 0 0\n")
+    paths = [str(tmp_path / f"{name}.txt") for name in "abc"]
+    boxes, offsets, malformed = read_label_files(paths)
+    np.testing.assert_array_equal(offsets, [0, 1, 1, 3])
+    np.testing.assert_array_equal(boxes[:, 0], [0, 1, 2])
+    assert malformed == {paths[0]: [2], paths[2]: [3]}
+
+def test_missing_file_reads_as_empty(tmp_path):
+    boxes, bad = read_label_file(str(tmp_path / "missing.txt"))
+    assert boxes.shape == (0, 5) and bad == []
+
+def test_count_classes(tmp_path):
+    _write(
+        tmp_path,
+        "a",
+        "0 0.5 0.5 0.1 0.1\n4 0.5 0.5 0.1 0.1\n4 0.1 0.1 0.1 0.1\n0 0.5\n",
+    )
+    assert count_classes_in_label_file(str(tmp_path / "a.txt")) == {0: 1, 4: 2}
+
+@pytest.fixture
+def parsed(monkeypatch):
+    """Records the label files :func:`scan_labels` actually parses."""
+    seen = []
+    parse_many = labels._parse_many
+
+    def spy(paths, *args):
+        seen.extend(os.path.basename(p) for p in paths)
+        return parse_many(paths, *args)
+
+    monkeypatch.setattr(labels, "_parse_many", spy)
+    return seen
+
+def _assert_same(table, expected):
+    assert table.names == expected.names
+    np.testing.assert_array_equal(table.counts, expected.counts)
+    np.testing.assert_array_equal(table.boxes, expected.boxes)
+    np.testing.assert_array_equal(table.offsets, expected.offsets)
+
+def test_scan_labels_counts_and_boxes(tmp_path):
+    _write(tmp_path, "a", "0 0.5 0.5 0.1 0.1\n2 0.5 0.5 0.2 0.2\n2 0.1 0.1 0.1 0.1\n")
+    _write(tmp_path, "b", "")
+    _write(tmp_path, "c", "1 0.3 0.3 0.1 0.1\n")
+    table = scan_labels(str(tmp_path), workers=1)
+    assert table.names == ["a", "b", "c"]
+    np.testing.assert_array_equal(table.counts, [[1, 0, 2], [0, 0, 0], [0, 1, 0]])
+    assert table.boxes_for("a").shape == (3, 5)
+    assert table.classes("c") == [1]
+    assert dict(table.class_totals()) == {0: 1, 1: 1, 2: 2}
+
+def test_index_is_reused_when_nothing_changed(tmp_path, parsed):
+    folder = tmp_path / "raw_labels"
+    folder.mkdir()
+    _write(folder, "a", "0 0.5 0.5 0.1 0.1\n")
+    _write(folder, "b", "1 0.5 0.5 0.1 0.1\n")
+    first = scan_labels(str(folder), cache=True)
+    assert os.path.exists(default_index_path(str(folder)))
+    assert sorted(parsed) == ["a.txt", "b.txt"]
+    parsed.clear()
+    _assert_same(scan_labels(str(folder), cache=True), first)
+    assert parsed == []
+
+def test_only_changed_files_are_reparsed(tmp_path, parsed):
+    _write(tmp_path, "a", "0 0.5 0.5 0.1 0.1\n", mtime_ns=10**18)
+    _write(tmp_path, "b", "1 0.5 0.5 0.1 0.1\n", mtime_ns=10**18)
+    _write(tmp_path, "c", "1 0.5 0.5 0.1 0.1\n", mtime_ns=10**18)
+    index = str(tmp_path / "index.npz")
+    scan_labels(str(tmp_path), cache=index)
+    parsed.clear()
+
+    # Same size, new mtime; a new file with a new class; a removed file
+    _write(tmp_path, "b", "3 0.5 0.5 0.1 0.1\n", mtime_ns=2 * 10**18)
+    _write(tmp_path, "d", "4 0.5 0.5 0.1 0.1\n")
+    os.remove(tmp_path / "c.txt")
+    table = scan_labels(str(tmp_path), cache=index)
+    assert sorted(parsed) == ["b.txt", "d.txt"]
+    _assert_same(table, scan_labels(str(tmp_path), workers=1))
+    assert table.classes("b") == [3]
+    assert "c" not in table
+
+def test_size_change_with_same_mtime_is_reparsed(tmp_path, parsed):
+    _write(tmp_path, "a", "0 0.5 0.5 0.1 0.1\n", mtime_ns=10**18)
+    index = str(tmp_path / "index.npz")
+    scan_labels(str(tmp_path), cache=index)
+    parsed.clear()
+    _write(tmp_path, "a", "0 0.5 0.5 0.1 0.1\n1 0.5 0.5 0.1 0.1\n", mtime_ns=10**18)
+    assert scan_labels(str(tmp_path), cache=index).classes("a") == [0, 1]
+    assert parsed == ["a.txt"]
+
+def test_unreadable_or_outdated_index_is_rebuilt(tmp_path, parsed):
+    _write(tmp_path, "a", "0 0.5 0.5 0.1 0.1\n")
+    index = str(tmp_path / "index.npz")
+    with open(index, "wb") as f:
+        f.write(b"not an npz file")
+    first = scan_labels(str(tmp_path), cache=index)
+    assert parsed == ["a.txt"]
+
+    with np.load(index) as data:
+        saved = dict(data)
+    saved["version"] = np.int64(labels.INDEX_VERSION - 1)
+    np.savez(index, **saved)
+    parsed.clear()
+    _assert_same(scan_labels(str(tmp_path), cache=index), first)
+    assert parsed == ["a.txt"]
@@ -0,0 +1,108 @@
+"""
+Tests for the decode -> infer -> write pipeline, including its shutdown paths.
+"""
+
+import threading
+import pytest
+from yolo_detector.pipeline import run_pipeline
+
+def _infer(items, payloads):
+    return [payload + 1 for payload in payloads]
+
+def _run(items, decode=lambda item: item * 10, infer=_infer, write=None, **kwargs):
+    """
+    Run the pipeline on a watchdog thread and fail if it does not finish.
+
+    Returns:
+        Tuple of (written ``(item, payload, output)`` entries, stats)
+    """
+    written = []
+    lock = threading.Lock()
+
+    def default_write(item, payload, output):
+        with lock:
+            written.append((item, payload, output))
+
+    outcome = {}
+
+    def target():
+        try:
+            outcome["stats"] = run_pipeline(items, decode, infer,
+                                            write or default_write, **kwargs)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout=20)
+    assert not thread.is_alive(), "pipeline did not shut down"
+    if "error" in outcome:
+        raise outcome["error"]
+    return sorted(written), outcome["stats"]
+
+@pytest.mark.parametrize("batch_size", [1, 3, 64])
+def test_every_item_is_written(batch_size):
+    written, stats = _run(range(50), batch_size=batch_size, queue_size=2)
+    assert written == [(i, i * 10, i * 10 + 1) for i in range(50)]
+    assert stats["decode"]["items"] == stats["infer"]["items"] == 50
+    assert stats["write"]["items"] == 50
+    assert stats["bottleneck"] in ("decode", "infer", "write")
+
+def test_decode_returning_none_skips_the_item():
+    written, stats = _run(range(10), decode=lambda i: None if i % 3 == 0 else i)
+    assert [item for item, _, _ in written] == [1, 2, 4, 5, 7, 8]
+    assert stats["infer"]["items"] == 6
+
+def test_empty_input():
+    written, stats = _run([])
+    assert written == [] and stats["write"]["items"] == 0
+
+@pytest.mark.parametrize("n_items", [3, 200])
+def test_decode_exception_is_raised(n_items):
+    def decode(i):
+        if i == 2:
+            raise ValueError("corrupt page")
+        return i
+    with pytest.raises(ValueError, match="corrupt page"):
+        _run(range(n_items), decode=decode, queue_size=2)
+
+@pytest.mark.parametrize("n_items", [3, 200])
+def test_infer_exception_is_raised(n_items):
+    def infer(batch, payloads):
+        if 2 in batch:
+            raise RuntimeError("out of memory")
+        return payloads
+    with pytest.raises(RuntimeError, match="out of memory"):
+        _run(range(n_items), infer=infer, batch_size=2, queue_size=2)
+
+@pytest.mark.parametrize("n_items", [1, 3, 200])
+def test_writer_exception_is_raised(n_items):
+    # With few items the feeder is already done when the writer fails, so
+    # shutdown must not wait on the decode queue
+    def write(item, payload, output):
+        raise OSError("disk full")
+    with pytest.raises(OSError, match="disk full"):
+        _run(range(n_items), write=write, queue_size=1, write_workers=2)
+
+def test_items_iterator_exception_is_raised():
+    def items():
+        yield from range(5)
+        raise KeyError("listing failed")
+    with pytest.raises(KeyError, match="listing failed"):
+        _run(items())
+
+def test_writer_failure_while_waiting_for_input():
+    # The inference loop is blocked on an empty decode queue when the writer
+    # fails, and the feeder gives up on its next item
+    failed = threading.Event()
+
+    def items():
+        yield 0
+        failed.wait(timeout=10)
+        yield from range(1, 5)
+
+    def write(item, payload, output):
+        failed.set()
+        raise OSError("disk full")
+    with pytest.raises(OSError, match="disk full"):
+        _run(items(), write=write)
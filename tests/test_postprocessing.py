@@ -0,0 +1,259 @@
+"""
+Tests for post-processing: overlap merging, class-priority suppression and rules.
+"""
+
+import numpy as np
+import pytest
+import torch
+import yaml
+from yolo_detector.detections import Detections
+from yolo_detector.postprocessing import (
+    CLASS_PRIORITY,
+    DEFAULT_RULES,
+    apply_post_processing_rules,
+    apply_rules,
+    box_overlap,
+    compile_rules,
+    merge_overlaps,
+    suppress_overlaps
+)
+
+def random_boxes(n: int, seed: int = 0, n_classes: int = 3) -> tuple:
+    """Clustered corner boxes, so that many of them overlap."""
+    rng = np.random.default_rng(seed)
+    centres = rng.random((max(1, n // 4), 2)) * 500
+    xy = centres[rng.integers(0, len(centres), n)] + rng.normal(0, 8, (n, 2))
+    wh = rng.random((n, 2)) * 80 + 20
+    xyxy = np.concatenate([xy, xy + wh], axis=1).astype(np.float32)
+    return xyxy, rng.random(n).astype(np.float32), rng.integers(0, n_classes, n)
+
+def reference_nms(xyxy, conf, cls, threshold):
+    """Box-by-box greedy per-class NMS: indices kept, by decreasing confidence."""
+    kept = []
+    for i in sorted(range(len(conf)), key=lambda i: -conf[i]):
+        x1, y1, x2, y2 = xyxy[i].tolist()
+        for j in kept:
+            if cls[j] != cls[i]:
+                continue
+            kx1, ky1, kx2, ky2 = xyxy[j].tolist()
+            inter = max(0.0, min(x2, kx2) - max(x1, kx1)) * max(
+                0.0, min(y2, ky2) - max(y1, ky1)
+            )
+            union = (x2 - x1) * (y2 - y1) + (kx2 - kx1) * (ky2 - ky1) - inter
+            if inter / union > threshold:
+                break
+        else:
+            kept.append(i)
+    return kept
+
+def test_box_overlap():
+    a = np.array([[0, 0, 10, 10]])
+    b = np.array([[5, 0, 15, 10], [0, 0, 5, 5], [20, 20, 30, 30], [3, 3, 3, 8]])
+    np.testing.assert_allclose(box_overlap(a, b, "iou"), [[50 / 150, 25 / 100, 0, 0]])
+    np.testing.assert_allclose(box_overlap(a, b, "ios"), [[0.5, 1, 0, 0]])
+    with pytest.raises(ValueError):
+        box_overlap(a, b, "dice")
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("threshold", [0.3, 0.6])
+def test_merge_overlaps_matches_greedy_nms(seed, threshold):
+    xyxy, conf, cls = random_boxes(120, seed)
+    kept_xyxy, kept_conf, kept_cls = merge_overlaps(xyxy, conf, cls, threshold)
+    expected = reference_nms(xyxy, conf, cls, threshold)
+    assert len(expected) < len(conf)
+    np.testing.assert_array_equal(kept_conf, conf[expected])
+    np.testing.assert_array_equal(kept_xyxy, xyxy[expected])
+    np.testing.assert_array_equal(kept_cls, cls[expected])
+
+def test_merge_overlaps_keeps_other_classes():
+    xyxy = np.array([[0, 0, 10, 10], [0, 0, 10, 10], [0, 0, 10, 10]])
+    _, conf, cls = merge_overlaps(xyxy, [0.9, 0.8, 0.7], [0, 1, 0])
+    np.testing.assert_allclose(conf, [0.9, 0.8])
+    np.testing.assert_array_equal(cls, [0, 1])
+
+def test_fuse_grows_the_kept_box_transitively():
+    # b overlaps a; c only overlaps the union of a and b
+    xyxy = np.array([[0, 0, 10, 10], [8, 0, 18, 10], [17, 0, 27, 10]])
+    fused, conf, _ = merge_overlaps(xyxy, [0.9, 0.8, 0.7], [0, 0, 0], threshold=0.05,
+                                    metric="ios", fuse=True)
+    np.testing.assert_array_equal(fused, [[0, 0, 27, 10]])
+    np.testing.assert_allclose(conf, [0.9])
+
+def test_pairs_restrict_which_boxes_merge():
+    xyxy = np.array([[100, 100, 400, 400], [300, 300, 420, 420], [380, 380, 500, 500]])
+    pairs = np.zeros((3, 3), dtype=bool)
+    pairs[1, 2] = pairs[2, 1] = True
+    fused, conf, _ = merge_overlaps(xyxy, [0.9, 0.8, 0.7], [3, 3, 3], threshold=0.1,
+                                    metric="ios", fuse=True,
+                                    pairs=lambda a, b: pairs[a, b])
+    np.testing.assert_array_equal(fused, [[100, 100, 400, 400], [300, 300, 500, 500]])
+
+def test_merge_overlaps_empty():
+    xyxy, conf, cls = merge_overlaps(np.empty((0, 4)), [], [])
+    assert xyxy.shape == (0, 4) and len(conf) == len(cls) == 0
+
+def reference_suppress(detections: Detections, threshold: float) -> list:
+    """Box-by-box class-priority suppression within each page: kept indices."""
+    rank = {c: i for i, c in enumerate(CLASS_PRIORITY)}
+    order = sorted(range(len(detections)),
+                   key=lambda i: (detections.page[i], rank[int(detections.cls[i])],
+                                  -float(detections.conf[i])))
+    xyxy = detections.xyxy.astype(np.float64)
+    kept = []
+    for i in order:
+        same_page = [j for j in kept if detections.page[j] == detections.page[i]]
+        if not same_page or box_overlap(xyxy[[i]], xyxy[same_page]).max() <= threshold:
+            kept.append(i)
+    return sorted(kept)
+
+def _detections(n_pages: int, per_page: int, seed: int = 0) -> Detections:
+    parts = [random_boxes(per_page, seed + p, n_classes=5) for p in range(n_pages)]
+    xyxy = np.concatenate([p[0] for p in parts])
+    return Detections(np.concatenate([xyxy[:, :2], xyxy[:, 2:] - xyxy[:, :2]], axis=1),
+                      np.concatenate([p[1] for p in parts]),
+                      np.concatenate([p[2] for p in parts]),
+                      np.repeat(np.arange(n_pages), per_page), n_pages)
+
+@pytest.mark.parametrize("threshold", [0.3, 0.6])
+def test_suppress_overlaps_matches_reference(threshold):
+    detections = _detections(3, 80)
+    kept = suppress_overlaps(detections, threshold)
+    expected = reference_suppress(detections, threshold)
+    assert len(expected) < len(detections)
+    np.testing.assert_array_equal(kept.conf, detections.conf[expected])
+    np.testing.assert_array_equal(kept.page, detections.page[expected])
+    assert kept.n_pages == 3
+
+def test_container_wins_over_text_of_higher_confidence():
+    detections = Detections([[0, 0, 100, 50], [2, 2, 98, 48], [300, 0, 50, 50]],
+                            [0.5, 0.95, 0.9], [0, 3, 3])
+    kept = suppress_overlaps(detections)
+    np.testing.assert_array_equal(kept.cls, [0, 3])
+    np.testing.assert_allclose(kept.conf, [0.5, 0.9])
+
+def test_pages_are_resolved_separately():
+    detections = Detections([[0, 0, 100, 50], [0, 0, 100, 50]], [0.5, 0.9], [0, 3],
+                            page=[0, 1], n_pages=2)
+    assert len(suppress_overlaps(detections)) == 2
+
+def test_merge_mode_grows_the_kept_box():
+    detections = Detections([[0, 0, 100, 50], [5, 5, 105, 52]], [0.5, 0.9], [0, 3])
+    kept = suppress_overlaps(detections, mode="merge")
+    np.testing.assert_allclose(kept.xywh, [[0, 0, 110, 57]])
+    np.testing.assert_array_equal(detections.xywh[0], [0, 0, 100, 50])
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        suppress_overlaps(_detections(1, 5), mode="vote")
+
+class _Boxes:
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = torch.as_tensor(xyxy, dtype=torch.float32)
+        self.conf = torch.as_tensor(conf, dtype=torch.float32)
+        self.cls = torch.as_tensor(cls, dtype=torch.float32)
+
+class _Result:
+    def __init__(self, *boxes):
+        self.boxes = _Boxes(*boxes)
+
+def legacy_post_processing(results) -> list:
+    """The original per-box rules, before vectorization and the rule engine."""
+    pages = []
+    for result in results:
+        page = []
+        for box, conf, cls in zip(
+            result.boxes.xyxy, result.boxes.conf, result.boxes.cls
+        ):
+            x1, y1, x2, y2 = box.tolist()
+            conf, cls = conf.item(), int(cls.item())
+            width, height = x2 - x1, y2 - y1
+            aspect_ratio = width / height if height else 0
+            if 0.9 < aspect_ratio < 1.1 and cls == 0 and conf < 0.9:
+                cls = 1
+            if width / height > 3.0 and cls != 3 and conf < 0.85:
+                cls = 3
+            page.append({'x': x1, 'y': y1, 'width': width, 'height': height,
+                         'confidence': conf, 'class': cls})
+        pages.append(page)
+    return pages
+
+def _results(n_pages: int, per_page: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    results = []
+    for _ in range(n_pages):
+        xy = rng.random((per_page, 2)) * 1000
+        wh = rng.random((per_page, 2)) * 200 + 1
+        # Some near-square and some very wide boxes, so both rules fire
+        wh[::4, 0] = wh[::4, 1] * rng.uniform(0.85, 1.15, len(wh[::4]))
+        wh[1::4, 0] = wh[1::4, 1] * rng.uniform(2.5, 5, len(wh[1::4]))
+        results.append(
+            _Result(
+                np.concatenate([xy, xy + wh], axis=1),
+                rng.random(per_page),
+                rng.integers(0, 5, per_page),
+            )
+        )
+    return results
+
+def test_default_rules_match_legacy_rules():
+    results = _results(4, 200)
+    # Boxes on the thresholds: conf is float32(0.9), and the float32 aspect
+    # rounds to exactly 3.0 while the float64 one is just above it
+    results.append(_Result([[0, 0, 100, 100], [0.01, 0, 300.01, 100],
+                            [0, 0, 300, 100], [0, 0, 100, 100]],
+                           [0.9, 0.5, 0.85, 0.5], [0, 0, 0, 0]))
+    expected = legacy_post_processing(results)
+    pages = apply_post_processing_rules(results, as_dicts=True, overlaps=None)
+    changed = 0
+    for result, page, expected_page in zip(results, pages, expected):
+        assert [d['class'] for d in page] == [d['class'] for d in expected_page]
+        for d, e in zip(page, expected_page):
+            assert d == pytest.approx(e, rel=1e-5, abs=1e-3)
+        changed += int((result.boxes.cls.numpy() != [d['class'] for d in page]).sum())
+    assert changed > 0
+    assert [d['class'] for d in pages[-1]] == [1, 3, 0, 1]
+
+def test_overlaps_are_kept_unless_asked():
+    results = [_Result([[0, 0, 100, 50], [2, 2, 100, 50]], [0.9, 0.8], [0, 3])]
+    assert len(apply_post_processing_rules(results)) == 2
+    assert len(apply_post_processing_rules(results, overlaps="suppress")) == 1
+
+def test_rules_from_yaml_file(tmp_path):
+    path = tmp_path / "rules.yaml"
+    path.write_text(yaml.safe_dump(DEFAULT_RULES))
+    xyxy, conf, cls = (np.array([[0, 0, 10, 10], [0, 0, 40, 10]]), [0.5, 0.5], [0, 0])
+    from_file = apply_rules(xyxy, conf, cls, rules=str(path))
+    np.testing.assert_array_equal(from_file['cls'], [1, 3])
+    np.testing.assert_array_equal(from_file['cls'], apply_rules(xyxy, conf, cls)['cls'])
+
+def test_rules_run_in_order_and_drop():
+    spec = {"rules": [
+        {"when": {"cls": "bubble", "area": {"lt": 50}}, "drop": True},
+        {"when": {"cls": [0, "ui"]}, "set_cls": "other"},
+        {"when": {"cls_not": ["other"], "conf": {"ge": 0.5, "le": 0.7}}, "set_cls": 3},
+    ]}
+    xyxy = np.array([[0, 0, 5, 5], [0, 0, 20, 20], [0, 0, 20, 20], [0, 0, 20, 20]])
+    out = apply_rules(xyxy, [0.9, 0.9, 0.6, 0.6], [0, 0, 1, 4], rules=spec)
+    np.testing.assert_array_equal(out['cls'], [2, 3, 2])
+    np.testing.assert_allclose(out['conf'], [0.9, 0.6, 0.6])
+
+def test_custom_names():
+    rules = compile_rules({"rules": [{"when": {"cls": "frame"}, "set_cls": "caption"}]},
+                          names={0: "frame", 1: "caption"})
+    out = apply_rules(np.array([[0, 0, 5, 5]]), [0.5], [0], rules=rules)
+    np.testing.assert_array_equal(out['cls'], [1])
+
+@pytest.mark.parametrize("rule, message", [
+    ({"when": {"cls": ["balloon"]}, "set_cls": 1}, "Unknown class name"),
+    ({"when": {"cls": [0]}, "set_cls": 300}, "Unknown class id"),
+    ({"when": {"cls": [7]}, "drop": True}, "Unknown class id"),
+    ({"when": {"cls": [0], "cls_not": [1]}, "set_cls": 2}, "either cls or cls_not"),
+    ({"when": {"colour": {"lt": 1}}, "set_cls": 2}, "unknown condition"),
+    ({"when": {"conf": {"below": 1}}, "set_cls": 2}, "unknown comparison"),
+    ({"when": {"conf": 0.5}, "set_cls": 2}, "needs comparisons"),
+    ({"when": {"conf": {"lt": 0.5}}}, "exactly one action"),
+    ({"when": {"conf": {"lt": 0.5}}, "set_cls": 2, "drop": True}, "exactly one action"),
+])
+def test_spec_errors(rule, message):
+    with pytest.raises(ValueError, match=message):
+        compile_rules({"rules": [rule]})
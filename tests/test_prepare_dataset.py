@@ -0,0 +1,138 @@
+"""
+Tests for incremental dataset preparation in scripts/prepare_dataset.py.
+"""
+
+import os
+import re
+import pytest
+from PIL import Image
+from conftest import _write_dataset
+from scripts.prepare_dataset import load_prepare_manifest, main
+from yolo_detector.data_utils import split_image_paths, split_source
+
+@pytest.fixture
+def raw(tmp_path):
+    """Input folder with ``raw_images`` holding small valid JPEGs."""
+    images, _ = _write_dataset(tmp_path / "raw")
+    for name in os.listdir(images):
+        Image.new("RGB", (8, 8)).save(os.path.join(images, name))
+    return tmp_path / "raw"
+
+def _prepare(raw, out, capsys=None, **kwargs):
+    """Incremental run; the prepared files and, with *capsys*, the delta size."""
+    main(str(raw), str(out), workers=1, incremental=True, **kwargs)
+    files = load_prepare_manifest(str(out))["files"]
+    if capsys is None:
+        return files
+    reports = re.findall(r"New or changed: (\d+) train, (\d+) val; removed: (\d+)",
+                         capsys.readouterr().out)
+    return files, [int(n) for n in reports[-1]]
+
+def _outputs(out) -> dict:
+    """Image names each split of *out* trains on, from its list file or folder."""
+    return {
+        split: sorted(os.path.basename(p) for p in
+                      split_image_paths(str(out), split_source(str(out), split)))
+        for split in ("train", "val")
+    }
+
+def _expected(files: dict) -> dict:
+    return {split: sorted(f for f, entry in files.items() if entry["split"] == split)
+            for split in ("train", "val")}
+
+def _add_page(raw, name: str, row: str = "0 0.5 0.5 0.1 0.1") -> None:
+    Image.new("RGB", (8, 8)).save(raw / "raw_images" / f"{name}.jpg")
+    (raw / "raw_labels" / f"{name}.txt").write_text(row + "\n")
+
+def test_first_run_places_every_labelled_page(raw, tmp_path):
+    files = _prepare(raw, tmp_path / "out")
+    assert len(files) == 55
+    assert _outputs(tmp_path / "out") == _expected(files)
+
+def test_new_pages_keep_the_existing_split(raw, tmp_path, capsys):
+    out = tmp_path / "out"
+    before = _prepare(raw, out)
+    _add_page(raw, "new1")
+    _add_page(raw, "new2", "4 0.5 0.5 0.1 0.1")
+    after, (n_train, n_val, n_removed) = _prepare(raw, out, capsys)
+    assert (n_train + n_val, n_removed) == (2, 0)
+    assert {f: after[f]["split"] for f in before} == {
+        f: entry["split"] for f, entry in before.items()
+    }
+    assert {"new1.jpg", "new2.jpg"} <= set(after)
+    assert _outputs(out) == _expected(after)
+
+def test_unchanged_rerun_places_nothing(raw, tmp_path, capsys):
+    out = tmp_path / "out"
+    before = _prepare(raw, out)
+    after, delta = _prepare(raw, out, capsys)
+    assert delta == [0, 0, 0]
+    assert after == before
+
+def test_changed_label_is_placed_again(raw, tmp_path, capsys):
+    out = tmp_path / "out"
+    before = _prepare(raw, out)
+    page = sorted(before)[0]
+    label = raw / "raw_labels" / page.replace(".jpg", ".txt")
+    # A new file, not an in-place edit, so a hard-linked output goes stale
+    replacement = label.with_suffix(".new")
+    replacement.write_text("2 0.5 0.5 0.3 0.3\n")
+    os.replace(replacement, label)
+    after, (n_train, n_val, _) = _prepare(raw, out, capsys)
+    assert n_train + n_val == 1
+    split = after[page]["split"]
+    assert split == before[page]["split"]
+    assert (out / "labels" / split / label.name).read_text() == "2 0.5 0.5 0.3 0.3\n"
+
+def test_removed_source_removes_its_outputs(raw, tmp_path, capsys):
+    out = tmp_path / "out"
+    before = _prepare(raw, out)
+    page = sorted(before)[0]
+    stem = page.replace(".jpg", "")
+    os.remove(raw / "raw_images" / page)
+    os.remove(raw / "raw_labels" / f"{stem}.txt")
+    after, (_, _, n_removed) = _prepare(raw, out, capsys)
+    split = before[page]["split"]
+    assert n_removed == 1 and page not in after
+    assert not (out / "images" / split / page).exists()
+    assert not (out / "labels" / split / f"{stem}.txt").exists()
+    assert _outputs(out) == _expected(after)
+
+def test_new_split_ratio_moves_pages_between_splits(raw, tmp_path, capsys):
+    out = tmp_path / "out"
+    before = _prepare(raw, out)
+    after, (_, _, n_removed) = _prepare(raw, out, capsys, split_ratio=0.5)
+    moved = [f for f in before if after[f]["split"] != before[f]["split"]]
+    assert moved and n_removed == len(moved)
+    for page in moved:
+        old, new = before[page]["split"], after[page]["split"]
+        label = page.replace(".jpg", ".txt")
+        assert not (out / "images" / old / page).exists()
+        assert not (out / "labels" / old / label).exists()
+        assert (out / "images" / new / page).exists()
+        assert (out / "labels" / new / label).exists()
+    assert _outputs(out) == _expected(after)
+
+def test_switching_between_tree_and_manifest_layouts(raw, tmp_path):
+    out = tmp_path / "out"
+    files = _prepare(raw, out)
+    files = _prepare(raw, out, link_mode="manifest")
+    assert split_source(str(out), "train") == os.path.join("images", "train.txt")
+    assert _outputs(out) == _expected(files)
+    assert load_prepare_manifest(str(out))["format"] == "manifest"
+
+    files = _prepare(raw, out)
+    assert split_source(str(out), "train") == os.path.join("images", "train")
+    assert _outputs(out) == _expected(files)
+    assert load_prepare_manifest(str(out))["format"] == "tree"
+
+def test_tree_copies_of_pages_removed_during_a_manifest_run_are_removed(raw, tmp_path):
+    out = tmp_path / "out"
+    before = _prepare(raw, out)
+    _prepare(raw, out, link_mode="manifest")
+    page = sorted(before)[0]
+    os.remove(raw / "raw_images" / page)
+    os.remove(raw / "raw_labels" / page.replace(".jpg", ".txt"))
+    after = _prepare(raw, out)
+    assert not (out / "images" / before[page]["split"] / page).exists()
+    assert _outputs(out) == _expected(after)
@@ -0,0 +1,77 @@
+"""
+Tests for training profiles and their hardware resolution.
+"""
+
+import pytest
+import yaml
+from yolo_detector import profiles
+from yolo_detector.profiles import (
+    CPU_BATCH,
+    DDP_BATCH_PER_GPU,
+    load_profile,
+    parse_overrides,
+    resolve_profile
+)
+
+@pytest.fixture
+def gpus(monkeypatch):
+    """Set the number of CUDA devices resolve_profile sees."""
+    def set_count(n: int) -> None:
+        monkeypatch.setattr(profiles, "gpu_count", lambda: n)
+    monkeypatch.setattr(profiles, "usable_cpus", lambda: 8)
+    return set_count
+
+def _resolve(name: str, **overrides) -> dict:
+    # A fixed cache, so no memory or disk probing happens
+    settings = load_profile(name, dict({"cache": False}, **overrides))
+    return resolve_profile(settings, n_images=100, imgsz=640, data_dir=".")
+
+def test_gpu_profile_falls_back_to_cpu(gpus, capsys):
+    gpus(0)
+    resolved = _resolve("single-gpu-fast")
+    assert resolved["device"] == "cpu"
+    assert resolved["batch"] == CPU_BATCH
+    assert resolved["amp"] is False
+    assert resolved["workers"] == 7
+    assert "No CUDA device found for device=0" in capsys.readouterr().out
+
+def test_auto_profile_without_gpu(gpus):
+    gpus(0)
+    resolved = _resolve("auto")
+    assert resolved["device"] == "cpu"
+    assert resolved["batch"] == CPU_BATCH
+    assert resolved["amp"] is False
+
+def test_explicit_batch_is_kept_on_cpu(gpus):
+    gpus(0)
+    assert _resolve("single-gpu-fast", batch=12)["batch"] == 12
+
+@pytest.mark.parametrize("n_gpus, device, batch, workers", [
+    (1, 0, -1, 7),
+    (2, "0,1", 2 * DDP_BATCH_PER_GPU, 3),
+])
+def test_auto_profile_on_gpus(gpus, n_gpus, device, batch, workers):
+    gpus(n_gpus)
+    resolved = _resolve("auto")
+    assert resolved["device"] == device
+    assert resolved["batch"] == batch
+    assert resolved["workers"] == workers
+    assert resolved["amp"] is True
+
+def test_yaml_profile_extends_a_base(tmp_path):
+    path = tmp_path / "profile.yaml"
+    path.write_text(yaml.safe_dump({"base": "cpu-debug", "epochs": 5}))
+    settings = load_profile(str(path), {"batch": 2})
+    assert (settings["device"], settings["epochs"], settings["batch"]) == ("cpu", 5, 2)
+    path.write_text(yaml.safe_dump({"base": "tpu"}))
+    with pytest.raises(ValueError):
+        load_profile(str(path))
+    with pytest.raises(ValueError):
+        load_profile("no-such-profile")
+
+def test_parse_overrides():
+    assert parse_overrides(["batch=8", "cache=disk", "amp=false"]) == {
+        "batch": 8, "cache": "disk", "amp": False
+    }
+    with pytest.raises(ValueError):
+        parse_overrides(["batch"])
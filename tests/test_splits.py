@@ -0,0 +1,125 @@
+"""
+Tests for the single-pass stratified split.
+"""
+
+import os
+import random
+from collections import Counter
+import numpy as np
+import pytest
+from yolo_detector.data_utils import generate_splits, stratified_split
+from yolo_detector.labels import scan_labels
+from yolo_detector.splits import split_balance
+
+def _classes(label_path: str) -> Counter:
+    counts = Counter()
+    with open(label_path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 5:
+                counts[int(parts[0])] += 1
+    return counts
+
+def baseline_stratified_split(raw_images_dir, raw_labels_dir, split_ratio=0.8):
+    """The original split, which rescanned every earlier assignment per image."""
+    image_files = [f for f in os.listdir(raw_images_dir)
+                   if f.lower().endswith((".jpg", ".jpeg", ".png"))]
+
+    def label_of(img_file):
+        return os.path.join(raw_labels_dir, os.path.splitext(img_file)[0] + ".txt")
+
+    total_class_counts = Counter()
+    for img_file in image_files:
+        if os.path.exists(label_of(img_file)):
+            total_class_counts.update(_classes(label_of(img_file)))
+
+    random.seed(42)
+    image_assignments = {}
+    all_images = list(image_files)
+    random.shuffle(all_images)
+    for img_file in all_images:
+        if not os.path.exists(label_of(img_file)):
+            continue
+        train_vote = val_vote = 0
+        for cls in _classes(label_of(img_file)):
+            cls_train = sum(
+                1
+                for img in image_assignments
+                if cls in _classes(label_of(img)) and image_assignments[img] == 'train'
+            )
+            cls_val = sum(
+                1
+                for img in image_assignments
+                if cls in _classes(label_of(img)) and image_assignments[img] == 'val'
+            )
+            if (
+                cls_train + cls_val == 0
+                or cls_train / (cls_train + cls_val) < split_ratio
+            ):
+                train_vote += 1
+            else:
+                val_vote += 1
+        image_assignments[img_file] = 'train' if train_vote >= val_vote else 'val'
+    train_files = [img for img, split in image_assignments.items() if split == 'train']
+    val_files = [img for img, split in image_assignments.items() if split == 'val']
+    return train_files, val_files, total_class_counts
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("split_ratio", [0.8, 0.5])
+def test_stratified_split_matches_baseline(make_dataset, seed, split_ratio):
+    raw_images, raw_labels = make_dataset(f"data{seed}", seed=seed)
+    expected = baseline_stratified_split(raw_images, raw_labels, split_ratio)
+    assert stratified_split(raw_images, raw_labels, split_ratio, workers=1) == expected
+
+def test_stratified_split_with_cache_matches_baseline(raw_dataset):
+    expected = baseline_stratified_split(*raw_dataset)
+    for _ in range(2):      # builds the label index, then reuses it
+        assert stratified_split(*raw_dataset, cache=True) == expected
+
+def test_assigned_images_keep_their_split(raw_dataset):
+    train, val, _ = stratified_split(*raw_dataset)
+    assigned = {f: "train" for f in train[:10]}
+    assigned.update({f: "val" for f in val[:5]})
+    new_train, new_val, _ = stratified_split(*raw_dataset, assigned=assigned)
+    assert set(train[:10]) <= set(new_train)
+    assert set(val[:5]) <= set(new_val)
+    assert sorted(new_train + new_val) == sorted(train + val)
+
+def test_iterative_split_covers_every_labelled_image(raw_dataset):
+    train, val, _ = stratified_split(*raw_dataset, method="iterative")
+    greedy_train, greedy_val, _ = stratified_split(*raw_dataset)
+    assert not set(train) & set(val)
+    assert sorted(train + val) == sorted(greedy_train + greedy_val)
+
+def _max_error(raw_labels, train, val, split_ratio=0.8) -> float:
+    files = train + val
+    presence = scan_labels(raw_labels, workers=1).presence(
+        [os.path.splitext(f)[0] for f in files]
+    )
+    val_mask = np.arange(len(files)) >= len(train)
+    return split_balance(presence, val_mask, 1 - split_ratio)["max_error"]
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_iterative_split_balances_rare_classes_better(make_dataset, seed):
+    raw_images, raw_labels = make_dataset(f"data{seed}", seed=seed)
+    greedy = _max_error(raw_labels, *stratified_split(raw_images, raw_labels)[:2])
+    iterative = _max_error(
+        raw_labels, *stratified_split(raw_images, raw_labels, method="iterative")[:2]
+    )
+    assert iterative < greedy
+
+def test_unknown_method_raises(raw_dataset):
+    with pytest.raises(ValueError):
+        stratified_split(*raw_dataset, method="random")
+
+def test_generate_splits(raw_dataset):
+    splits, balance = generate_splits(*raw_dataset, folds=3, seeds=[7], cache=False)
+    assert sorted(splits) == ["fold0", "fold1", "fold2", "seed7"]
+    val_files = [f for name in ("fold0", "fold1", "fold2") for f in splits[name][1]]
+    assert sorted(val_files) == sorted(splits["seed7"][0] + splits["seed7"][1])
+    assert set(balance) == set(splits)
+
+@pytest.mark.parametrize("folds, seeds", [(0, []), (1, []), (-2, [1])])
+def test_generate_splits_rejects_empty_requests(raw_dataset, folds, seeds):
+    with pytest.raises(ValueError):
+        generate_splits(*raw_dataset, folds=folds, seeds=seeds, cache=False)
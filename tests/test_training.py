@@ -0,0 +1,68 @@
+"""
+Tests for repeat-factor sampling.
+"""
+
+import os
+from collections import Counter
+import numpy as np
+import pytest
+import yaml
+from yolo_detector.training import repeat_factors, write_repeat_factor_yaml
+
+def test_repeat_factors_formula():
+    # Class 0 is in every image, class 1 in one of ten, class 2 in two
+    presence = np.zeros((10, 4), dtype=bool)
+    presence[:, 0] = True
+    presence[0, 1] = True
+    presence[[0, 1], 2] = True
+    factors = repeat_factors(presence, threshold=0.4)
+    np.testing.assert_allclose(factors[:3], [2.0, np.sqrt(2.0), 1.0])
+    np.testing.assert_array_equal(factors[3:], 1.0)
+
+def test_repeat_factors_without_labels():
+    np.testing.assert_array_equal(repeat_factors(np.zeros((3, 2), dtype=bool)), 1.0)
+    assert repeat_factors(np.zeros((0, 5), dtype=bool)).shape == (0,)
+
+@pytest.fixture
+def data_yaml(tmp_path):
+    """Twenty training pages; class 1 only appears on the first two."""
+    images, labels = tmp_path / "images" / "train", tmp_path / "labels" / "train"
+    images.mkdir(parents=True)
+    labels.mkdir(parents=True)
+    for i in range(20):
+        (images / f"p{i:02d}.jpg").write_bytes(b"")
+        rows = ["0 0.5 0.5 0.1 0.1"] + (["1 0.2 0.2 0.1 0.1"] if i < 2 else [])
+        (labels / f"p{i:02d}.txt").write_text("\n".join(rows) + "\n")
+    path = tmp_path / "data.yaml"
+    path.write_text(yaml.safe_dump({"path": str(tmp_path), "train": "images/train",
+                                    "val": "images/train", "names": {0: "a", 1: "b"}}))
+    return path
+
+def _entries(rfs_yaml: str) -> tuple:
+    """The resampled data YAML and how often each image is listed."""
+    with open(rfs_yaml) as f:
+        data = yaml.safe_load(f)
+    with open(os.path.join(data["path"], data["train"])) as f:
+        return data, Counter(os.path.basename(line.strip()) for line in f)
+
+def test_repeat_factor_list_repeats_rare_class_images(data_yaml):
+    rfs_yaml = write_repeat_factor_yaml(str(data_yaml), threshold=0.5, workers=1)
+    assert rfs_yaml == str(data_yaml.parent / "data_rfs.yaml")
+    data, counts = _entries(rfs_yaml)
+    assert data["train"] == os.path.join("images", "train_rfs.txt")
+    assert data["val"] == "images/train"
+
+    # Class 1 is in 10% of the images: factor sqrt(0.5 / 0.1), seeded rounding
+    factors = np.r_[[np.sqrt(5.0)] * 2, [1.0] * 18]
+    expected = np.floor(factors).astype(np.int64)
+    expected += np.random.default_rng(42).random(20) < factors - expected
+    assert [counts[f"p{i:02d}.jpg"] for i in range(20)] == expected.tolist()
+    assert all(counts[f"p{i:02d}.jpg"] in (2, 3) for i in range(2))
+
+def test_repeat_factor_rounding_is_seeded(data_yaml):
+    first = _entries(write_repeat_factor_yaml(str(data_yaml), 0.5, seed=3))[1]
+    again = _entries(write_repeat_factor_yaml(str(data_yaml), 0.5, seed=3))[1]
+    assert first == again
+    others = [_entries(write_repeat_factor_yaml(str(data_yaml), 0.5, seed=s))[1]
+              for s in range(4)]
+    assert any(counts != first for counts in others)
@@ -2,22 +2,69 @@
 YOLO manga bubble detector package.
 """
 
+from .labels import (
+    LABEL_DTYPE,
+    LabelTable,
+    read_label_file,
+    read_label_files,
+    scan_labels
+)
+
 from .data_utils import (
+    LINK_MODES,
+    SPLIT_METHODS,
+    check_image,
     count_classes_in_label_file,
+    generate_splits,
+    link_pool,
     move_files,
-    reload_and_save_images
+    reload_and_save_images,
+    repair_images,
+    write_split_manifests
 )
 
 from .training import (
+    SAMPLING_MODES,
     compute_class_weights,
+    repeat_factors,
+    split_class_counts,
     write_data_yaml,
     train_model
 )
 
-from .postprocessing import apply_post_processing_rules
+from .detections import Detections
+
+from .postprocessing import (
+    CLASS_NAMES,
+    CLASS_PRIORITY,
+    DEFAULT_RULES,
+    OVERLAP_MODES,
+    RuleSet,
+    apply_rules,
+    apply_post_processing_rules,
+    box_overlap,
+    compile_rules,
+    detections_to_dicts,
+    merge_overlaps,
+    suppress_overlaps
+)
+
+from .export import DEFAULT_EXPORT_FORMATS, EXPORT_FORMATS, DetectionExporter
+
+from .image_cache import build_resized_cache, resized_shape
+
+from .profiles import PROFILES, load_profile, resolve_profile
+
+from .splits import iterative_stratify, kfold_assign, split_balance
+
+from .pipeline import run_pipeline
 
 from .inference import (
-    run_folder_inference
+    auto_batch_size,
+    run_batched_inference,
+    run_folder_inference,
+    run_tiled_inference,
+    tile_windows
 )
 
 __all__ = [
@@ -26,12 +73,56 @@ __all__ = [
 
 __all__ = [
     'count_classes_in_label_file',
+    'LABEL_DTYPE',
+    'LabelTable',
+    'read_label_file',
+    'read_label_files',
+    'scan_labels',
+    'LINK_MODES',
+    'SPLIT_METHODS',
+    'generate_splits',
+    'link_pool',
     'move_files',
+    'check_image',
     'reload_and_save_images',
+    'repair_images',
+    'write_split_manifests',
+    'build_resized_cache',
+    'resized_shape',
+    'iterative_stratify',
+    'kfold_assign',
+    'split_balance',
+    'SAMPLING_MODES',
     'compute_class_weights',
+    'repeat_factors',
+    'split_class_counts',
     'write_data_yaml',
     'train_model',
+    'PROFILES',
+    'load_profile',
+    'resolve_profile',
+    'Detections',
+    'CLASS_NAMES',
+    'DEFAULT_RULES',
+    'RuleSet',
+    'compile_rules',
+    'apply_rules',
     'apply_post_processing_rules',
+    'detections_to_dicts',
+    'box_overlap',
+    'merge_overlaps',
+    'CLASS_PRIORITY',
+    'OVERLAP_MODES',
+    'suppress_overlaps',
+    'EXPORT_FORMATS',
+    'DEFAULT_EXPORT_FORMATS',
+    'DetectionExporter',
     'run_inference',
+    'auto_batch_size',
+    'run_batched_inference',
+    'run_folder_inference',
+    'run_tiled_inference',
+    'tile_windows',
+    'run_pipeline',
     'print_detections'
 ]
@@ -2,97 +2,448 @@
 Utility functions for handling dataset operations.
 """
 
+import io
 import os
+import sys
+import json
 import random
 import shutil
+import time
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from PIL import Image, ImageFile
 from collections import Counter
+import numpy as np
+from .labels import count_classes_in_label_file, scan_labels
+from .splits import iterative_stratify, kfold_assign, split_balance
 
 ImageFile.LOAD_TRUNCATED_IMAGES = True  # allow truncated image loading
 
-def count_classes_in_label_file(label_path: str) -> Counter:
-    """
-    Count how many instances of each class index appear in a YOLO label file.
-
-    Parameters
-    ----------
-    label_path : str
-        Path to a `.txt` file whose lines follow the YOLO format:
-        ``<class_id> x_center y_center width height``
-
-    Returns
-    -------
-    collections.Counter
-        Mapping ``class_id -> instance_count``.
-    """
-    class_counts = Counter()
-    try:
-        with open(label_path, "r") as f:
-            for line in f:
-                parts = line.strip().split()
-                if len(parts) >= 5:          # valid YOLO row
-                    class_id = int(parts[0])
-                    class_counts[class_id] += 1
-    except Exception as e:                  # file missing / unreadable
-        print(f"Error reading {label_path}: {e}")
-    return class_counts
-
-def stratified_split(raw_images_dir, raw_labels_dir, split_ratio=0.8):
+def _labelled_images(raw_images_dir: str, table) -> tuple[list[str], dict]:
+    """Images of *raw_images_dir* and the classes of those that have labels."""
     image_files = [
         f for f in os.listdir(raw_images_dir)
         if f.lower().endswith((".jpg", ".jpeg", ".png"))
     ]
-    total_class_counts: Counter[int] = Counter()
+    labelled = {}
     for img_file in image_files:
         name, _ = os.path.splitext(img_file)
-        label_path = os.path.join(raw_labels_dir, name + ".txt")
-        if os.path.exists(label_path):
-            total_class_counts.update(count_classes_in_label_file(label_path))
+        if name in table:
+            labelled[img_file] = table.classes(name)
+    return image_files, labelled
 
-    class_to_images: dict[int, list[str]] = {cid: [] for cid in total_class_counts}
-    for img_file in image_files:
-        name, _ = os.path.splitext(img_file)
-        lbl_path = os.path.join(raw_labels_dir, name + ".txt")
-        if os.path.exists(lbl_path):
-            for cid in count_classes_in_label_file(lbl_path):
-                class_to_images[cid].append(img_file)
-
-    import random
-    random.seed(42)
-    image_assignments = {}
+def _greedy_split(image_files: list[str], labelled: dict, split_ratio: float, seed: int,
+                  assigned: dict = None) -> tuple[list[str], list[str]]:
+    """Train/val voting pass of :func:`stratified_split`."""
+    rng = random.Random(seed)
     all_images = list(image_files)
-    random.shuffle(all_images)
+    rng.shuffle(all_images)
+
+    cls_train: Counter[int] = Counter()
+    cls_val: Counter[int] = Counter()
+    train_files, val_files = [], []
+    if assigned:
+        for img_file in all_images:
+            split = assigned.get(img_file)
+            if img_file not in labelled or split is None:
+                continue
+            if split == "train":
+                train_files.append(img_file)
+                cls_train.update(labelled[img_file])
+            else:
+                val_files.append(img_file)
+                cls_val.update(labelled[img_file])
+        all_images = [f for f in all_images if f not in assigned]
+
     for img_file in all_images:
-        name, _ = os.path.splitext(img_file)
-        lbl_path = os.path.join(raw_labels_dir, name + ".txt")
-        if not os.path.exists(lbl_path):
+        if img_file not in labelled:
             continue
-        classes_in_image = list(count_classes_in_label_file(lbl_path).keys())
+        classes_in_image = labelled[img_file]
         train_vote = 0
         val_vote = 0
         for cls in classes_in_image:
-            cls_train = sum([1 for img in image_assignments if cls in count_classes_in_label_file(os.path.join(raw_labels_dir, os.path.splitext(img)[0] + ".txt")) and image_assignments[img] == 'train'])
-            cls_val = sum([1 for img in image_assignments if cls in count_classes_in_label_file(os.path.join(raw_labels_dir, os.path.splitext(img)[0] + ".txt")) and image_assignments[img] == 'val'])
-            cls_total = cls_train + cls_val
-            if cls_total == 0:
+            cls_total = cls_train[cls] + cls_val[cls]
+            if cls_total == 0 or cls_train[cls] / cls_total < split_ratio:
                 train_vote += 1
             else:
-                train_ratio = cls_train / cls_total
-                if train_ratio < split_ratio:
-                    train_vote += 1
-                else:
-                    val_vote += 1
+                val_vote += 1
         if train_vote >= val_vote:
-            image_assignments[img_file] = 'train'
+            train_files.append(img_file)
+            cls_train.update(classes_in_image)
         else:
-            image_assignments[img_file] = 'val'
-    train_files = [img for img, split in image_assignments.items() if split == 'train']
-    val_files = [img for img, split in image_assignments.items() if split == 'val']
+            val_files.append(img_file)
+            cls_val.update(classes_in_image)
+    return train_files, val_files
+
+SPLIT_METHODS = ("greedy", "iterative")
+
+def _iterative_split(
+    labelled: dict,
+    presence: np.ndarray,
+    split_ratio: float,
+    seed: int,
+    assigned: dict = None,
+) -> tuple[list[str], list[str]]:
+    """Train/val split of the sorted *labelled* images by :func:`iterative_stratify`."""
+    files = sorted(labelled)
+    initial = None
+    if assigned:
+        initial = np.array(
+            [{"train": 0, "val": 1}.get(assigned.get(f), -1) for f in files]
+        )
+    subset = iterative_stratify(presence, (split_ratio, 1 - split_ratio), seed, initial)
+    return ([f for f, j in zip(files, subset) if j == 0],
+            [f for f, j in zip(files, subset) if j == 1])
+
+def stratified_split(raw_images_dir, raw_labels_dir, split_ratio=0.8, workers=None,
+                     cache=False, assigned=None, seed=42, method="greedy"):
+    """
+    Greedily assign labelled images to train/val so every class keeps
+    roughly *split_ratio* of its images in train.
+
+    Each label file is read once (in parallel, see :func:`scan_labels`) and
+    per-class train/val counters are updated as images are assigned, so the
+    split runs in O(N·C) instead of rescanning every earlier assignment.
+    With *cache* the parsed labels persist between runs (see
+    :func:`scan_labels`).
+
+    *assigned* maps image filenames to ``"train"`` or ``"val"`` from an
+    earlier split. Those images keep their split and seed the per-class
+    counters, and only the remaining images are placed greedily, so adding
+    pages never moves an existing one. *seed* sets the visiting order.
+
+    *method* ``"greedy"`` is the original per-image train/val vote;
+    ``"iterative"`` uses :func:`iterative_stratify`, which places the
+    rarest classes first and keeps them much closer to *split_ratio*.
+
+    Returns
+    -------
+    tuple[list[str], list[str], collections.Counter]
+        Train filenames, val filenames and the total instance count per class.
+    """
+    table = scan_labels(raw_labels_dir, workers=workers, cache=cache)
+    image_files, labelled = _labelled_images(raw_images_dir, table)
+    total_class_counts = table.class_totals(
+        [os.path.splitext(img_file)[0] for img_file in labelled]
+    )
+    if method == "greedy":
+        train_files, val_files = _greedy_split(image_files, labelled, split_ratio, seed,
+                                               assigned)
+    elif method == "iterative":
+        presence = table.presence([os.path.splitext(f)[0] for f in sorted(labelled)])
+        train_files, val_files = _iterative_split(labelled, presence, split_ratio, seed,
+                                                  assigned)
+    else:
+        raise ValueError(f"method must be one of {SPLIT_METHODS}, got {method!r}")
     return train_files, val_files, total_class_counts
 
-def move_files(file_list: list[str], img_src: str, lbl_src: str, img_dst: str, lbl_dst: str) -> None:
+def generate_splits(
+    raw_images_dir: str,
+    raw_labels_dir: str,
+    folds: int = 0,
+    seeds: list[int] = (),
+    split_ratio: float = 0.8,
+    workers: int = None,
+    cache: bool = True,
+    method: str = "greedy",
+) -> tuple[dict, dict]:
+    """
+    Build K stratified folds and/or several seeded train/val splits from a
+    single scan of the labels.
+
+    Parameters
+    ----------
+    raw_images_dir, raw_labels_dir : str
+        Raw image and label folders.
+    folds : int
+        Number of cross-validation folds (see :func:`kfold_assign`); fold
+        ``i`` validates on the i-th part and trains on the rest. 0 for none;
+        at least one fold or seed is required.
+    seeds : list[int]
+        One :func:`stratified_split` per seed, with *split_ratio*.
+    split_ratio : float
+        Train fraction of the seeded splits.
+    workers : int, optional
+        Threads used to read label files.
+    cache : bool
+        Reuse and update the persistent label index.
+    method : str
+        ``"greedy"`` (:func:`kfold_assign` and the :func:`stratified_split`
+        vote) or ``"iterative"`` (:func:`iterative_stratify` for both).
+
+    Returns
+    -------
+    tuple[dict, dict]
+        Splits as ``{name: (train_files, val_files)}`` with names
+        ``fold<i>`` and ``seed<s>``, and for each name the class balance of
+        its validation part (see :func:`split_balance`).
+    """
+    if method not in SPLIT_METHODS:
+        raise ValueError(f"method must be one of {SPLIT_METHODS}, got {method!r}")
+    if folds == 1 or folds < 0:
+        raise ValueError(f"folds must be 0 or at least 2, got {folds}")
+    if not folds and not seeds:
+        raise ValueError("No splits requested; give folds of at least 2 or some seeds")
+    table = scan_labels(raw_labels_dir, workers=workers, cache=cache)
+    image_files, labelled = _labelled_images(raw_images_dir, table)
+    files = sorted(labelled)
+    presence = table.presence([os.path.splitext(f)[0] for f in files])
+    splits, balance = {}, {}
+    if folds:
+        if method == "iterative":
+            fold_of = iterative_stratify(presence, [1 / folds] * folds)
+        else:
+            fold_of = kfold_assign(presence, folds)
+        for i in range(folds):
+            val_mask = fold_of == i
+            splits[f"fold{i}"] = ([f for f, v in zip(files, val_mask) if not v],
+                                  [f for f, v in zip(files, val_mask) if v])
+            balance[f"fold{i}"] = split_balance(presence, val_mask, 1 / folds)
+    position = {f: i for i, f in enumerate(files)}
+    for seed in seeds:
+        if method == "iterative":
+            train_files, val_files = _iterative_split(
+                labelled, presence, split_ratio, seed
+            )
+        else:
+            train_files, val_files = _greedy_split(
+                image_files, labelled, split_ratio, seed
+            )
+        val_mask = np.zeros(len(files), dtype=bool)
+        val_mask[[position[f] for f in val_files]] = True
+        splits[f"seed{seed}"] = (train_files, val_files)
+        balance[f"seed{seed}"] = split_balance(presence, val_mask, 1 - split_ratio)
+    return splits, balance
+
+LINK_MODES = ("auto", "copy", "hardlink", "symlink", "reflink", "manifest")
+
+# Fallback order for mode="auto": copy-on-write clone, then hard link, then
+# a real copy (e.g. when the destination is on another device).
+_AUTO_CHAIN = ("reflink", "hardlink", "copy")
+
+_FICLONE = 0x40049409       # Linux ioctl: share extents between two files
+
+def _reflink(src: str, dst: str) -> None:
+    """Clone *src* into *dst* on copy-on-write filesystems (Btrfs, XFS)."""
+    import fcntl
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.remove(dst)
+            raise
+
+def _materialize(src: str, dst: str, mode: str) -> None:
+    """Make *dst* hold the content of *src* using *mode*."""
+    if os.path.lexists(dst):
+        if mode == "hardlink" and os.path.samefile(src, dst):
+            return
+        os.remove(dst)          # never write through an old link into the source
+    if mode == "copy":
+        shutil.copy2(src, dst)  # keeps the mtime, so reruns can skip the file
+    elif mode == "hardlink":
+        os.link(src, dst)
+    elif mode == "symlink":
+        os.symlink(os.path.abspath(src), dst)
+    elif mode == "reflink":
+        if not sys.platform.startswith("linux"):
+            raise OSError("reflink is only supported on Linux")
+        _reflink(src, dst)
+        shutil.copystat(src, dst)
+    else:
+        raise ValueError(f"Unknown link mode {mode!r}")
+
+def _list_dir(folder: str) -> dict:
+    """Map of entry name to ``DirEntry`` for *folder*, empty if it is missing."""
+    try:
+        with os.scandir(folder) as it:
+            return {entry.name: entry for entry in it}
+    except FileNotFoundError:
+        return {}
+
+def _is_identical(src: os.DirEntry, dst: os.DirEntry, mode: str, compare: str) -> bool:
+    """Whether *dst* already is what materializing *src* with *mode* would produce."""
+    if dst.is_symlink():
+        return mode == "symlink" and os.readlink(dst.path) == os.path.abspath(src.path)
+    if mode == "symlink":
+        return False
+    src_stat, dst_stat = src.stat(), dst.stat(follow_symlinks=False)
+    if (src_stat.st_dev, src_stat.st_ino) == (dst_stat.st_dev, dst_stat.st_ino):
+        return True
+    if mode == "hardlink" or src_stat.st_size != dst_stat.st_size:
+        return False
+    if compare == "hash":
+        return _file_digest(src.path) == _file_digest(dst.path)
+    return src_stat.st_mtime_ns == dst_stat.st_mtime_ns
+
+def yolo_label_path(img_path: str) -> str:
+    """
+    Label path Ultralytics derives from an image path: the last
+    ``/images/`` directory becomes ``/labels/`` and the suffix ``.txt``.
+    """
+    sa, sb = f"{os.sep}images{os.sep}", f"{os.sep}labels{os.sep}"
+    return sb.join(img_path.rsplit(sa, 1)).rsplit(".", 1)[0] + ".txt"
+
+def manifest_path(img_dst: str) -> str:
+    """List file written in place of *img_dst* by ``move_files(mode="manifest")``."""
+    return os.path.normpath(img_dst) + ".txt"
+
+def split_source(base_dir: str, split: str) -> str:
+    """
+    Images of a split relative to *base_dir*: the list file
+    ``images/<split>.txt`` written by manifest preparation if there is one,
+    otherwise the ``images/<split>`` directory.
+    """
+    list_file = manifest_path(os.path.join("images", split))
+    if os.path.exists(os.path.join(base_dir, list_file)):
+        return list_file
+    return os.path.join("images", split)
+
+def split_image_paths(base_dir: str, source: str) -> list[str]:
+    """
+    Absolute paths of the images of a split.
+
+    Parameters
+    ----------
+    base_dir : str
+        Base directory containing the dataset.
+    source : str
+        Split entry of the data YAML, an image directory or a list file of
+        image paths, relative to *base_dir*.
+
+    Returns
+    -------
+    list[str]
+        Image paths, in list-file order or sorted for a directory.
+    """
+    path = os.path.join(base_dir, source)
+    if os.path.isfile(path):
+        parent = os.path.dirname(os.path.abspath(path)) + os.sep
+        with open(path) as f:
+            # Ultralytics resolves "./" entries against the list file's folder
+            return [line.replace("./", parent, 1) if line.startswith("./") else line
+                    for line in f.read().splitlines() if line]
+    return sorted(
+        os.path.abspath(os.path.join(path, f)) for f in os.listdir(path)
+        if f.lower().endswith((".jpg", ".jpeg", ".png"))
+    )
+
+def link_pool(
+    output_dir: str, name: str, img_src: str, lbl_src: str
+) -> tuple[str, str]:
     """
-    Copy images and their YOLO label files to destination folders.
+    Expose raw image and label folders at ``images/<name>`` and
+    ``labels/<name>`` under *output_dir* through directory symlinks.
+
+    List files can then name images inside the pool, and Ultralytics finds
+    each label at the sibling path it derives (see :func:`yolo_label_path`)
+    even when the raw folders are not laid out as ``images``/``labels``.
+    Each pool also gets its own Ultralytics label cache
+    (``labels/<name>.cache``).
+
+    Parameters
+    ----------
+    output_dir : str
+        Root of the prepared dataset.
+    name : str
+        Pool name, e.g. ``"pool_train"``.
+    img_src, lbl_src : str
+        Raw image and label folders.
+
+    Returns
+    -------
+    tuple[str, str]
+        Absolute image and label pool paths.
+    """
+    pools = []
+    for kind, src in (("images", img_src), ("labels", lbl_src)):
+        pool = os.path.join(os.path.abspath(output_dir), kind, name)
+        target = os.path.abspath(src)
+        if os.path.islink(pool):
+            if os.readlink(pool) != target:
+                os.remove(pool)
+        elif os.path.exists(pool):
+            raise ValueError(f"{pool} exists and is not a pool link")
+        if not os.path.lexists(pool):
+            os.makedirs(os.path.dirname(pool), exist_ok=True)
+            os.symlink(target, pool, target_is_directory=True)
+        pools.append(pool)
+    return pools[0], pools[1]
+
+def _write_manifest(img_dst: str, img_src: str, lbl_src: str, names: list[str]) -> int:
+    """Write the list file of *img_dst* naming *names* inside *img_src*."""
+    # Every image sits in img_src and every label in lbl_src under the same
+    # stem, so checking the folder Ultralytics derives once is enough
+    img_root, lbl_root = os.path.abspath(img_src), os.path.abspath(lbl_src)
+    derived = os.path.dirname(yolo_label_path(os.path.join(img_root, "page.jpg")))
+    if derived != lbl_root:
+        raise ValueError(
+            f"Ultralytics would look for the labels of {img_root} in {derived}, "
+            f"not {lbl_root}; use a link mode instead"
+        )
+    path = manifest_path(img_dst)
+    with open(path + ".tmp", "w") as f:
+        f.writelines(os.path.join(img_root, name) + "\n" for name in names)
+    os.replace(path + ".tmp", path)
+    return len(names)
+
+def write_split_manifests(output_dir: str, splits: dict, img_src: str,
+                          lbl_src: str) -> dict:
+    """
+    Write each split as a pair of list files, ``images/<name>_train.txt``
+    and ``images/<name>_val.txt``, without copying any image.
+
+    Every list points into its own pool (see :func:`link_pool`) so
+    Ultralytics keeps a separate label cache per list.
+
+    Parameters
+    ----------
+    output_dir : str
+        Root of the prepared dataset.
+    splits : dict
+        ``{name: (train_files, val_files)}``, e.g. from
+        :func:`generate_splits`.
+    img_src, lbl_src : str
+        Raw image and label folders.
+
+    Returns
+    -------
+    dict
+        ``{name: {"train": path, "val": path}}`` of the list files, relative
+        to *output_dir*.
+    """
+    images, labels = _list_dir(img_src), _list_dir(lbl_src)
+    written = {}
+    for name, parts in splits.items():
+        written[name] = {}
+        for part, files in zip(("train", "val"), parts):
+            pool_images, pool_labels = link_pool(output_dir, f"pool_{name}_{part}",
+                                                 img_src, lbl_src)
+            present = [f for f in files
+                       if f in images and os.path.splitext(f)[0] + ".txt" in labels]
+            img_dst = os.path.join(output_dir, "images", f"{name}_{part}")
+            _write_manifest(img_dst, pool_images, pool_labels, present)
+            written[name][part] = os.path.relpath(manifest_path(img_dst), output_dir)
+    return written
+
+def move_files(
+    file_list: list[str],
+    img_src: str,
+    lbl_src: str,
+    img_dst: str,
+    lbl_dst: str,
+    mode: str = "auto",
+    workers: int = None,
+    compare: str = "stat",
+) -> Counter:
+    """
+    Materialize images and their YOLO label files in destination folders.
+
+    Files run on a thread pool. Every folder is listed once up front, and
+    destination files that already match their source are left alone, so
+    re-running on an unchanged dataset touches nothing.
 
     Parameters
     ----------
@@ -106,42 +457,387 @@ def move_files(file_list: list[str], img_src: str, lbl_src: str, img_dst: str, l
         Directory to receive images.
     lbl_dst : str
         Directory to receive label `.txt` files.
+    mode : str
+        ``"copy"``, ``"hardlink"``, ``"symlink"``, ``"reflink"``,
+        ``"auto"`` (reflink, else hard link, else copy, picked per file
+        with fallback) or ``"manifest"``: write the absolute source image
+        paths to ``<img_dst>.txt`` (a YOLO list file) instead of touching
+        any file. Manifest mode needs labels where Ultralytics looks for
+        them (see :func:`yolo_label_path`).
+    workers : int, optional
+        Copy threads; ``None`` lets the executor decide, ``1`` runs serially.
+    compare : str
+        How an existing copy is recognised as up to date: ``"stat"`` (same
+        size and modification time) or ``"hash"`` (same size and content).
+
+    Returns
+    -------
+    collections.Counter
+        Number of files materialized with each method, plus ``"unchanged"``
+        for the files that were already up to date.
     """
+    if mode not in LINK_MODES:
+        raise ValueError(f"mode must be one of {LINK_MODES}, got {mode!r}")
+    if compare not in ("stat", "hash"):
+        raise ValueError(f"compare must be 'stat' or 'hash', got {compare!r}")
+    images, labels = _list_dir(img_src), _list_dir(lbl_src)
+    pairs = []
     for file in file_list:
-        name, _ = os.path.splitext(file)
-        img_path = os.path.join(img_src, file)
-        lbl_path = os.path.join(lbl_src, name + ".txt")
+        name = os.path.splitext(file)[0] + ".txt"
+        if file in images and name in labels:
+            pairs.append(((images[file], file), (labels[name], name)))
+
+    used = Counter()
+    if mode == "manifest":
+        used["manifest"] = _write_manifest(img_dst, img_src, lbl_src,
+                                           [img_name for (_, img_name), _ in pairs])
+        return used
+
+    if os.path.exists(manifest_path(img_dst)):
+        os.remove(manifest_path(img_dst))       # stale list from a manifest run
+    existing = {img_dst: _list_dir(img_dst), lbl_dst: _list_dir(lbl_dst)}
+    chain = list(_AUTO_CHAIN) if mode == "auto" else [mode]
+    lock = threading.Lock()
+
+    def place(src: os.DirEntry, dst_dir: str, name: str) -> tuple:
+        dst = existing[dst_dir].get(name)
+        if dst is not None and _is_identical(
+            src, dst, "copy" if mode == "auto" else mode, compare
+        ):
+            return "unchanged", 0
+        while True:
+            method = chain[0]
+            try:
+                _materialize(src.path, os.path.join(dst_dir, name), method)
+                copied = src.stat().st_size if method in ("copy", "reflink") else 0
+                return method, copied
+            except OSError:
+                with lock:
+                    if len(chain) == 1:
+                        raise
+                    if chain[0] == method:
+                        chain.pop(0)    # stop trying this method for the rest
+
+    def place_pair(pair) -> list:
+        (img, img_name), (lbl, lbl_name) = pair
+        return [place(img, img_dst, img_name), place(lbl, lbl_dst, lbl_name)]
+
+    if workers == 1:
+        outcomes = map(place_pair, pairs)
+        pool = None
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+        outcomes = pool.map(place_pair, pairs)
+    n_bytes = 0
+    report_every = max(500, len(pairs) // 10)
+    start = time.perf_counter()
+    try:
+        for done, outcome in enumerate(outcomes, 1):
+            for method, size in outcome:
+                used[method] += 1
+                n_bytes += size
+            if done % report_every == 0 or done == len(pairs):
+                elapsed = time.perf_counter() - start
+                rate = n_bytes / 1e6 / elapsed if elapsed else 0.0
+                print(f"  {done}/{len(pairs)} pairs -> {img_dst}: "
+                      f"{n_bytes / 1e6:.1f} MB copied at {rate:.1f} MB/s")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return used
+
+REPAIR_MANIFEST = ".repair_manifest.json"
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _load_repair_manifest(folder_path: str) -> dict:
+    path = os.path.join(folder_path, REPAIR_MANIFEST)
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_repair_manifest(folder_path: str, manifest: dict) -> None:
+    path = os.path.join(folder_path, REPAIR_MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+# Bytes read at a time while searching a JPEG backwards for its end marker
+JPEG_EOI_BLOCK = 64 * 1024
+
+def _jpeg_scan_start(f) -> int:
+    """Offset of the first start-of-scan marker, found by walking the header."""
+    pos = 2
+    while True:
+        f.seek(pos)
+        head = f.read(4)
+        if len(head) < 4 or head[0] != 0xFF:
+            return pos
+        if head[1] == 0xDA:
+            return pos
+        pos += 2 + int.from_bytes(head[2:], "big")
+
+def _has_jpeg_end(path: str) -> bool:
+    """
+    Whether a JPEG has an end marker after its scan data.
+
+    The file is searched backwards from its end, so trailers of any size
+    (embedded motion-photo video, editor metadata) are skipped, while the end
+    marker of an EXIF thumbnail in the header does not count.
+    """
+    with open(path, "rb") as f:
+        start = _jpeg_scan_start(f)
+        end = os.fstat(f.fileno()).st_size
+        tail = b""
+        while end > start:
+            pos = max(start, end - JPEG_EOI_BLOCK)
+            f.seek(pos)
+            block = f.read(end - pos) + tail[:1]
+            if b"\xff\xd9" in block:
+                return True
+            tail, end = block, pos
+    return False
+
+class _StrictReader(io.BufferedReader):
+    """
+    Image file that raises at its end once *strict* is set.
+
+    Pillow pads a truncated image instead of failing while
+    ``ImageFile.LOAD_TRUNCATED_IMAGES`` is set, which this module does on
+    import; reading past the end of the data is what gives the truncation away.
+    """
+
+    strict = False
+
+    def read(self, size=-1):
+        data = super().read(size)
+        if self.strict and size != 0 and not data:
+            raise OSError("image file is truncated")
+        return data
 
-        if os.path.exists(img_path) and os.path.exists(lbl_path):
-            shutil.copy(img_path, os.path.join(img_dst, file))
-            shutil.copy(lbl_path, os.path.join(lbl_dst, name + ".txt"))
+def _decode(path: str) -> None:
+    """Decode every pixel of *path*, raising ``OSError`` if the data is cut short."""
+    with _StrictReader(io.FileIO(path)) as f, Image.open(f) as img:
+        f.strict = True
+        img.load()
 
-def reload_and_save_images(folder_path: str) -> int:
+def check_image(path: str, full_decode: bool = True) -> str:
     """
-    Re‑encode every image inside *folder_path* to RGB and overwrite it in place.
+    Check that an image is intact and RGB without rewriting it.
+
+    Parameters
+    ----------
+    path : str
+        Image to check.
+    full_decode : bool
+        Also decode every pixel, which catches truncated data that header
+        and structure checks miss. ``False`` only reads the header and
+        verifies the file structure (PNG chunk CRCs, a JPEG end marker
+        after the scan data).
+
+    Returns
+    -------
+    str or None
+        Why the image needs repair, or ``None`` if it is fine.
+    """
+    try:
+        with Image.open(path) as img:
+            img.verify()
+        with Image.open(path) as img:
+            if img.mode != "RGB":
+                return f"mode {img.mode}"
+            if img.format == "JPEG" and not full_decode and not _has_jpeg_end(path):
+                return "truncated JPEG"
+        if full_decode:
+            _decode(path)
+    except Exception as e:
+        return f"unreadable: {e}"
+    return None
+
+def _rewrite_rgb(path: str) -> None:
+    """Convert *path* to RGB through a temp file, then rename it into place."""
+    folder, filename = os.path.split(path)
+    name, ext = os.path.splitext(filename)
+    tmp_path = os.path.join(folder, f".{name}.repair-{os.getpid()}{ext}")
+    try:
+        with Image.open(path) as img:
+            fmt = img.format
+            img = img.convert("RGB")
+        save_args = {"quality": 95} if fmt == "JPEG" else {}
+        img.save(tmp_path, format=fmt, optimize=True, **save_args)
+        os.replace(tmp_path, path)          # a crash never leaves a half-written image
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _repair_file(task: tuple) -> tuple:
+    """
+    Check one image and repair it if needed (runs in a worker process).
+
+    Returns ``(path, status, reason, bytes_before, bytes_after, manifest_entry)``.
+    """
+    path, entry, verify_only = task
+    problem = None
+    try:
+        size_before = os.path.getsize(path)
+        if (
+            entry
+            and entry["size"] == size_before
+            and entry["sha1"] == _file_digest(path)
+        ):
+            entry = dict(entry, mtime_ns=os.stat(path).st_mtime_ns)
+            return path, "skipped", None, size_before, size_before, entry
+
+        problem = check_image(path, full_decode=not verify_only)
+        if verify_only:
+            return (
+                path,
+                "broken" if problem else "clean",
+                problem,
+                size_before,
+                size_before,
+                None,
+            )
+        status = "clean"
+        if problem:
+            _rewrite_rgb(path)
+            status = "fixed"
+        st = os.stat(path)
+        entry = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha1": _file_digest(path),
+        }
+        return path, status, problem, size_before, st.st_size, entry
+    except Exception as e:
+        reason = f"{problem}; {e}" if problem else str(e)
+        return path, "failed", reason, 0, 0, None
+
+def repair_images(folders: list[str], workers: int = None, chunksize: int = 16,
+                  verify_only: bool = False) -> dict:
+    """
+    Check and repair the images of several folders in one process pool.
+
+    Each folder keeps its own ``.repair_manifest.json`` (see
+    :func:`reload_and_save_images`). Files whose size and mtime match it are
+    skipped without being opened; the rest are checked, and broken or
+    non-RGB images are rewritten through a temp file and an atomic rename.
+
+    Parameters
+    ----------
+    folders : list[str]
+        Directories holding the images, e.g. the train and val splits.
+    workers : int, optional
+        Worker processes; ``None`` uses one per CPU, ``1`` runs inline.
+    chunksize : int
+        Files handed to a worker per task.
+    verify_only : bool
+        Only read headers and check file structure; nothing is written.
+
+    Returns
+    -------
+    dict
+        ``fixed``: ``(path, reason)`` pairs rewritten; ``broken``:
+        ``(path, reason)`` pairs that need repair (*verify_only*);
+        ``failed``: ``(path, reason)`` pairs that could not be repaired;
+        ``clean`` and ``skipped``: paths checked fine and skipped via the
+        manifest; ``bytes_before``/``bytes_after``: total size of the fixed
+        files before and after.
+    """
+    report = {"fixed": [], "broken": [], "failed": [], "clean": [], "skipped": [],
+              "bytes_before": 0, "bytes_after": 0}
+    manifests = {}
+    tasks = []
+    for folder in folders:
+        # Same key as os.path.split of its files gives back, e.g. without "/"
+        folder = os.path.normpath(folder)
+        manifest = _load_repair_manifest(folder)
+        present = set()
+        with os.scandir(folder) as entries:
+            for dir_entry in entries:
+                filename = dir_entry.name
+                if not filename.lower().endswith((".jpg", ".jpeg", ".png")):
+                    continue
+                if filename.startswith("."):                # leftover temp file
+                    continue
+                present.add(filename)
+                st = dir_entry.stat()
+                entry = manifest.get(filename)
+                if (
+                    entry
+                    and entry["size"] == st.st_size
+                    and entry["mtime_ns"] == st.st_mtime_ns
+                ):
+                    report["skipped"].append(dir_entry.path)
+                else:
+                    tasks.append((dir_entry.path, entry, verify_only))
+        manifests[folder] = {k: v for k, v in manifest.items() if k in present}
+
+    if workers == 1 or len(tasks) <= chunksize:
+        outcomes = map(_repair_file, tasks)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        outcomes = pool.map(_repair_file, tasks, chunksize=chunksize)
+    try:
+        for path, status, reason, before, after, entry in outcomes:
+            if status in ("fixed", "broken", "failed"):
+                report[status].append((path, reason))
+            else:
+                report[status].append(path)
+            if status == "fixed":
+                report["bytes_before"] += before
+                report["bytes_after"] += after
+            if entry is not None:
+                folder, filename = os.path.split(path)
+                manifests[folder][filename] = entry
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if not verify_only:
+        for folder, manifest in manifests.items():
+            _save_repair_manifest(folder, manifest)
+    for path, reason in report["failed"]:
+        print(f"Skipping {path}: {reason}")
+    return report
+
+def reload_and_save_images(folder_path: str, verify_only: bool = False,
+                           workers: int = None) -> int:
+    """
+    Re‑encode the broken or non-RGB images inside *folder_path* in place.
+
+    Images that pass :func:`check_image` are left untouched, and a content
+    hash manifest (``.repair_manifest.json``) lets later runs skip files
+    that were already checked or repaired without decoding them again.
+    See :func:`repair_images` for the parallel engine and full report.
 
     Parameters
     ----------
     folder_path : str
         Directory that holds the images to repair.
+    verify_only : bool
+        Only read headers and check file structure; nothing is rewritten
+        and the manifest is not updated.
+    workers : int, optional
+        Worker processes; ``None`` uses one per CPU.
 
     Returns
     -------
     int
-        Count of images successfully rewritten.
+        Count of images successfully rewritten, or with *verify_only* the
+        count of images that need repair.
     """
-    fixed_count = 0
-
-    for filename in os.listdir(folder_path):
-        if filename.lower().endswith((".jpg", ".jpeg", ".png")):
-            path = os.path.join(folder_path, filename)
-
-            try:
-                img = Image.open(path)
-                img = img.convert("RGB")
-                img.save(path, optimize=True)
-                fixed_count += 1
-            except Exception as e:
-                print(f"Skipping {filename}: {e}")
-
-    return fixed_count
\ No newline at end of file
+    report = repair_images([folder_path], workers=workers, verify_only=verify_only)
+    if verify_only:
+        for path, reason in report["broken"]:
+            print(f"{path} needs repair: {reason}")
+        return len(report["broken"])
+    return len(report["fixed"])
@@ -0,0 +1,237 @@
+"""
+Struct-of-arrays container for the detections of many pages.
+"""
+
+import os
+import numpy as np
+
+def _import_pyarrow():
+    """``pyarrow``, or an ImportError naming the optional extra it ships in."""
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("Arrow and Parquet files need pyarrow: "
+                          "pip install 'manga-bubble-detector[arrow]'") from e
+    return pyarrow
+
+class Detections:
+    """
+    Boxes of one or more pages held in contiguous NumPy arrays.
+
+    Boxes are kept grouped by page, so the boxes of one page are a slice of
+    every array and :meth:`page_view` returns views instead of copies. A 50k-page
+    job holds five arrays instead of millions of dicts.
+
+    Attributes
+    ----------
+    xywh : numpy.ndarray
+        ``(n, 4)`` ``float32`` top-left corner and size in pixels.
+    conf : numpy.ndarray
+        ``(n,)`` ``float32`` confidences.
+    cls : numpy.ndarray
+        ``(n,)`` ``uint8`` class ids.
+    page : numpy.ndarray
+        ``(n,)`` ``int32`` index of the page each box belongs to.
+    n_pages : int
+        Number of pages, including pages without boxes.
+    """
+
+    __slots__ = ("xywh", "conf", "cls", "page", "n_pages", "_offsets")
+
+    def __init__(self, xywh, conf, cls, page=None, n_pages: int = None):
+        """
+        Parameters
+        ----------
+        xywh, conf, cls : array-like
+            Box arrays, see the class attributes; class ids must fit in
+            ``uint8``.
+        page : array-like, optional
+            Page index of every box; if None, all boxes are on page 0 of
+            a single page.
+        n_pages : int, optional
+            Number of pages; one more than the largest page index if None.
+        """
+        xywh = np.asarray(xywh, dtype=np.float32).reshape(-1, 4)
+        conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        cls = np.asarray(cls).reshape(-1)
+        if cls.dtype != np.uint8:
+            if len(cls) and (cls.min() < 0 or cls.max() > 255):
+                raise ValueError(
+                    f"Class ids must be in [0, 255], got {cls.min()} to {cls.max()}"
+                )
+            cls = cls.astype(np.uint8)
+        if page is None:
+            page = np.zeros(len(conf), dtype=np.int32)
+            n_pages = 1 if n_pages is None else n_pages
+        page = np.asarray(page).reshape(-1).astype(np.int32, copy=False)
+        if not len(xywh) == len(conf) == len(cls) == len(page):
+            raise ValueError(
+                f"Arrays differ in length: xywh {len(xywh)}, conf {len(conf)}, "
+                f"cls {len(cls)}, page {len(page)}"
+            )
+        if len(page) > 1 and (page[1:] < page[:-1]).any():
+            order = np.argsort(page, kind="stable")
+            xywh, conf, cls, page = xywh[order], conf[order], cls[order], page[order]
+        if n_pages is None:
+            n_pages = int(page[-1]) + 1 if len(page) else 0
+        self.xywh, self.conf, self.cls, self.page = xywh, conf, cls, page
+        self.n_pages = int(n_pages)
+        self._offsets = None
+
+    @classmethod
+    def from_pages(cls, pages: list) -> "Detections":
+        """
+        Gather per-page struct-of-arrays dicts (see ``apply_rules``).
+        """
+        if not pages:
+            return cls(np.empty((0, 4)), [], [], n_pages=0)
+        counts = [len(p['conf']) for p in pages]
+        return cls(np.concatenate([p['xywh'] for p in pages]),
+                   np.concatenate([p['conf'] for p in pages]),
+                   np.concatenate([p['cls'] for p in pages]),
+                   np.repeat(np.arange(len(pages), dtype=np.int32), counts), len(pages))
+
+    @classmethod
+    def from_dicts(cls, detections: list) -> "Detections":
+        """
+        One page from the legacy list of ``{'x', 'y', 'width', 'height',
+        'confidence', 'class'}`` dicts.
+        """
+        return cls([[d['x'], d['y'], d['width'], d['height']] for d in detections],
+                   [d['confidence'] for d in detections],
+                   [d.get('class', 0) for d in detections], n_pages=1)
+
+    @classmethod
+    def concatenate(cls, parts: list) -> "Detections":
+        """
+        Join detections of consecutive page ranges; page indices of each
+        part are shifted past the pages of the parts before it.
+        """
+        parts = list(parts)
+        if not parts:
+            return cls(np.empty((0, 4)), [], [], n_pages=0)
+        shifts = np.cumsum([0] + [p.n_pages for p in parts[:-1]])
+        return cls(np.concatenate([p.xywh for p in parts]),
+                   np.concatenate([p.conf for p in parts]),
+                   np.concatenate([p.cls for p in parts]),
+                   np.concatenate([p.page + s for p, s in zip(parts, shifts)]),
+                   int(shifts[-1]) + parts[-1].n_pages)
+
+    def __len__(self) -> int:
+        return len(self.conf)
+
+    def __repr__(self) -> str:
+        return f"Detections({len(self)} boxes on {self.n_pages} pages)"
+
+    @property
+    def xyxy(self) -> np.ndarray:
+        """``(n, 4)`` ``float32`` corner boxes ``x1, y1, x2, y2``."""
+        return np.concatenate(
+            [self.xywh[:, :2], self.xywh[:, :2] + self.xywh[:, 2:]], axis=1
+        )
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """``(n_pages + 1,)`` start of every page's boxes, then the total."""
+        if self._offsets is None:
+            self._offsets = np.searchsorted(self.page, np.arange(self.n_pages + 1))
+        return self._offsets
+
+    def page_slice(self, index: int) -> slice:
+        """Slice of the arrays holding the boxes of page *index*."""
+        if not 0 <= index < self.n_pages:
+            raise IndexError(f"page {index} out of range for {self.n_pages} pages")
+        return slice(int(self.offsets[index]), int(self.offsets[index + 1]))
+
+    def page_view(self, index: int) -> "Detections":
+        """The boxes of page *index* as views into these arrays, as one page."""
+        part = self.page_slice(index)
+        view = Detections.__new__(Detections)
+        view.xywh, view.conf, view.cls = (
+            self.xywh[part],
+            self.conf[part],
+            self.cls[part],
+        )
+        view.page = np.broadcast_to(np.int32(0), view.conf.shape)    # no allocation
+        view.n_pages, view._offsets = 1, None
+        return view
+
+    def iter_pages(self):
+        """Iterate over the pages, see :meth:`page_view`."""
+        return (self.page_view(i) for i in range(self.n_pages))
+
+    def filter(self, mask: np.ndarray) -> "Detections":
+        """Boxes where *mask* is True, on the same pages."""
+        return Detections(
+            self.xywh[mask],
+            self.conf[mask],
+            self.cls[mask],
+            self.page[mask],
+            self.n_pages,
+        )
+
+    def to_dicts(self) -> list:
+        """
+        Legacy view: one ``{'x', 'y', 'width', 'height', 'confidence',
+        'class'}`` dict per box, with plain Python numbers.
+        """
+        return [
+            {'x': x, 'y': y, 'width': w, 'height': h, 'confidence': conf, 'class': cls}
+            for (x, y, w, h), conf, cls in zip(self.xywh.tolist(), self.conf.tolist(),
+                                               self.cls.tolist())
+        ]
+
+    def to_page_dicts(self) -> list:
+        """Legacy view of every page, a list of :meth:`to_dicts` lists."""
+        return [p.to_dicts() for p in self.iter_pages()]
+
+    def save(self, path: str) -> None:
+        """
+        Write the arrays to *path*: ``.npz`` with NumPy, or ``.arrow`` /
+        ``.feather`` as an Arrow IPC file with pyarrow.
+        """
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".npz":
+            np.savez(path, xywh=self.xywh, conf=self.conf, cls=self.cls, page=self.page,
+                     n_pages=np.int64(self.n_pages))
+        elif ext in (".arrow", ".feather"):
+            pa = _import_pyarrow()
+            table = pa.table({
+                "page": self.page, "x": self.xywh[:, 0], "y": self.xywh[:, 1],
+                "width": self.xywh[:, 2], "height": self.xywh[:, 3],
+                "confidence": self.conf, "class": self.cls,
+            }).replace_schema_metadata({"n_pages": str(self.n_pages)})
+            with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(
+                sink, table.schema
+            ) as writer:
+                writer.write_table(table)
+        else:
+            raise ValueError(
+                f"Unsupported detections file {path}; use .npz, .arrow or .feather"
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "Detections":
+        """Read detections written by :meth:`save`."""
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".npz":
+            with np.load(path) as data:
+                return cls(data["xywh"], data["conf"], data["cls"], data["page"],
+                           int(data["n_pages"]))
+        if ext in (".arrow", ".feather"):
+            pa = _import_pyarrow()
+            # Memory-mapped: the columns are views into the page cache
+            with pa.memory_map(path) as source:
+                table = pa.ipc.open_file(source).read_all()
+            columns = {
+                name: table.column(name).to_numpy() for name in table.column_names
+            }
+            xywh = np.stack(
+                [columns["x"], columns["y"], columns["width"], columns["height"]],
+                axis=1,
+            )
+            return cls(xywh, columns["confidence"], columns["class"], columns["page"],
+                       int(table.schema.metadata[b"n_pages"]))
+        raise ValueError(
+            f"Unsupported detections file {path}; use .npz, .arrow or .feather"
+        )
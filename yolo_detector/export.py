@@ -0,0 +1,370 @@
+"""
+Streaming export of detections to JSONL, Parquet, COCO JSON and YOLO txt.
+"""
+
+import os
+import json
+import shutil
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
+from .detections import Detections, _import_pyarrow
+from .postprocessing import CLASS_NAMES
+
+EXPORT_FORMATS = ("jsonl", "parquet", "coco", "yolo")
+# The formats that need no optional dependency
+DEFAULT_EXPORT_FORMATS = ("jsonl", "coco", "yolo")
+
+class _BufferedWriter(ABC):
+    """
+    Base of the format writers: pages are buffered and written
+    *buffer_pages* at a time under a lock, so pipeline threads can share
+    one writer and memory stays bounded however many pages pass through.
+    """
+
+    def __init__(self, buffer_pages: int = 256):
+        self.buffer_pages = buffer_pages
+        self.n_pages = 0
+        self.n_boxes = 0
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def write(self, image_path: str, detections: Detections, image_size: tuple) -> None:
+        """
+        Queue the detections of one page.
+
+        Parameters
+        ----------
+        image_path : str
+            Source image of the page.
+        detections : Detections
+            Boxes of this page in pixels, e.g. a ``page_view``.
+        image_size : tuple
+            ``(height, width)`` of the page in pixels.
+        """
+        with self._lock:
+            self._pending.append((image_path, detections, image_size))
+            self.n_pages += 1
+            self.n_boxes += len(detections)
+            if len(self._pending) >= self.buffer_pages:
+                pages, self._pending = self._pending, []
+                self._flush(pages)
+
+    def close(self) -> None:
+        """Write the buffered pages and finish the output file."""
+        with self._lock:
+            pages, self._pending = self._pending, []
+            if pages:
+                self._flush(pages)
+            self._finish()
+
+    def discard(self) -> None:
+        """Close the output without finishing it and remove what was written."""
+        with self._lock:
+            self._pending = []
+            self._discard()
+
+    @abstractmethod
+    def _flush(self, pages: list) -> None:
+        """Write ``(image_path, detections, image_size)`` pages, under the lock."""
+
+    def _finish(self) -> None:
+        pass
+
+    def _discard(self) -> None:
+        pass
+
+class JsonlWriter(_BufferedWriter):
+    """One JSON object per page: image, size and its boxes."""
+
+    def __init__(self, path: str, names: dict = CLASS_NAMES, buffer_pages: int = 256):
+        super().__init__(buffer_pages)
+        self.path = path
+        self.names = names
+        self._file = open(path, "w", buffering=1 << 20)
+
+    def _flush(self, pages: list) -> None:
+        lines = []
+        for image_path, detections, (height, width) in pages:
+            boxes = [
+                {"x": round(x, 2), "y": round(y, 2), "width": round(w, 2),
+                 "height": round(h, 2), "confidence": round(conf, 4), "class": cls,
+                 "name": self.names.get(cls, str(cls))}
+                for (x, y, w, h), conf, cls in zip(detections.xywh.tolist(),
+                                                   detections.conf.tolist(),
+                                                   detections.cls.tolist())
+            ]
+            lines.append(
+                json.dumps(
+                    {
+                        "image": image_path,
+                        "width": width,
+                        "height": height,
+                        "detections": boxes,
+                    }
+                )
+            )
+        self._file.write("\n".join(lines) + "\n")
+
+    def _finish(self) -> None:
+        self._file.close()
+
+    def _discard(self) -> None:
+        self._file.close()
+        os.remove(self.path)
+
+class ParquetWriter(_BufferedWriter):
+    """One row per box; every flush is one Parquet row group."""
+
+    def __init__(self, path: str, names: dict = CLASS_NAMES, buffer_pages: int = 256):
+        super().__init__(buffer_pages)
+        pa = _import_pyarrow()
+        import pyarrow.parquet as pq
+        self._pa = pa
+        self.path = path
+        self.schema = pa.schema(
+            [
+                ("image", pa.string()),
+                ("image_width", pa.int32()),
+                ("image_height", pa.int32()),
+                ("x", pa.float32()),
+                ("y", pa.float32()),
+                ("width", pa.float32()),
+                ("height", pa.float32()),
+                ("confidence", pa.float32()),
+                ("class", pa.uint8()),
+            ],
+            metadata={"class_names": json.dumps({str(k): v for k, v in names.items()})},
+        )
+        self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def _flush(self, pages: list) -> None:
+        counts = [len(detections) for _, detections, _ in pages]
+        row_page = np.repeat(np.arange(len(pages), dtype=np.int32), counts)
+        sizes = np.array([size for _, _, size in pages], dtype=np.int32).reshape(-1, 2)
+        xywh = np.concatenate([detections.xywh for _, detections, _ in pages])
+        pa = self._pa
+        table = pa.table(
+            {
+                "image": pa.DictionaryArray.from_arrays(
+                    row_page, pa.array([path for path, _, _ in pages])
+                ).cast(pa.string()),
+                "image_width": sizes[row_page, 1],
+                "image_height": sizes[row_page, 0],
+                "x": xywh[:, 0],
+                "y": xywh[:, 1],
+                "width": xywh[:, 2],
+                "height": xywh[:, 3],
+                "confidence": np.concatenate(
+                    [detections.conf for _, detections, _ in pages]
+                ),
+                "class": np.concatenate([detections.cls for _, detections, _ in pages]),
+            },
+            schema=self.schema,
+        )
+        self._writer.write_table(table)
+
+    def _finish(self) -> None:
+        self._writer.close()
+
+    def _discard(self) -> None:
+        self._writer.close()
+        os.remove(self.path)
+
+class CocoWriter(_BufferedWriter):
+    """
+    A COCO detection JSON. ``images`` and ``annotations`` entries are
+    streamed to two part files next to *path* and joined on :meth:`close`,
+    so the document is never held in memory.
+    """
+
+    def __init__(self, path: str, names: dict = CLASS_NAMES, buffer_pages: int = 256):
+        super().__init__(buffer_pages)
+        self.path = path
+        self.names = names
+        self._parts = {key: open(f"{path}.{key}.part", "w+", buffering=1 << 20)
+                       for key in ("images", "annotations")}
+        self._next_annotation = 1
+
+    def _append(self, key: str, entries: list) -> None:
+        if not entries:
+            return
+        part = self._parts[key]
+        text = ",\n".join(json.dumps(entry) for entry in entries)
+        part.write((",\n" if part.tell() else "") + text)
+
+    def _flush(self, pages: list) -> None:
+        images, annotations = [], []
+        first_id = self.n_pages - len(pages) + 1
+        for image_id, (image_path, detections, (height, width)) in enumerate(
+            pages, first_id
+        ):
+            images.append({"id": image_id, "file_name": os.path.basename(image_path),
+                           "path": image_path, "width": width, "height": height})
+            for (x, y, w, h), conf, cls in zip(detections.xywh.tolist(),
+                                               detections.conf.tolist(),
+                                               detections.cls.tolist()):
+                annotations.append(
+                    {
+                        "id": self._next_annotation,
+                        "image_id": image_id,
+                        "category_id": cls,
+                        "bbox": [round(x, 2), round(y, 2), round(w, 2), round(h, 2)],
+                        "area": round(w * h, 2),
+                        "iscrowd": 0,
+                        "score": round(conf, 4),
+                    }
+                )
+                self._next_annotation += 1
+        self._append("images", images)
+        self._append("annotations", annotations)
+
+    def _finish(self) -> None:
+        categories = [
+            {"id": cid, "name": name} for cid, name in sorted(self.names.items())
+        ]
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as out:
+            for i, key in enumerate(("images", "annotations")):
+                part = self._parts[key]
+                part.seek(0)
+                out.write(("{" if i == 0 else "],\n") + f'"{key}": [\n')
+                shutil.copyfileobj(part, out, 1 << 20)
+                part.close()
+                os.remove(part.name)
+            out.write(f'],\n"categories": {json.dumps(categories)}}}\n')
+        os.replace(tmp_path, self.path)
+
+    def _discard(self) -> None:
+        for part in self._parts.values():
+            part.close()
+            os.remove(part.name)
+
+class YoloTxtWriter(_BufferedWriter):
+    """
+    One Ultralytics label file per page, ``cls cx cy w h [conf]``,
+    normalized. Files are named after the image stem, so two pages with
+    the same stem from different folders raise ValueError.
+    """
+
+    def __init__(self, folder: str, save_conf: bool = False, buffer_pages: int = 256):
+        super().__init__(buffer_pages)
+        self.folder = folder
+        self.save_conf = save_conf
+        self._sources = {}
+        os.makedirs(folder, exist_ok=True)
+
+    @staticmethod
+    def _label_name(image_path: str) -> str:
+        return os.path.splitext(os.path.basename(image_path))[0] + ".txt"
+
+    def write(self, image_path: str, detections: Detections, image_size: tuple) -> None:
+        """Queue one page, see ``_BufferedWriter.write``."""
+        name = self._label_name(image_path)
+        with self._lock:
+            source = self._sources.setdefault(name, image_path)
+        if source != image_path:
+            raise ValueError(f"{image_path} and {source} would both be written to "
+                             f"{os.path.join(self.folder, name)}")
+        super().write(image_path, detections, image_size)
+
+    def _flush(self, pages: list) -> None:
+        for image_path, detections, (height, width) in pages:
+            xywh = detections.xywh
+            scale = np.array([width, height, width, height], dtype=np.float32)
+            boxes = (
+                np.concatenate([xywh[:, :2] + xywh[:, 2:] / 2, xywh[:, 2:]], axis=1)
+                / scale
+            )
+            columns = [detections.cls[:, None].astype(np.float32), boxes]
+            fmt = "%d %.6f %.6f %.6f %.6f"
+            if self.save_conf:
+                columns.append(detections.conf[:, None])
+                fmt += " %.4f"
+            np.savetxt(os.path.join(self.folder, self._label_name(image_path)),
+                       np.concatenate(columns, axis=1), fmt=fmt)
+
+    def _discard(self) -> None:
+        for name in self._sources:
+            path = os.path.join(self.folder, name)
+            if os.path.exists(path):
+                os.remove(path)
+        if not os.listdir(self.folder):
+            os.rmdir(self.folder)
+
+class DetectionExporter:
+    """
+    Stream page detections to several formats at once.
+
+    Used as a context manager, or call :meth:`close` when done. Each
+    format writes into *output_dir*: ``detections.jsonl``,
+    ``detections.parquet``, ``detections_coco.json`` and ``labels/``.
+    """
+
+    FILE_NAMES = {"jsonl": "detections.jsonl", "parquet": "detections.parquet",
+                  "coco": "detections_coco.json", "yolo": "labels"}
+
+    def __init__(
+        self,
+        output_dir: str,
+        formats=DEFAULT_EXPORT_FORMATS,
+        names: dict = CLASS_NAMES,
+        buffer_pages: int = 256,
+        save_conf: bool = False,
+    ):
+        """
+        Parameters
+        ----------
+        output_dir : str
+            Folder receiving the exports.
+        formats : sequence of str
+            Any of :data:`EXPORT_FORMATS`; by default
+            :data:`DEFAULT_EXPORT_FORMATS`, which leaves out Parquet and
+            its optional pyarrow dependency.
+        names : dict
+            Class id to name mapping written with the detections.
+        buffer_pages : int
+            Pages buffered before each batched write.
+        save_conf : bool
+            Append the confidence to the YOLO txt lines.
+        """
+        unknown = set(formats) - set(EXPORT_FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown export formats {sorted(unknown)}; "
+                             f"use {', '.join(EXPORT_FORMATS)}")
+        os.makedirs(output_dir, exist_ok=True)
+        self.paths = {
+            fmt: os.path.join(output_dir, self.FILE_NAMES[fmt]) for fmt in formats
+        }
+        self.writers = {}
+        try:
+            for fmt, path in self.paths.items():
+                if fmt == "jsonl":
+                    self.writers[fmt] = JsonlWriter(path, names, buffer_pages)
+                elif fmt == "parquet":
+                    self.writers[fmt] = ParquetWriter(path, names, buffer_pages)
+                elif fmt == "coco":
+                    self.writers[fmt] = CocoWriter(path, names, buffer_pages)
+                else:
+                    self.writers[fmt] = YoloTxtWriter(path, save_conf, buffer_pages)
+        except BaseException:
+            # E.g. no pyarrow for Parquet: leave no open or empty outputs behind
+            for writer in self.writers.values():
+                writer.discard()
+            raise
+
+    def write(self, image_path: str, detections: Detections, image_size: tuple) -> None:
+        """Queue one page in every format, see ``_BufferedWriter.write``."""
+        for writer in self.writers.values():
+            writer.write(image_path, detections, image_size)
+
+    def close(self) -> None:
+        """Flush and finish every format."""
+        for writer in self.writers.values():
+            writer.close()
+
+    def __enter__(self) -> "DetectionExporter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
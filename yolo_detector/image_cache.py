@@ -0,0 +1,235 @@
+"""
+Pre-resized copies of a dataset at the training image size.
+"""
+
+import os
+import json
+import math
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+import yaml
+from .data_utils import split_image_paths, yolo_label_path
+
+CACHE_MANIFEST = ".cache_manifest.json"
+
+def resized_shape(h: int, w: int, imgsz: int) -> tuple[int, int]:
+    """
+    Size Ultralytics loads an image at: long side scaled to *imgsz*, aspect
+    ratio kept.
+
+    Parameters
+    ----------
+    h, w : int
+        Original height and width.
+    imgsz : int
+        Training image size.
+
+    Returns
+    -------
+    tuple[int, int]
+        Resized ``(height, width)``.
+    """
+    r = imgsz / max(h, w)
+    return min(math.ceil(h * r), imgsz), min(math.ceil(w * r), imgsz)
+
+def _cached_relpath(img_path: str) -> str:
+    """
+    Path of an image's copy below the cache's ``images`` folder: the part
+    after the last ``/images/``, so the split folders keep their names, or
+    a folder named after a digest of the source folder otherwise.
+    """
+    sa = f"{os.sep}images{os.sep}"
+    if sa in img_path:
+        return img_path.rsplit(sa, 1)[1]
+    folder, name = os.path.split(img_path)
+    return os.path.join(
+        "external", hashlib.sha1(folder.encode()).hexdigest()[:12], name
+    )
+
+def _file_stat(path: str) -> list:
+    """``[size, mtime_ns]`` of *path*, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+def _remove(path: str) -> None:
+    if os.path.lexists(path):
+        os.remove(path)
+
+def _resize_one(task: tuple) -> None:
+    """
+    Write the resized copy, its ``.npy`` array and its label for one image.
+
+    Parameters
+    ----------
+    task : tuple
+        ``(src_img, src_lbl, dst_img, dst_lbl, imgsz, write_npy)``.
+    """
+    src_img, src_lbl, dst_img, dst_lbl, imgsz, write_npy = task
+    im = cv2.imread(src_img, cv2.IMREAD_COLOR)
+    if im is None:
+        raise OSError(f"Cannot read image {src_img}")
+    h0, w0 = im.shape[:2]
+    h, w = resized_shape(h0, w0, imgsz)
+    if (h, w) != (h0, w0):
+        interpolation = cv2.INTER_AREA if h < h0 else cv2.INTER_LINEAR
+        im = cv2.resize(im, (w, h), interpolation=interpolation)
+
+    folder, name = os.path.split(dst_img)
+    stem, ext = os.path.splitext(name)
+    tmp_img = os.path.join(folder, f".{stem}.tmp{ext}")
+    if not cv2.imwrite(tmp_img, im, [cv2.IMWRITE_JPEG_QUALITY, 95]):
+        raise OSError(f"Cannot write image {dst_img}")
+    os.replace(tmp_img, dst_img)
+    npy_path = os.path.join(folder, stem + ".npy")
+    if write_npy:
+        # Written after the image so Ultralytics never sees it as stale
+        tmp_npy = os.path.join(folder, f".{stem}.tmp.npy")
+        np.save(tmp_npy, np.ascontiguousarray(im), allow_pickle=False)
+        os.replace(tmp_npy, npy_path)
+    else:
+        _remove(npy_path)
+
+    # Boxes are normalized and the aspect ratio is kept, so labels carry over
+    _remove(dst_lbl)
+    if src_lbl is not None:
+        try:
+            os.link(src_lbl, dst_lbl)
+        except OSError:
+            with open(src_lbl, "rb") as f_in, open(dst_lbl, "wb") as f_out:
+                f_out.write(f_in.read())
+
+def build_resized_cache(data_yaml_path: str, imgsz: int, cache_root: str = None,
+                        workers: int = None, write_npy: bool = True) -> str:
+    """
+    Write a copy of a dataset whose images are already at the training size.
+
+    Every image of the ``train`` and ``val`` splits is resized once, the way
+    Ultralytics would at load time (long side to *imgsz*), and saved with a
+    ``.npy`` array beside it, which Ultralytics loads instead of decoding
+    and resizing the image on every epoch. Labels are hard-linked: boxes
+    are normalized and no padding is added, so they are unchanged.
+
+    A ``.cache_manifest.json`` records *imgsz* and the size and mtime of
+    every source image and label. Later calls only redo images whose
+    source changed and remove those whose source left the dataset. Each
+    image size has its own default folder, and the folders of other sizes
+    are left on disk, never removed, so switching back reuses them; a
+    *cache_root* given for several sizes is rebuilt when *imgsz* changes.
+
+    Parameters
+    ----------
+    data_yaml_path : str
+        Data YAML of the dataset. Split entries may be image folders or
+        list files, e.g. those of manifest preparation or repeat-factor
+        sampling; list files keep their order and repeats.
+    imgsz : int
+        Training image size.
+    cache_root : str, optional
+        Folder of the copy, by default ``cache_<imgsz>`` in the dataset.
+    workers : int, optional
+        Threads resizing images (None for automatic).
+    write_npy : bool
+        Also save the decoded ``uint8`` arrays as ``.npy`` files.
+
+    Returns
+    -------
+    str
+        Path to ``<yaml stem>_<imgsz>px.yaml`` beside *data_yaml_path*,
+        pointing at the copy.
+    """
+    with open(data_yaml_path) as f:
+        data = yaml.safe_load(f)
+    base_dir = data["path"]
+    cache_root = os.path.abspath(cache_root or os.path.join(base_dir, f"cache_{imgsz}"))
+    cache_images = os.path.join(cache_root, "images")
+    os.makedirs(cache_images, exist_ok=True)
+
+    # Source and copy of every image the splits use
+    sources = {}
+    split_paths = {}
+    for split in ("train", "val"):
+        paths = split_image_paths(base_dir, data[split])
+        split_paths[split] = paths
+        for path in paths:
+            sources.setdefault(os.path.join(cache_images, _cached_relpath(path)), path)
+
+    manifest_path = os.path.join(cache_root, CACHE_MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    previous = manifest.get("files", {}) if manifest.get("imgsz") == imgsz else {}
+    if manifest and not previous and manifest.get("files"):
+        print(
+            f"Image size changed from {manifest.get('imgsz')} to {imgsz}; "
+            "rebuilding cache"
+        )
+
+    files, tasks = {}, []
+    for dst_img, src_img in sources.items():
+        src_lbl = yolo_label_path(src_img)
+        key = os.path.relpath(dst_img, cache_root)
+        entry = {"source": src_img, "image": _file_stat(src_img),
+                 "label": _file_stat(src_lbl), "npy": write_npy}
+        files[key] = entry
+        if previous.get(key) != entry or not os.path.exists(dst_img):
+            tasks.append((src_img, src_lbl if entry["label"] else None, dst_img,
+                          yolo_label_path(dst_img), imgsz, write_npy))
+
+    # Copies of images that left the dataset
+    stale = [key for key in manifest.get("files", {}) if key not in files]
+    for key in stale:
+        dst_img = os.path.join(cache_root, key)
+        for path in (
+            dst_img,
+            os.path.splitext(dst_img)[0] + ".npy",
+            yolo_label_path(dst_img),
+        ):
+            _remove(path)
+
+    start = time.perf_counter()
+    for folder in {os.path.dirname(task[2]) for task in tasks}:
+        os.makedirs(folder, exist_ok=True)
+        os.makedirs(os.path.dirname(yolo_label_path(os.path.join(folder, "x.jpg"))),
+                    exist_ok=True)
+    if workers == 1:
+        for task in tasks:
+            _resize_one(task)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_resize_one, tasks))
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"imgsz": imgsz, "files": files}, f)
+    os.replace(tmp_path, manifest_path)
+    print(f"Resized image cache at {cache_root}: {len(tasks)} images resized, "
+          f"{len(files) - len(tasks)} reused, {len(stale)} removed "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    # Folder splits map to the copied folder, list files to a list of copies
+    cached = dict(data, path=cache_root)
+    for split in ("train", "val"):
+        source = data[split]
+        if os.path.isfile(os.path.join(base_dir, source)):
+            list_rel = os.path.join("images", os.path.basename(source))
+            with open(os.path.join(cache_root, list_rel), "w") as f:
+                f.writelines(os.path.join(cache_images, _cached_relpath(p)) + "\n"
+                             for p in split_paths[split])
+            cached[split] = list_rel
+        else:
+            folder = os.path.abspath(os.path.join(base_dir, source))
+            cached[split] = os.path.join(
+                "images",
+                os.path.dirname(_cached_relpath(os.path.join(folder, "x.jpg"))),
+            )
+    cached_yaml_path = f"{os.path.splitext(data_yaml_path)[0]}_{imgsz}px.yaml"
+    with open(cached_yaml_path, "w") as f:
+        yaml.dump(cached, f)
+    return cached_yaml_path
@@ -3,13 +3,26 @@ Functions for running inference with the trained YOLO model.
 """
 
 import os
+import time
+import functools
 import shutil
 from PIL import Image
 import cv2
 import numpy as np
 from ultralytics import YOLO
-from .postprocessing import apply_post_processing_rules
+from .postprocessing import (
+    CLASS_NAMES,
+    RuleSet,
+    apply_post_processing_rules,
+    apply_rules,
+    compile_rules,
+    merge_overlaps,
+    suppress_overlaps
+)
 from .data_utils import reload_and_save_images
+from .detections import Detections
+from .export import DetectionExporter
+from .pipeline import run_pipeline, print_pipeline_stats
 
 def prepare_test_dir(base_dir, raw_images_dir, val_files, max_samples=5):
     """
@@ -32,66 +45,439 @@ def prepare_test_dir(base_dir, raw_images_dir, val_files, max_samples=5):
             shutil.copy(os.path.join(raw_images_dir, file), test_dir)
     return test_dir
 
-def draw_detections(image_path: str, detections: list, output_path: str) -> None:
-    # Class mapping
-    class_names = {
-        0: "bubble",
-        1: "narration",
-        2: "other",
-        3: "text",
-        4: "ui"
-    }
-    class_colors = {
-        "bubble": (255, 0, 0),      # Blue
-        "narration": (0, 255, 255), # Yellow
-        "other": (0, 0, 255),       # Red
-        "text": (0, 255, 0),        # Green
-        "ui": (255, 0, 255),        # Magenta
-    }
-    img = cv2.imread(image_path)
-    if img is None:
-        raise ValueError(f"Could not read image at {image_path}")
-    for det in detections:
-        x, y = int(det['x']), int(det['y'])
-        w, h = int(det['width']), int(det['height'])
-        conf = det['confidence']
-        class_idx = det.get('class', 0)
-        class_name = class_names.get(class_idx, str(class_idx))
-        color = class_colors.get(class_name, (0, 255, 0))
+CLASS_COLORS = {
+    "bubble": (255, 0, 0),      # Blue
+    "narration": (0, 255, 255), # Yellow
+    "other": (0, 0, 255),       # Red
+    "text": (0, 255, 0),        # Green
+    "ui": (255, 0, 255),        # Magenta
+}
+
+def draw_detections_on_image(img: np.ndarray, detections) -> np.ndarray:
+    """
+    Draw boxes and labels onto an already-decoded BGR image, in place.
+
+    Args:
+        img: ``(H, W, 3)`` ``uint8`` BGR image, e.g. ``result.orig_img``
+        detections: ``Detections`` of this page, or legacy detection dicts
+
+    Returns:
+        The same *img* array
+    """
+    if not isinstance(detections, Detections):
+        detections = Detections.from_dicts(detections)
+    boxes = detections.xywh.astype(np.int64).tolist()
+    for (x, y, w, h), conf, class_idx in zip(boxes, detections.conf.tolist(),
+                                             detections.cls.tolist()):
+        class_name = CLASS_NAMES.get(class_idx, str(class_idx))
+        color = CLASS_COLORS.get(class_name, (0, 255, 0))
         cv2.rectangle(img, (x, y), (x + w, y + h), color, 2)
         label = f"{class_name} {conf:.2f}"
         cv2.putText(img, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-    cv2.imwrite(output_path, img)
+    return img
+
+def draw_detections(image_path: str, detections, output_path: str,
+                    image: np.ndarray = None) -> None:
+    """
+    Draw detections on an image and write the result to *output_path*.
+
+    Args:
+        image_path: Source image, only read when *image* is not given
+        detections: ``Detections`` of this page, or legacy detection dicts
+        output_path: Where to write the annotated image
+        image: Already-decoded BGR image to draw on in place, to skip
+            decoding the page a second time
+    """
+    img = image if image is not None else cv2.imread(image_path)
+    if img is None:
+        raise ValueError(f"Could not read image at {image_path}")
+    cv2.imwrite(output_path, draw_detections_on_image(img, detections))
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Peak CPU memory per input pixel during a YOLOv8n forward pass: the RSS
+# growth from batch size 1 to 32 at 640x640, divided by the 31 extra images
+# and their 640 * 640 pixels, came to ~62 bytes and is rounded up (~26 MB per
+# image). Activations grow with model width, so larger models need more.
+CPU_BYTES_PER_PIXEL = 64
+
+# Ultralytics' inference size when neither the caller nor the checkpoint sets one
+DEFAULT_IMGSZ = 640
+
+def list_images(folder: str) -> list:
+    """
+    Sorted paths of the images directly inside *folder*.
+    """
+    return sorted(
+        os.path.join(folder, f) for f in os.listdir(folder)
+        if f.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+def auto_batch_size(imgsz: int = None, memory_budget: int = None, max_batch: int = 64,
+                    model=None) -> int:
+    """
+    Largest CPU batch size whose forward pass fits in *memory_budget*.
+
+    Args:
+        imgsz: Inference image size; if None, the size *model* was trained
+            at, else 640
+        memory_budget: Bytes the batch may use; defaults to half of the
+            currently available RAM
+        max_batch: Upper bound on the returned size
+        model: Loaded ``YOLO`` model, read when *imgsz* is None
+
+    Returns:
+        Batch size between 1 and *max_batch*
+    """
+    if imgsz is None:
+        imgsz = model.overrides.get('imgsz') if model is not None else None
+        imgsz = imgsz or DEFAULT_IMGSZ
+        if not isinstance(imgsz, int):
+            imgsz = max(imgsz)
+    if memory_budget is None:
+        import psutil
+        memory_budget = psutil.virtual_memory().available // 2
+    per_image = CPU_BYTES_PER_PIXEL * imgsz * imgsz
+    return int(max(1, min(max_batch, memory_budget // per_image)))
+
+def iter_image_batches(image_paths: list, batch_size: int):
+    """
+    Decode images in groups of *batch_size*.
+
+    Yields:
+        Tuple of (paths, BGR arrays) per batch; unreadable files are skipped
+    """
+    paths, images = [], []
+    for path in image_paths:
+        img = cv2.imread(path)
+        if img is None:
+            print(f"Skipping unreadable image {path}")
+            continue
+        paths.append(path)
+        images.append(img)
+        if len(images) == batch_size:
+            yield paths, images
+            paths, images = [], []
+    if images:
+        yield paths, images
+
+def run_batched_inference(model, image_paths: list, batch_size=1, imgsz: int = None,
+                          memory_budget: int = None, **predict_kwargs):
+    """
+    Run the model over *image_paths* a batch at a time.
+
+    Each batch is decoded, letterboxed together and sent through a single
+    forward pass. Throughput is printed once all pages are done.
+
+    Args:
+        model: Loaded ``YOLO`` model
+        image_paths: Images to run on
+        batch_size: Pages per forward pass, or ``"auto"`` to pick the largest
+            batch that fits *memory_budget* (see :func:`auto_batch_size`)
+        imgsz: Inference image size; the checkpoint's training size if None
+        memory_budget: Byte budget for ``"auto"``
+        **predict_kwargs: Extra arguments for ``model.predict``
+
+    Yields:
+        One ``Results`` per page, with ``path`` set to the source file
+    """
+    if batch_size == "auto":
+        batch_size = auto_batch_size(imgsz, memory_budget, model=model)
+        print(f"Auto batch size: {batch_size}")
+    if imgsz is not None:
+        predict_kwargs['imgsz'] = imgsz
+    n_pages = 0
+    start = time.perf_counter()
+    for paths, images in iter_image_batches(image_paths, batch_size):
+        results = model.predict(images, batch=len(images), save=False, verbose=False,
+                                **predict_kwargs)
+        for path, result in zip(paths, results):
+            result.path = path
+            n_pages += 1
+            yield result
+    elapsed = time.perf_counter() - start
+    if n_pages:
+        print(f"Processed {n_pages} pages in {elapsed:.1f}s "
+              f"({n_pages / elapsed:.2f} pages/s, batch size {batch_size})")
+
+def tile_windows(
+    height: int, width: int, tile: int = 640, overlap: int = 128
+) -> np.ndarray:
+    """
+    Overlapping square windows covering a page.
+
+    Windows step by ``tile - overlap`` and the last one on each axis is
+    aligned to the page edge; a side shorter than *tile* gets one window
+    spanning it.
 
-def run_folder_inference(model_path, test_dir, save_dir="predictions/test_set"):
+    Args:
+        height: Page height in pixels
+        width: Page width in pixels
+        tile: Window side in pixels
+        overlap: Pixels shared by neighbouring windows
+
+    Returns:
+        ``(k, 4)`` ``int64`` array of ``x1, y1, x2, y2`` windows
+    """
+    if not 0 <= overlap < tile:
+        raise ValueError(f"overlap must be in [0, {tile}), got {overlap}")
+
+    def starts(length):
+        if length <= tile:
+            return np.zeros(1, dtype=np.int64)
+        return np.append(np.arange(0, length - tile, tile - overlap), length - tile)
+
+    ys, xs = np.meshgrid(starts(height), starts(width), indexing='ij')
+    x1, y1 = xs.ravel(), ys.ravel()
+    return np.stack(
+        [x1, y1, np.minimum(x1 + tile, width), np.minimum(y1 + tile, height)], axis=1
+    )
+
+def iter_tiles(images: list, tile: int = 640, overlap: int = 128):
+    """
+    Cut pages into overlapping tiles without copying pixels.
+
+    Yields:
+        Tuple of (page index, ``(x1, y1)`` offset, tile) per tile, where the
+        tile is a NumPy view into the page
+    """
+    for page, img in enumerate(images):
+        for x1, y1, x2, y2 in tile_windows(
+            img.shape[0], img.shape[1], tile, overlap
+        ).tolist():
+            yield page, (x1, y1), img[y1:y2, x1:x2]
+
+def _seam_pairs(xyxy: np.ndarray, tiles: np.ndarray, windows: np.ndarray,
+                a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Which box pairs ``(a[k], b[k])`` may be pieces of one object cut by a
+    tile border: boxes from different tiles that both reach into the band
+    the two tiles share.
+
+    Args:
+        xyxy: ``(n, 4)`` page-coordinate boxes
+        tiles: ``(n,)`` index into *windows* of the tile each box came from
+        windows: ``(k, 4)`` tile windows of the page, see :func:`tile_windows`
+        a: Indices of the first box of each pair
+        b: Indices of the second box of each pair
+
+    Returns:
+        Boolean mask, one entry per pair
+    """
+    wa, wb = windows[tiles[a]], windows[tiles[b]]
+    band = np.concatenate([np.maximum(wa[:, :2], wb[:, :2]),
+                           np.minimum(wa[:, 2:], wb[:, 2:])], axis=1)
+
+    def reaches(boxes):
+        return ((np.maximum(boxes[:, :2], band[:, :2])
+                 < np.minimum(boxes[:, 2:], band[:, 2:])).all(axis=1))
+
+    return (tiles[a] != tiles[b]) & reaches(xyxy[a]) & reaches(xyxy[b])
+
+def run_tiled_inference(
+    model,
+    images: list,
+    tile: int = 640,
+    overlap: int = 128,
+    batch_size: int = 8,
+    iou: float = 0.5,
+    **predict_kwargs,
+) -> list:
+    """
+    Detect on overlapping tiles and merge the boxes back per page.
+
+    Tall webtoon strips and high-resolution scans are cut into *tile*-sized
+    views that run through the model *batch_size* at a time at their own
+    resolution, so small text survives and memory depends on the tile size,
+    not the page size. Boxes are shifted to page coordinates. Boxes of a
+    class from different tiles that both reach into the band those tiles
+    share, and overlap by more than *iou* of the smaller box, are fused
+    into one, which joins the pieces of an object cut by a tile border.
+    Boxes are never fused within a tile; the rest go through plain
+    per-class IoU NMS (see :func:`merge_overlaps`). Both passes only
+    compare boxes within the rows of the page a box spans, so merging
+    memory grows linearly with the number of boxes.
+
+    Args:
+        model: Loaded ``YOLO`` model
+        images: BGR pages of any size
+        tile: Tile side in pixels, also the inference size
+        overlap: Pixels shared by neighbouring tiles; should exceed the
+            height of the objects that must not be cut
+        batch_size: Tiles per forward pass
+        iou: Overlap above which boxes of a class are merged, over the
+            smaller box for pieces across a seam and over the union otherwise
+        **predict_kwargs: Extra arguments for ``model.predict``
+
+    Returns:
+        One ``(xyxy, conf, cls)`` tuple of NumPy arrays per page
+    """
+    boxes = [[] for _ in images]
+    confs = [[] for _ in images]
+    classes = [[] for _ in images]
+    tiles = [[] for _ in images]
+
+    def flush(chunk):
+        results = model.predict(
+            [view for _, _, view in chunk],
+            imgsz=tile,
+            batch=len(chunk),
+            save=False,
+            verbose=False,
+            **predict_kwargs,
+        )
+        for (page, (x1, y1), _), result in zip(chunk, results):
+            xyxy = result.boxes.xyxy.cpu().numpy().reshape(-1, 4)
+            boxes[page].append(xyxy + np.array([x1, y1, x1, y1], dtype=xyxy.dtype))
+            confs[page].append(result.boxes.conf.cpu().numpy().reshape(-1))
+            classes[page].append(result.boxes.cls.cpu().numpy().reshape(-1))
+            tiles[page].append(np.full(len(xyxy), len(tiles[page]), dtype=np.int64))
+
+    chunk = []
+    for entry in iter_tiles(images, tile, overlap):
+        chunk.append(entry)
+        if len(chunk) == batch_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    merged = []
+    for img, b, c, k, t in zip(images, boxes, confs, classes, tiles):
+        xyxy, conf, cls, t = (np.concatenate(b), np.concatenate(c), np.concatenate(k),
+                              np.concatenate(t))
+        windows = tile_windows(img.shape[0], img.shape[1], tile, overlap)
+        seams = functools.partial(_seam_pairs, xyxy, t, windows)
+        xyxy, conf, cls = merge_overlaps(xyxy, conf, cls, threshold=iou, metric="ios",
+                                         fuse=True, pairs=seams)
+        merged.append(merge_overlaps(xyxy, conf, cls, threshold=iou, metric="iou"))
+    return merged
+
+def _read_page(path: str):
+    img = cv2.imread(path)
+    if img is None:
+        print(f"Skipping unreadable image {path}")
+    return img
+
+def run_folder_inference(model_path, test_dir, save_dir="predictions/test_set",
+                         max_in_flight=4, batch_size=1, imgsz=None,
+                         decode_workers=2, write_workers=2, tile=None, tile_overlap=128,
+                         tile_batch=8, overlaps="suppress", rules=None, draw=True,
+                         export=None, export_dir=None, buffer_pages=256):
+    """
+    Detect, post-process, draw and export every image in a folder.
+
+    Decoding, the model forward pass and drawing/encoding run as overlapping
+    stages (see :func:`yolo_detector.pipeline.run_pipeline`); pages stream
+    through, so memory stays bounded regardless of folder size.
+
+    Args:
+        model_path: Path to the model weights
+        test_dir: Directory of images to run on
+        save_dir: Directory that receives the annotated images
+        max_in_flight: Capacity of the queues between stages
+        batch_size: Pages per forward pass, or ``"auto"``
+            (see :func:`auto_batch_size`)
+        imgsz: Inference image size; the checkpoint's training size if None
+        decode_workers: Threads decoding input images
+        write_workers: Threads drawing and encoding output images
+        tile: Run each page as overlapping tiles of this size instead of
+            whole (see :func:`run_tiled_inference`); for webtoon strips and
+            high-resolution scans
+        tile_overlap: Pixels shared by neighbouring tiles
+        tile_batch: Tiles per forward pass, or ``"auto"``
+        overlaps: How boxes of different classes covering the same region
+            are resolved after the rules, "suppress", "merge" or None (see
+            :func:`postprocessing.suppress_overlaps`)
+        rules: Relabelling rule spec, YAML path or compiled ``RuleSet``
+            (see :func:`postprocessing.compile_rules`); the default manga
+            layout rules if None
+        draw: Write annotated images to *save_dir*
+        export: Formats to stream the detections to, any of
+            ``export.EXPORT_FORMATS`` ("jsonl", "parquet", "coco", "yolo")
+        export_dir: Folder of the exports, *save_dir* by default
+        buffer_pages: Pages buffered before each batched export write
+
+    Returns:
+        Per-stage timing and queue depth statistics
+    """
     model = YOLO(model_path)
     reload_and_save_images(test_dir)
-    results = model.predict(test_dir, save=False)
-    all_processed = apply_post_processing_rules(results)
     os.makedirs(save_dir, exist_ok=True)
-    for result, dets in zip(results, all_processed):
-        img_path = result.path
+    if batch_size == "auto":
+        batch_size = auto_batch_size(imgsz, model=model)
+        print(f"Auto batch size: {batch_size}")
+    size = {} if imgsz is None else {'imgsz': imgsz}
+    if not isinstance(rules, RuleSet):
+        rules = compile_rules(rules)
+    if tile and tile_batch == "auto":
+        tile_batch = auto_batch_size(tile)
+        print(f"Auto tile batch size: {tile_batch}")
+
+    def infer(paths, images):
+        if tile:
+            pages = run_tiled_inference(model, images, tile, tile_overlap, tile_batch)
+            detections = Detections.from_pages(
+                [apply_rules(*page, rules) for page in pages]
+            )
+            if overlaps is not None:
+                detections = suppress_overlaps(detections, mode=overlaps)
+        else:
+            results = model.predict(
+                images, batch=len(images), save=False, verbose=False, **size
+            )
+            detections = apply_post_processing_rules(
+                results, overlaps=overlaps, rules=rules
+            )
+        return list(detections.iter_pages())
+
+    exporter = None
+    if export:
+        exporter = DetectionExporter(
+            export_dir or save_dir, export, buffer_pages=buffer_pages
+        )
+
+    def write(img_path, image, detections):
+        if exporter is not None:
+            exporter.write(img_path, detections, image.shape[:2])
+        if not draw:
+            return
         base_name = os.path.splitext(os.path.basename(img_path))[0]
         output_path = os.path.join(save_dir, f"processed_{base_name}.jpg")
-        draw_detections(img_path, dets, output_path)
-        print(f"Saved processed image to: {output_path}")
+        draw_detections(img_path, detections, output_path, image=image)
+        print(f"Saved processed image to: {output_path}\n", end="")
+
+    try:
+        stats = run_pipeline(list_images(test_dir), _read_page, infer, write,
+                             batch_size=batch_size, decode_workers=decode_workers,
+                             write_workers=write_workers, queue_size=max_in_flight)
+    finally:
+        if exporter is not None:
+            exporter.close()
+    print_pipeline_stats(stats)
+    if exporter is not None:
+        print("Detections exported to " + ", ".join(exporter.paths.values()))
     print("Inference complete with post-processing rules applied")
+    return stats
 
-def print_detections(detections: list) -> None:
+def print_detections(detections) -> None:
     """
     Print detection results in a formatted way.
     
     Args:
-        detections: List of detections from run_inference
+        detections: ``Detections`` of one page, or legacy detection dicts
     """
-    if not detections:
+    if not isinstance(detections, Detections):
+        detections = Detections.from_dicts(detections)
+    if not len(detections):
         print("No detections found")
         return
     
     print("\nDetection Results:")
-    for i, det in enumerate(detections, 1):
+    for i, ((x, y, w, h), conf, cls) in enumerate(zip(detections.xywh.tolist(),
+                                                      detections.conf.tolist(),
+                                                      detections.cls.tolist()), 1):
         print(f"\nDetection {i}:")
-        print(f"  Class: {det['class']}")
-        print(f"  Confidence: {det['confidence']:.2f}")
-        print(f"  Position: ({det['x']:.1f}, {det['y']:.1f})")
-        print(f"  Size: {det['width']:.1f}x{det['height']:.1f}")
\ No newline at end of file
+        print(f"  Class: {cls}")
+        print(f"  Confidence: {conf:.2f}")
+        print(f"  Position: ({x:.1f}, {y:.1f})")
+        print(f"  Size: {w:.1f}x{h:.1f}")
\ No newline at end of file
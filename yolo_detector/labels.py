@@ -0,0 +1,385 @@
+"""
+Reading and scanning YOLO label files.
+"""
+
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+
+LABEL_DTYPE = np.dtype([
+    ("cls", np.float32),
+    ("cx", np.float32),
+    ("cy", np.float32),
+    ("w", np.float32),
+    ("h", np.float32),
+])
+
+_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+
+def _parse_lines(lines: list[str]) -> tuple:
+    """
+    Parse YOLO rows in bulk.
+
+    Detection rows (5 fields) are converted in one ``float32`` cast;
+    segmentation rows (class + polygon) are reduced to their bounding box.
+    Blank lines are ignored.
+
+    Returns
+    -------
+    tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]
+        ``(n, 5)`` boxes, the line index of each box, and the indices of the
+        malformed lines.
+    """
+    fields = [line.split() for line in lines]
+    widths = np.fromiter(map(len, fields), dtype=np.int64, count=len(fields))
+    box_lines = np.flatnonzero(widths == 5)
+    poly_lines = np.flatnonzero((widths >= 7) & (widths % 2 == 1))
+    bad = [
+        np.flatnonzero(
+            (widths != 0) & (widths != 5) & ((widths < 7) | (widths % 2 == 0))
+        )
+    ]
+
+    tokens = [tok for i in box_lines.tolist() for tok in fields[i]]
+    try:
+        values = np.array(tokens, dtype=np.float32)
+    except ValueError:
+        # Non-numeric fields somewhere: blank them to NaN so the bulk
+        # validation below rejects exactly those rows.
+        ok = np.fromiter(map(bool, map(_NUMBER.fullmatch, tokens)),
+                         dtype=bool, count=len(tokens))
+        values = np.full(len(tokens), np.nan, dtype=np.float32)
+        values[ok] = np.array(
+            [t for t, good in zip(tokens, ok) if good], dtype=np.float32
+        )
+    boxes = values.reshape(-1, 5)
+
+    if len(poly_lines):
+        poly_boxes = np.full((len(poly_lines), 5), np.nan, dtype=np.float32)
+        for row, i in enumerate(poly_lines.tolist()):
+            if all(map(_NUMBER.fullmatch, fields[i])):
+                pts = np.array(fields[i][1:], dtype=np.float32).reshape(-1, 2)
+                lo, hi = pts.min(axis=0), pts.max(axis=0)
+                poly_boxes[row] = (float(fields[i][0]), *((lo + hi) / 2), *(hi - lo))
+        boxes = np.concatenate([boxes, poly_boxes])
+        line_idx = np.concatenate([box_lines, poly_lines])
+        order = np.argsort(line_idx, kind="stable")
+        boxes, line_idx = boxes[order], line_idx[order]
+    else:
+        line_idx = box_lines
+
+    cls = boxes[:, 0]
+    valid = (
+        np.isfinite(boxes).all(axis=1)
+        & (cls >= 0) & (cls == np.floor(cls))
+        & (boxes[:, 1:] >= 0).all(axis=1) & (boxes[:, 1:] <= 1).all(axis=1)
+    )
+    bad.append(line_idx[~valid])
+    bad_lines = np.sort(np.concatenate(bad))
+    return np.ascontiguousarray(boxes[valid]), line_idx[valid], bad_lines
+
+def _read_text(label_path: str) -> str:
+    try:
+        with open(label_path, "r") as f:
+            return f.read()
+    except Exception as e:                  # file missing / unreadable
+        print(f"Error reading {label_path}: {e}")
+        return ""
+
+def read_label_file(label_path: str) -> tuple:
+    """
+    Load a YOLO label file into a ``float32`` array.
+
+    Parameters
+    ----------
+    label_path : str
+        Path to a `.txt` file whose lines follow the YOLO format:
+        ``<class_id> x_center y_center width height``
+
+    Returns
+    -------
+    tuple[numpy.ndarray, list[int]]
+        ``(n, 5)`` ``float32`` rows of ``class, cx, cy, w, h`` (use
+        ``boxes.view(LABEL_DTYPE)`` for named fields), and the 1-based
+        numbers of the lines that were skipped as malformed.
+    """
+    boxes, _, bad = _parse_lines(_read_text(label_path).splitlines())
+    return boxes, (bad + 1).tolist()
+
+def read_label_files(label_paths: list[str]) -> tuple:
+    """
+    Load a batch of YOLO label files with a single parse.
+
+    Parameters
+    ----------
+    label_paths : list[str]
+        Label files to read.
+
+    Returns
+    -------
+    tuple[numpy.ndarray, numpy.ndarray, dict]
+        Concatenated ``(n, 5)`` ``float32`` boxes; ``(len(label_paths) + 1,)``
+        offsets so that file ``i`` owns ``boxes[offsets[i]:offsets[i + 1]]``;
+        and ``path -> malformed line numbers`` for files with bad rows.
+    """
+    lines = []
+    line_starts = np.zeros(len(label_paths) + 1, dtype=np.int64)
+    for i, path in enumerate(label_paths):
+        lines.extend(_read_text(path).splitlines())
+        line_starts[i + 1] = len(lines)
+    boxes, line_idx, bad_idx = _parse_lines(lines)
+
+    offsets = np.searchsorted(line_idx, line_starts).astype(np.int64)
+    malformed = {}
+    bad_file = np.searchsorted(line_starts, bad_idx, side="right") - 1
+    for f, i in zip(bad_file.tolist(), bad_idx.tolist()):
+        malformed.setdefault(label_paths[f], []).append(i - int(line_starts[f]) + 1)
+    return boxes, offsets, malformed
+
+def count_classes_in_label_file(label_path: str) -> Counter:
+    """
+    Count how many instances of each class index appear in a YOLO label file.
+
+    Parameters
+    ----------
+    label_path : str
+        Path to a `.txt` file whose lines follow the YOLO format:
+        ``<class_id> x_center y_center width height``
+
+    Returns
+    -------
+    collections.Counter
+        Mapping ``class_id -> instance_count``. Malformed rows are reported
+        and left out.
+    """
+    boxes, bad_lines = read_label_file(label_path)
+    if bad_lines:
+        print(f"Skipping malformed lines in {label_path}: {bad_lines}")
+    ids, n = np.unique(boxes[:, 0].astype(np.int64), return_counts=True)
+    return Counter(dict(zip(ids.tolist(), n.tolist())))
+
+class LabelTable:
+    """
+    Per-image class histogram and boxes for a folder of YOLO label files.
+
+    Row ``i`` of :attr:`counts` holds the instance count of every class id in
+    the label file ``names[i] + ".txt"``; its boxes are
+    ``boxes[offsets[i]:offsets[i + 1]]``.
+
+    Parameters
+    ----------
+    names : list[str]
+        Label file stems (the image filename without extension).
+    counts : numpy.ndarray
+        ``(len(names), num_classes)`` ``int32`` histogram.
+    boxes : numpy.ndarray, optional
+        ``(num_boxes, 5)`` ``float32`` rows of ``class, cx, cy, w, h``.
+    offsets : numpy.ndarray, optional
+        ``(len(names) + 1,)`` ``int64`` start of each file's rows in *boxes*.
+    """
+
+    def __init__(self, names: list[str], counts: np.ndarray,
+                 boxes: np.ndarray = None, offsets: np.ndarray = None):
+        self.names = list(names)
+        self.counts = counts
+        if boxes is None:
+            boxes = np.zeros((0, 5), dtype=np.float32)
+            offsets = np.zeros(len(self.names) + 1, dtype=np.int64)
+        self.boxes = boxes
+        self.offsets = offsets
+        self._rows = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._rows
+
+    @property
+    def num_classes(self) -> int:
+        return self.counts.shape[1]
+
+    def row(self, name: str) -> np.ndarray:
+        """Class histogram of the label file with stem *name*."""
+        return self.counts[self._rows[name]]
+
+    def classes(self, name: str) -> list[int]:
+        """Class ids present in the label file with stem *name*."""
+        return np.flatnonzero(self.row(name)).tolist()
+
+    def boxes_for(self, name: str) -> np.ndarray:
+        """``(n, 5)`` view of the boxes in the label file with stem *name*."""
+        i = self._rows[name]
+        return self.boxes[self.offsets[i]:self.offsets[i + 1]]
+
+    def presence(self, names: list[str]) -> np.ndarray:
+        """
+        ``(len(names), C)`` boolean matrix, True where the label file with
+        each stem contains the class.
+        """
+        return self.counts[[self._rows[n] for n in names]] > 0
+
+    def class_totals(self, names: list[str] = None) -> Counter:
+        """
+        Total instances per class, over *names* or over the whole table.
+        """
+        if names is None:
+            totals = self.counts.sum(axis=0)
+        else:
+            rows = [self._rows[n] for n in names if n in self._rows]
+            totals = self.counts[rows].sum(axis=0)
+        return Counter({cid: int(n) for cid, n in enumerate(totals) if n})
+
+INDEX_VERSION = 2
+
+def default_index_path(labels_dir: str) -> str:
+    """
+    Location of the persistent index for *labels_dir*: a sibling
+    ``<labels_dir>.index.npz`` file (``raw_labels/`` -> ``raw_labels.index.npz``).
+    """
+    return os.path.normpath(labels_dir) + ".index.npz"
+
+def _list_label_files(labels_dir: str) -> tuple:
+    """Sorted stems, paths, mtimes (ns) and sizes of the ``.txt`` files."""
+    found = []
+    with os.scandir(labels_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(".txt") and entry.is_file():
+                st = entry.stat()
+                found.append((entry.name[:-4], entry.path, st.st_mtime_ns, st.st_size))
+    found.sort()
+    names = [f[0] for f in found]
+    paths = [f[1] for f in found]
+    mtimes = np.array([f[2] for f in found], dtype=np.int64)
+    sizes = np.array([f[3] for f in found], dtype=np.int64)
+    return names, paths, mtimes, sizes
+
+def _read_batch(label_paths: list[str]) -> list:
+    boxes, offsets, malformed = read_label_files(label_paths)
+    for path, bad_lines in malformed.items():
+        print(f"Skipping malformed lines in {path}: {bad_lines}")
+    return [boxes[offsets[i]:offsets[i + 1]] for i in range(len(label_paths))]
+
+def _parse_many(paths: list[str], workers: int, use_processes: bool,
+                chunksize: int) -> list:
+    """Box array of every file in *paths*."""
+    if workers == 1 or len(paths) <= chunksize:
+        return _read_batch(paths)
+    chunks = [paths[i:i + chunksize] for i in range(0, len(paths), chunksize)]
+    executor = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor(max_workers=workers) as pool:
+        return [b for batch in pool.map(_read_batch, chunks) for b in batch]
+
+def _load_index(index_path: str):
+    """Load a saved index, or ``None`` if it is missing or unreadable."""
+    if not os.path.exists(index_path):
+        return None
+    try:
+        with np.load(index_path, allow_pickle=False) as data:
+            if int(data["version"]) != INDEX_VERSION:
+                return None
+            return {key: data[key] for key in data.files}
+    except Exception as e:                  # truncated / foreign file
+        print(f"Ignoring unreadable label index {index_path}: {e}")
+        return None
+
+def _save_index(index_path: str, table: LabelTable, mtimes: np.ndarray,
+                sizes: np.ndarray) -> None:
+    tmp_path = index_path + ".tmp.npz"
+    np.savez(
+        tmp_path,
+        version=np.int64(INDEX_VERSION),
+        names=np.array(table.names, dtype=str),
+        mtimes=mtimes,
+        sizes=sizes,
+        counts=table.counts,
+        boxes=table.boxes,
+        offsets=table.offsets,
+    )
+    os.replace(tmp_path, index_path)    # never leave a half-written index
+
+def scan_labels(labels_dir: str, workers: int = None, use_processes: bool = False,
+                chunksize: int = 64, cache=False) -> LabelTable:
+    """
+    Read every ``.txt`` label in *labels_dir* in parallel.
+
+    Parameters
+    ----------
+    labels_dir : str
+        Folder of YOLO label files.
+    workers : int, optional
+        Pool size. ``1`` reads serially; ``None`` uses the executor default.
+    use_processes : bool
+        Parse in a process pool instead of a thread pool. Threads suit
+        I/O-bound network mounts, processes suit very large label files.
+    chunksize : int
+        Files parsed together per pool task.
+    cache : bool or str
+        Keep a persistent index of the parsed labels, keyed by file name,
+        mtime and size, so only new or changed files are re-parsed. ``True``
+        stores it at :func:`default_index_path`; a string gives the path.
+
+    Returns
+    -------
+    LabelTable
+        Class histogram and boxes per label file, sorted by filename.
+    """
+    names, paths, mtimes, sizes = _list_label_files(labels_dir)
+    index_path = None
+    saved = None
+    if cache:
+        index_path = default_index_path(labels_dir) if cache is True else cache
+        saved = _load_index(index_path)
+
+    if (saved is not None and len(saved["names"]) == len(names)
+            and np.array_equal(saved["mtimes"], mtimes)
+            and np.array_equal(saved["sizes"], sizes)
+            and saved["names"].tolist() == names):
+        return LabelTable(names, saved["counts"], saved["boxes"], saved["offsets"])
+
+    # Reuse every saved entry whose mtime and size still match.
+    reuse = np.full(len(names), -1, dtype=np.int64)
+    if saved is not None:
+        saved_rows = {name: i for i, name in enumerate(saved["names"].tolist())}
+        for i, name in enumerate(names):
+            j = saved_rows.get(name)
+            if (j is not None and saved["mtimes"][j] == mtimes[i]
+                    and saved["sizes"][j] == sizes[i]):
+                reuse[i] = j
+    stale = np.flatnonzero(reuse < 0)
+    parsed = dict(zip(stale.tolist(),
+                      _parse_many([paths[i] for i in stale], workers,
+                                  use_processes, chunksize)))
+
+    num_classes = 1 + int(max((b[:, 0].max() for b in parsed.values() if len(b)),
+                              default=-1))
+    if saved is not None:
+        num_classes = max(num_classes, saved["counts"].shape[1])
+    counts = np.zeros((len(names), num_classes), dtype=np.int32)
+    box_chunks = []
+    for i in range(len(names)):
+        j = reuse[i]
+        if j >= 0:
+            saved_counts = saved["counts"][j]
+            counts[i, :len(saved_counts)] = saved_counts
+            box_chunks.append(
+                saved["boxes"][saved["offsets"][j] : saved["offsets"][j + 1]]
+            )
+        else:
+            file_boxes = parsed[i]
+            counts[i] = np.bincount(file_boxes[:, 0].astype(np.int64),
+                                    minlength=num_classes)
+            box_chunks.append(file_boxes)
+    offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in box_chunks])
+    boxes = (np.concatenate(box_chunks) if box_chunks
+             else np.zeros((0, 5), dtype=np.float32))
+    table = LabelTable(names, counts, boxes, offsets)
+
+    if index_path is not None:
+        if saved is not None:
+            print(f"Label index: re-parsed {len(stale)} of {len(names)} files")
+        _save_index(index_path, table, mtimes, sizes)
+    return table
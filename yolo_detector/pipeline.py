@@ -0,0 +1,207 @@
+"""
+Three-stage executor that overlaps image decoding, inference and writing.
+"""
+
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_DONE = object()
+
+class _StageTimer:
+    """Thread-safe item count and busy time of one pipeline stage."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items: int, seconds: float) -> None:
+        with self._lock:
+            self.items += items
+            self.busy += seconds
+
+    def as_dict(self) -> dict:
+        return {'items': self.items, 'busy_s': self.busy, 'workers': self.workers}
+
+class _DepthSampler:
+    """Running mean and max of a queue's depth."""
+
+    def __init__(self, q: queue.Queue):
+        self.q = q
+        self.samples = 0
+        self.total = 0
+        self.max = 0
+
+    def sample(self) -> None:
+        depth = self.q.qsize()
+        self.samples += 1
+        self.total += depth
+        self.max = max(self.max, depth)
+
+    def as_dict(self) -> dict:
+        mean = self.total / self.samples if self.samples else 0.0
+        return {'mean_depth': mean, 'max_depth': self.max, 'capacity': self.q.maxsize}
+
+def run_pipeline(items, decode, infer, write, batch_size: int = 1,
+                 decode_workers: int = 2, write_workers: int = 2,
+                 queue_size: int = 8) -> dict:
+    """
+    Run ``decode -> infer -> write`` with the stages overlapping.
+
+    Decoding runs on a thread pool, inference on the calling thread in
+    batches, and writing on its own threads. The stages are connected by
+    queues of *queue_size* entries, so at most a few pages are held in
+    memory whatever the number of *items*.
+
+    Args:
+        items: Iterable of work items (e.g. image paths)
+        decode: ``decode(item) -> payload``; returning None skips the item
+        infer: ``infer(items, payloads) -> outputs``, one output per item
+        write: ``write(item, payload, output)``
+        batch_size: Items per ``infer`` call
+        decode_workers: Decoder threads
+        write_workers: Writer threads
+        queue_size: Capacity of the decode->infer and infer->write queues
+
+    Returns:
+        Per-stage statistics: ``decode``/``infer``/``write`` with item count,
+        busy seconds and worker count; ``decode_queue``/``write_queue`` with
+        mean and max depth; total ``wall_s`` and the ``bottleneck`` stage
+    """
+    timers = {
+        'decode': _StageTimer(decode_workers),
+        'infer': _StageTimer(1),
+        'write': _StageTimer(write_workers),
+    }
+    decoded = queue.Queue(maxsize=queue_size)
+    to_write = queue.Queue(maxsize=queue_size)
+    decoded_depth = _DepthSampler(decoded)
+    write_depth = _DepthSampler(to_write)
+    stop = threading.Event()
+    errors = []
+
+    def timed_decode(item):
+        start = time.perf_counter()
+        payload = decode(item)
+        timers['decode'].add(1, time.perf_counter() - start)
+        return payload
+
+    def put(q, entry):
+        # Give up when the pipeline is shutting down instead of blocking forever.
+        while not stop.is_set():
+            try:
+                q.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(q):
+        # None once the pipeline is shutting down, e.g. after a writer failed
+        # while the feeder had nothing left to put.
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def feed(pool):
+        try:
+            for item in items:
+                if not put(decoded, (item, pool.submit(timed_decode, item))):
+                    return
+        except Exception as e:
+            errors.append(e)
+        put(decoded, _DONE)
+
+    def drain():
+        while True:
+            entry = to_write.get()
+            if entry is _DONE:
+                return
+            if stop.is_set():
+                continue            # failing: discard what is left
+            item, payload, output = entry
+            start = time.perf_counter()
+            try:
+                write(item, payload, output)
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+            timers['write'].add(1, time.perf_counter() - start)
+
+    def flush(batch_items, batch_payloads):
+        start = time.perf_counter()
+        outputs = infer(batch_items, batch_payloads)
+        timers['infer'].add(len(batch_items), time.perf_counter() - start)
+        for entry in zip(batch_items, batch_payloads, outputs):
+            write_depth.sample()
+            if not put(to_write, entry):
+                return
+
+    wall_start = time.perf_counter()
+    writers = [
+        threading.Thread(target=drain, daemon=True) for _ in range(write_workers)
+    ]
+    for w in writers:
+        w.start()
+    with ThreadPoolExecutor(max_workers=decode_workers) as pool:
+        feeder = threading.Thread(target=feed, args=(pool,), daemon=True)
+        feeder.start()
+        batch_items, batch_payloads = [], []
+        try:
+            while not stop.is_set():
+                decoded_depth.sample()
+                entry = get(decoded)
+                if entry is None or entry is _DONE:
+                    break
+                item, future = entry
+                payload = future.result()
+                if payload is None:
+                    continue
+                batch_items.append(item)
+                batch_payloads.append(payload)
+                if len(batch_items) == batch_size:
+                    flush(batch_items, batch_payloads)
+                    batch_items, batch_payloads = [], []
+            if batch_items and not stop.is_set():
+                flush(batch_items, batch_payloads)
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            for _ in writers:
+                to_write.put(_DONE)
+            for w in writers:
+                w.join()
+            stop.set()
+            feeder.join()
+    if errors:
+        raise errors[0]
+
+    stats = {name: timer.as_dict() for name, timer in timers.items()}
+    stats['decode_queue'] = decoded_depth.as_dict()
+    stats['write_queue'] = write_depth.as_dict()
+    stats['wall_s'] = time.perf_counter() - wall_start
+    stats['bottleneck'] = max(timers, key=lambda n: timers[n].busy / timers[n].workers)
+    return stats
+
+def print_pipeline_stats(stats: dict) -> None:
+    """
+    Print the per-stage timing and queue depth returned by :func:`run_pipeline`.
+    """
+    print(f"\nPipeline finished in {stats['wall_s']:.2f}s")
+    for name in ('decode', 'infer', 'write'):
+        stage = stats[name]
+        per_item = stage['busy_s'] / stage['items'] * 1e3 if stage['items'] else 0.0
+        print(f"  {name:<6} {stage['items']:>6} items  {stage['busy_s']:7.2f}s busy  "
+              f"{per_item:7.1f}ms/item  x{stage['workers']} workers")
+    for name in ('decode_queue', 'write_queue'):
+        q = stats[name]
+        print(f"  {name:<12} mean depth {q['mean_depth']:.1f}, "
+              f"max {q['max_depth']}/{q['capacity']}")
+    print(f"  Bottleneck: {stats['bottleneck']}")
@@ -2,52 +2,610 @@
 Post-processing functions for YOLO model predictions.
 """
 
-def apply_post_processing_rules(results):
+import numpy as np
+from .detections import Detections
+
+def _to_numpy(values) -> np.ndarray:
+    """Move a torch tensor (any device) or array-like to a NumPy array."""
+    if hasattr(values, "cpu"):
+        values = values.cpu().numpy()
+    return np.asarray(values)
+
+# Class mapping
+CLASS_NAMES = {
+    0: "bubble",
+    1: "narration",
+    2: "other",
+    3: "text",
+    4: "ui"
+}
+
+# The manga layout rules, in the spec format read by compile_rules
+DEFAULT_RULES = {
+    "rules": [
+        {   # almost-square speech bubble -> narration
+            "name": "square_bubble_to_narration",
+            "when": {"cls": ["bubble"], "aspect": {"gt": 0.9, "lt": 1.1},
+                     "conf": {"lt": 0.9}},
+            "set_cls": "narration",
+        },
+        {   # extra-wide rectangle -> text
+            "name": "wide_box_to_text",
+            "when": {"cls_not": ["text"], "aspect": {"gt": 3.0}, "conf": {"lt": 0.85}},
+            "set_cls": "text",
+        },
+    ]
+}
+
+RULE_FEATURES = ("conf", "width", "height", "aspect", "area")
+_RULE_OPS = {
+    "gt": np.greater,
+    "ge": np.greater_equal,
+    "lt": np.less,
+    "le": np.less_equal,
+}
+
+class RuleSet:
+    """
+    Relabelling and filtering rules compiled from a declarative spec.
+
+    Each rule keeps the class ids it applies to (or skips) and a list of
+    ``(feature, ufunc, threshold)`` comparisons, so running it is a handful
+    of whole-array operations whatever the number of boxes.
+    Use :func:`compile_rules` to build one.
+    """
+
+    def __init__(self, rules: list):
+        self.rules = rules
+        self.drops = any(rule["drop"] for rule in rules)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def apply(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray) -> tuple:
+        """
+        Run the rules in order over arrays of boxes.
+
+        Later rules see the classes set by earlier ones; dropped boxes are
+        ignored by later rules.
+
+        Parameters
+        ----------
+        xyxy : numpy.ndarray
+            ``(n, 4)`` corner boxes.
+        conf : numpy.ndarray
+            ``(n,)`` confidences.
+        cls : numpy.ndarray
+            ``(n,)`` ``int64`` class ids.
+
+        Returns
+        -------
+        tuple
+            ``(cls, keep)``: relabelled class ids and ``(n,)`` boolean
+            mask of the boxes no rule dropped.
+        """
+        # Features are compared in float64, like the Python floats of the
+        # original per-box rules, so boxes on a threshold go the same way
+        xyxy = xyxy.astype(np.float64)
+        width = xyxy[:, 2] - xyxy[:, 0]
+        height = xyxy[:, 3] - xyxy[:, 1]
+        features = {
+            "conf": conf.astype(np.float64),
+            "width": width,
+            "height": height,
+            "aspect": np.divide(
+                width, height, out=np.zeros_like(width), where=height != 0
+            ),
+        }
+        if any(f == "area" for rule in self.rules for f, _, _ in rule["tests"]):
+            features["area"] = width * height
+        keep = np.ones(len(conf), dtype=bool)
+        relabelled = False
+        for rule in self.rules:
+            # Conditions are ANDed in place into the first mask computed
+            mask = None
+            if rule["classes"] is not None:
+                ids, listed = rule["classes"]
+                for cid in ids:
+                    if listed:
+                        hit = cls == cid
+                        mask = (
+                            hit if mask is None else np.logical_or(mask, hit, out=mask)
+                        )
+                    else:
+                        hit = cls != cid
+                        mask = (
+                            hit if mask is None else np.logical_and(mask, hit, out=mask)
+                        )
+            for feature, op, value in rule["tests"]:
+                hit = op(features[feature], value)
+                mask = hit if mask is None else np.logical_and(mask, hit, out=mask)
+            if mask is None:
+                mask = np.ones(len(conf), dtype=bool)
+            if self.drops:
+                mask &= keep
+            if rule["drop"]:
+                keep &= ~mask
+            else:
+                if not relabelled:
+                    cls = cls.copy()
+                    relabelled = True
+                cls[mask] = rule["set_cls"]
+        return cls, keep
+
+def _class_id(value, names: dict) -> int:
+    if isinstance(value, str):
+        ids = {name: cid for cid, name in names.items()}
+        if value not in ids:
+            raise ValueError(f"Unknown class name {value!r}; known: {sorted(ids)}")
+        return ids[value]
+    if int(value) not in names:
+        raise ValueError(f"Unknown class id {value!r}; known: {sorted(names)}")
+    return int(value)
+
+def compile_rules(spec=None, names: dict = None) -> RuleSet:
+    """
+    Compile a declarative rule spec into vectorized mask operations.
+
+    A spec is a dict, or the path to a YAML file holding one, with a
+    ``rules`` list. Each rule has a ``when`` mapping and one action::
+
+        rules:
+          - name: square_bubble_to_narration
+            when:
+              cls: [bubble]                 # or cls_not: [...]
+              aspect: {gt: 0.9, lt: 1.1}    # gt, ge, lt, le
+              conf: {lt: 0.9}
+            set_cls: narration              # or drop: true
+
+    Conditions can test ``cls``/``cls_not`` (one or a list of class ids or
+    names from *names*) and the features ``conf``, ``width``, ``height``,
+    ``aspect`` (width / height) and ``area``; all conditions of a rule must
+    hold. ``set_cls`` must also be a class of *names*. Rules run in order.
+
+    Parameters
+    ----------
+    spec : dict or str, optional
+        Rule spec or YAML path; :data:`DEFAULT_RULES` if None.
+    names : dict, optional
+        Class id to name mapping used to resolve names; by default
+        :data:`CLASS_NAMES`.
+
+    Returns
+    -------
+    RuleSet
+        Compiled rules, reusable across calls and batches.
+    """
+    if spec is None:
+        spec = DEFAULT_RULES
+    elif isinstance(spec, str):
+        import yaml
+        with open(spec) as f:
+            spec = yaml.safe_load(f) or {}
+    names = CLASS_NAMES if names is None else names
+
+    compiled = []
+    for i, rule in enumerate(spec.get("rules", [])):
+        label = rule.get("name", f"rule {i}")
+        when = dict(rule.get("when", {}))
+        classes = None
+        if "cls" in when and "cls_not" in when:
+            raise ValueError(f"{label}: use either cls or cls_not, not both")
+        for key, include in (("cls", True), ("cls_not", False)):
+            if key in when:
+                values = when.pop(key)
+                if not isinstance(values, (list, tuple)):
+                    values = [values]
+                classes = ([_class_id(c, names) for c in values], include)
+        tests = []
+        for feature, bounds in when.items():
+            if feature not in RULE_FEATURES:
+                raise ValueError(
+                    f"{label}: unknown condition {feature!r}; use cls, cls_not "
+                    f"or one of {RULE_FEATURES}"
+                )
+            if not isinstance(bounds, dict):
+                raise ValueError(f"{label}: {feature} needs comparisons such as "
+                                 f"{{lt: 0.5}}, got {bounds!r}")
+            for op, value in bounds.items():
+                if op not in _RULE_OPS:
+                    raise ValueError(
+                        f"{label}: unknown comparison {op!r} for {feature}; "
+                        f"use one of {sorted(_RULE_OPS)}"
+                    )
+                tests.append((feature, _RULE_OPS[op], float(value)))
+        if rule.get("drop", False) == ("set_cls" in rule):
+            raise ValueError(f"{label}: give exactly one action, set_cls or drop: true")
+        compiled.append({
+            "name": label,
+            "classes": classes,
+            "tests": tests,
+            "drop": bool(rule.get("drop", False)),
+            "set_cls": _class_id(rule["set_cls"], names) if "set_cls" in rule else None,
+        })
+    return RuleSet(compiled)
+
+_DEFAULT_RULESET = compile_rules()
+
+def _as_ruleset(rules) -> RuleSet:
+    if rules is None:
+        return _DEFAULT_RULESET
+    return rules if isinstance(rules, RuleSet) else compile_rules(rules)
+
+def _run_rules(xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray, rules) -> tuple:
+    """:func:`apply_rules` that also returns the mask of kept input boxes."""
+    xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+    conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+    cls = np.asarray(cls).reshape(-1).astype(np.int64, copy=False)
+    cls, keep = _as_ruleset(rules).apply(xyxy, conf, cls)
+
+    # Column-wise stacking is several times faster than strided slices here
+    xywh = np.stack(
+        [xyxy[:, 0], xyxy[:, 1], xyxy[:, 2] - xyxy[:, 0], xyxy[:, 3] - xyxy[:, 1]],
+        axis=1,
+    )
+    if not keep.all():
+        xywh, conf, cls = xywh[keep], conf[keep], cls[keep]
+    return {'xywh': xywh, 'conf': conf, 'cls': cls}, keep
+
+def apply_rules(
+    xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray, rules=None
+) -> dict:
+    """
+    Evaluate the manga layout rules on whole arrays of boxes at once.
+
+    Parameters
+    ----------
+    xyxy : numpy.ndarray
+        ``(n, 4)`` corner boxes ``x1, y1, x2, y2`` in pixels.
+    conf : numpy.ndarray
+        ``(n,)`` confidences.
+    cls : numpy.ndarray
+        ``(n,)`` class ids.
+    rules : RuleSet, dict or str, optional
+        Compiled rules, or a spec or YAML path for :func:`compile_rules`;
+        :data:`DEFAULT_RULES` if None. Compile once when calling in a loop.
+
+    Returns
+    -------
+    dict
+        Struct of arrays: ``xywh`` ``(n, 4)`` ``float32`` with top-left
+        corner and size, ``conf`` ``(n,)`` ``float32`` and ``cls`` ``(n,)``
+        ``int64`` after relabelling, without boxes the rules dropped.
+    """
+    return _run_rules(xyxy, conf, cls, rules)[0]
+
+def box_overlap(a: np.ndarray, b: np.ndarray, metric: str = "iou") -> np.ndarray:
+    """
+    Pairwise overlap of two sets of corner boxes.
+
+    Parameters
+    ----------
+    a : numpy.ndarray
+        ``(n, 4)`` boxes ``x1, y1, x2, y2``.
+    b : numpy.ndarray
+        ``(m, 4)`` boxes ``x1, y1, x2, y2``.
+    metric : str
+        ``"iou"`` for intersection over union, or ``"ios"`` for intersection
+        over the smaller box, which also matches a box cut in two by a tile
+        border with the whole one.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``(n, m)`` ``float32`` overlaps.
+    """
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    ax1, ay1, ax2, ay2 = (a[:, k:k + 1] for k in range(4))
+    bx1, by1, bx2, by2 = b.T
+    # In-place (n, m) steps; a (n, m, 2) intermediate is ~3x slower
+    inter = np.minimum(ax2, bx2)
+    inter -= np.maximum(ax1, bx1)
+    np.maximum(inter, 0, out=inter)
+    ih = np.minimum(ay2, by2)
+    ih -= np.maximum(ay1, by1)
+    np.maximum(ih, 0, out=ih)
+    inter *= ih
+    area_a = (ax2 - ax1) * (ay2 - ay1)
+    area_b = (bx2 - bx1) * (by2 - by1)
+    if metric == "iou":
+        denom = area_a + area_b
+        denom -= inter
+    elif metric == "ios":
+        denom = np.minimum(area_a, area_b)
+    else:
+        raise ValueError(f"metric must be 'iou' or 'ios', got {metric!r}")
+    return np.divide(inter, denom, out=np.zeros_like(inter), where=denom > 0)
+
+def _paired_overlap(a: np.ndarray, b: np.ndarray, metric: str) -> np.ndarray:
+    """Overlap of each box of ``(m, 4)`` *a* with the same row of *b*."""
+    wh = np.minimum(a[:, 2:], b[:, 2:]) - np.maximum(a[:, :2], b[:, :2])
+    inter = np.maximum(wh, 0).prod(axis=1)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    if metric == "iou":
+        denom = area_a + area_b - inter
+    elif metric == "ios":
+        denom = np.minimum(area_a, area_b)
+    else:
+        raise ValueError(f"metric must be 'iou' or 'ios', got {metric!r}")
+    return np.divide(inter, denom, out=np.zeros_like(inter), where=denom > 0)
+
+def _union(xyxy: np.ndarray) -> np.ndarray:
+    """Smallest box enclosing all ``(n, 4)`` corner boxes."""
+    return np.concatenate([xyxy[:, :2].min(axis=0), xyxy[:, 2:].max(axis=0)])
+
+def merge_overlaps(xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray,
+                   threshold: float = 0.5, metric: str = "iou",
+                   fuse: bool = False, pairs=None) -> tuple:
+    """
+    Greedy per-class non-maximum suppression, optionally fusing boxes.
+
+    Boxes are visited by decreasing confidence; each one still standing
+    claims the remaining boxes of its class that overlap it by more than
+    *threshold*. Boxes are indexed by their top edge and only compared
+    with the boxes in the horizontal band they span, so memory grows
+    linearly with the number of boxes on a tall page, not with its square.
+
+    Parameters
+    ----------
+    xyxy : numpy.ndarray
+        ``(n, 4)`` corner boxes ``x1, y1, x2, y2``.
+    conf : numpy.ndarray
+        ``(n,)`` confidences.
+    cls : numpy.ndarray
+        ``(n,)`` class ids.
+    threshold : float
+        Overlap above which a box is claimed.
+    metric : str
+        ``"iou"`` or ``"ios"``, see :func:`box_overlap`.
+    fuse : bool
+        Replace each kept box with the union of the boxes it claimed, so
+        the pieces of an object cut by tile borders become one box, instead
+        of dropping the claimed boxes. The union keeps claiming boxes it
+        overlaps until none is left.
+    pairs : callable, optional
+        ``pairs(a, b)`` gets two equal-length index arrays into the input
+        boxes and returns a boolean mask of the pairs ``(a[k], b[k])`` that
+        may claim each other, e.g. pieces from different tiles; all pairs
+        of a class if None.
+
+    Returns
+    -------
+    tuple
+        ``(xyxy, conf, cls)`` of the kept boxes, by decreasing confidence.
+    """
+    xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+    conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+    cls = np.asarray(cls).reshape(-1)
+    order = np.argsort(-conf, kind="stable")
+    xyxy, conf, cls = xyxy[order], conf[order], cls[order]
+
+    # A box can only overlap boxes whose top edge lies below its own top
+    # edge minus the tallest box height and above its bottom edge
+    by_top = np.argsort(xyxy[:, 1], kind="stable")
+    tops = xyxy[by_top, 1]
+    reach = float((xyxy[:, 3] - xyxy[:, 1]).max()) if len(conf) else 0.0
+
+    def near(boxes):
+        """Flat ``(row, index)`` pairs of *boxes* and the boxes in their band."""
+        lo = np.searchsorted(tops, boxes[:, 1] - reach, side="right")
+        counts = np.searchsorted(tops, boxes[:, 3], side="right") - lo
+        rows = np.repeat(np.arange(len(boxes)), counts)
+        first = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        return rows, by_top[first + np.arange(len(rows))]
+
+    def allowed(a, b):
+        return pairs(order[a], order[b]) if pairs is not None else True
+
+    # Sparse claims: only lower-confidence boxes of the same class are
+    # compared, one band at a time, and kept as per-box index lists
+    rows, cols = near(xyxy)
+    hit = (cols > rows) & (cls[cols] == cls[rows])
+    rows, cols = rows[hit], cols[hit]
+    hit = (_paired_overlap(xyxy[rows], xyxy[cols], metric) > threshold) & allowed(
+        rows, cols
+    )
+    rows, cols = rows[hit], cols[hit]
+    starts = np.searchsorted(rows, np.arange(len(conf) + 1))
+
+    def grow(box, group):
+        """Standing boxes of the group's class claimed by the grown *box*."""
+        _, more = near(box[None])
+        more = more[standing[more] & (cls[more] == cls[group[0]])]
+        more = more[box_overlap(box[None], xyxy[more], metric)[0] > threshold]
+        if pairs is not None and len(more):
+            a, b = np.repeat(group, len(more)), np.tile(more, len(group))
+            more = more[allowed(a, b).reshape(len(group), -1).any(axis=0)]
+        return more
+
+    standing = np.ones(len(conf), dtype=bool)
+    keep = []
+    merged = xyxy.copy()
+    for i in range(len(conf)):
+        if not standing[i]:
+            continue
+        standing[i] = False
+        keep.append(i)
+        more = cols[starts[i]:starts[i + 1]]
+        more = more[standing[more]]
+        standing[more] = False
+        if fuse:
+            group, box = np.array([i]), xyxy[i]
+            # The grown box may now overlap pieces the original one did not
+            while len(more):
+                group = np.concatenate([group, more])
+                box = _union(np.vstack([box[None], xyxy[more]]))
+                more = grow(box, group)
+                standing[more] = False
+            merged[i] = box
+    keep = np.asarray(keep, dtype=np.int64)
+    return (merged if fuse else xyxy)[keep], conf[keep], cls[keep]
+
+# Class ids from highest to lowest priority: where boxes of two classes
+# cover the same region, the container (bubble, narration box) wins over
+# the text relabelled inside it
+CLASS_PRIORITY = (0, 1, 2, 3, 4)
+OVERLAP_MODES = ("suppress", "merge")
+
+def _resolve_page(xywh: np.ndarray, conf: np.ndarray, cls: np.ndarray, threshold: float,
+                  ranks: np.ndarray, mode: str, metric: str) -> tuple:
+    """Kept indices and, in "merge" mode, grown boxes of one page."""
+    order = np.lexsort((-conf, ranks[cls]))
+    xyxy = np.concatenate([xywh[order, :2], xywh[order, :2] + xywh[order, 2:]], axis=1)
+    # over[i, j]: box i outranks box j and overlaps it
+    over = np.triu(box_overlap(xyxy, xyxy, metric) > threshold, 1)
+    keep = np.ones(len(order), dtype=bool)
+    for i in np.flatnonzero(over.any(axis=1)):
+        if keep[i]:
+            keep &= ~over[i]
+
+    if mode == "merge":
+        removed = np.flatnonzero(~keep)
+        # Each removed box joins the highest-ranked kept box overlapping it
+        winners = (over[:, removed] & keep[:, None]).argmax(axis=0)
+        np.minimum.at(xyxy[:, :2], winners, xyxy[removed, :2])
+        np.maximum.at(xyxy[:, 2:], winners, xyxy[removed, 2:])
+        xywh = xywh.copy()
+        xywh[order] = np.concatenate([xyxy[:, :2], xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+    return np.sort(order[keep]), xywh
+
+def suppress_overlaps(detections: Detections, threshold: float = 0.6,
+                      priority: tuple = CLASS_PRIORITY, mode: str = "suppress",
+                      metric: str = "iou") -> Detections:
+    """
+    Resolve boxes of any class that cover the same region of a page.
+
+    Boxes are ranked by class priority, then confidence. Walking that
+    ranking, every box still kept removes the lower-ranked boxes of its
+    page it overlaps by more than *threshold*, as greedy NMS across
+    classes. Overlaps come from one ``(n, n)`` matrix per page and only
+    boxes that overlap something are visited, so 300 boxes take well
+    under a millisecond.
+
+    Parameters
+    ----------
+    detections : Detections
+        Detections of one or more pages; pages are resolved separately.
+    threshold : float
+        Overlap above which the lower-ranked box is resolved.
+    priority : tuple
+        Class ids from highest to lowest priority; classes not listed rank
+        below all listed ones.
+    mode : str
+        ``"suppress"`` drops the lower-ranked boxes; ``"merge"`` also
+        grows each kept box to enclose the boxes it removed.
+    metric : str
+        ``"iou"`` or ``"ios"``, see :func:`box_overlap`.
+
+    Returns
+    -------
+    Detections
+        Kept boxes on the same pages, in their original order.
+    """
+    if mode not in OVERLAP_MODES:
+        raise ValueError(f"mode must be one of {OVERLAP_MODES}, got {mode!r}")
+    if len(detections) < 2:
+        return detections
+    # Rank of every class id, unknown classes last
+    ranks = np.full(256, len(priority), dtype=np.int64)
+    ranks[list(priority)] = np.arange(len(priority))
+
+    xywh = detections.xywh
+    kept = []
+    for index in range(detections.n_pages):
+        part = detections.page_slice(index)
+        if part.stop - part.start < 2:
+            kept.append(np.arange(part.start, part.stop))
+            continue
+        page_kept, page_xywh = _resolve_page(
+            xywh[part],
+            detections.conf[part],
+            detections.cls[part],
+            threshold,
+            ranks,
+            mode,
+            metric,
+        )
+        if mode == "merge":
+            if xywh is detections.xywh:
+                xywh = xywh.copy()
+            xywh[part] = page_xywh
+        kept.append(page_kept + part.start)
+    kept = np.concatenate(kept)
+    return Detections(xywh[kept], detections.conf[kept], detections.cls[kept],
+                      detections.page[kept], detections.n_pages)
+
+def detections_to_dicts(detections: dict) -> list:
+    """
+    Dict view of one image's struct-of-arrays detections.
+
+    Returns
+    -------
+    list[dict]
+        One ``{'x', 'y', 'width', 'height', 'confidence', 'class'}`` dict per
+        box, with plain Python numbers.
+    """
+    xywh = detections['xywh'].tolist()
+    confs = detections['conf'].tolist()
+    classes = detections['cls'].tolist()
+    return [
+        {'x': x, 'y': y, 'width': w, 'height': h, 'confidence': conf, 'class': cls}
+        for (x, y, w, h), conf, cls in zip(xywh, confs, classes)
+    ]
+
+def apply_post_processing_rules(
+    results,
+    as_dicts: bool = False,
+    overlaps: str = None,
+    overlap_threshold: float = 0.6,
+    rules=None,
+):
     """
     Apply rule‑based tweaks to raw YOLO detections for manga bubble layouts.
 
+    The boxes of all images are moved off the device once, concatenated and
+    relabelled with array masks; no per-box tensor access happens.
+
     Parameters
     ----------
     results : list[ultralytics.engine.results.Results]
         Output from ``model(image_path)``.
+    as_dicts : bool
+        Return the legacy list-of-dicts view instead of arrays.
+    overlaps : str or None
+        After relabelling, resolve boxes of any class covering the same
+        region with :func:`suppress_overlaps` in this mode (``"suppress"``
+        or ``"merge"``); None, the default, keeps them all.
+    overlap_threshold : float
+        IoU above which two boxes cover the same region.
+    rules : RuleSet, dict or str, optional
+        Relabelling rules, see :func:`apply_rules`.
 
     Returns
     -------
-    list[list[dict]]
-        Cleaned detections per image.
-    """
-    all_processed = []
-
-    for result in results:
-        processed_results = []
-        boxes = result.boxes.xyxy
-        confs = result.boxes.conf
-        classes = result.boxes.cls
-
-        for box, conf, cls in zip(boxes, confs, classes):
-            x1, y1, x2, y2 = box.tolist()
-            conf = conf.item()
-            cls = int(cls.item())
-
-            width = x2 - x1
-            height = y2 - y1
-            aspect_ratio = width / height if height else 0
-
-            # Rule 1: almost‑square speech bubble → narration
-            if 0.9 < aspect_ratio < 1.1 and cls == 0 and conf < 0.9:
-                cls = 1
-
-            # Rule 2: extra‑wide rectangle → UI element
-            if width / height > 3.0 and cls != 3 and conf < 0.85:
-                cls = 3
-
-            processed_results.append({
-                'x': x1,
-                'y': y1,
-                'width': width,
-                'height': height,
-                'confidence': conf,
-                'class': cls
-            })
-        all_processed.append(processed_results)
-    return all_processed
\ No newline at end of file
+    Detections or list[list[dict]]
+        Cleaned detections with one page per result, or, with *as_dicts*,
+        one dict per box for each image.
+    """
+    results = list(results)
+    xyxy = [_to_numpy(r.boxes.xyxy).reshape(-1, 4) for r in results]
+    confs = [_to_numpy(r.boxes.conf).reshape(-1) for r in results]
+    classes = [_to_numpy(r.boxes.cls).reshape(-1) for r in results]
+    counts = [len(c) for c in confs]
+    if len(results) == 1:
+        merged, keep = _run_rules(xyxy[0], confs[0], classes[0], rules)
+    elif results:
+        merged, keep = _run_rules(np.concatenate(xyxy), np.concatenate(confs),
+                                  np.concatenate(classes), rules)
+    else:
+        merged, keep = _run_rules(np.empty((0, 4)), [], [], rules)
+    page = np.repeat(np.arange(len(results), dtype=np.int32), counts)
+    detections = Detections(merged['xywh'], merged['conf'], merged['cls'], page[keep],
+                            len(results))
+    if overlaps is not None:
+        detections = suppress_overlaps(detections, overlap_threshold, mode=overlaps)
+    if as_dicts:
+        return detections.to_page_dicts()
+    return detections
@@ -0,0 +1,170 @@
+"""
+Named training profiles and detection of the hardware they run on.
+"""
+
+import os
+import shutil
+import yaml
+
+# Settings left as "auto" are filled in by resolve_profile from the machine
+# and the dataset; anything else is passed to model.train unchanged.
+PROFILES = {
+    'auto': {
+        'device': 'auto',
+        'batch': 'auto',
+        'workers': 'auto',
+        'cache': 'auto',
+        'amp': 'auto',
+    },
+    'cpu-debug': {
+        'device': 'cpu',
+        'epochs': 3,
+        'imgsz': 320,
+        'batch': 4,
+        'workers': 'auto',
+        'cache': 'auto',
+        'amp': False,
+        'fraction': 0.1,
+        'plots': False,
+    },
+    'single-gpu-fast': {
+        'device': 0,
+        'batch': -1,        # Ultralytics AutoBatch: ~60% of GPU memory
+        'workers': 'auto',
+        'cache': 'auto',
+        'amp': True,
+    },
+    'multi-gpu': {
+        'device': 'auto',
+        'batch': 'auto',
+        'workers': 'auto',
+        'cache': 'disk',    # RAM caching is duplicated in every DDP process
+        'amp': True,
+    },
+}
+
+# Images per GPU for the DDP batch, where AutoBatch is not available
+DDP_BATCH_PER_GPU = 16
+CPU_BATCH = 4
+
+def load_profile(profile: str = 'auto', overrides: dict = None) -> dict:
+    """
+    Load a training profile by name or from a YAML file.
+
+    A YAML profile may name a built-in one under ``base`` and override
+    some of its settings.
+
+    Args:
+        profile: Name from ``PROFILES`` or path to a YAML file
+        overrides: Settings that take precedence over the profile
+
+    Returns:
+        Dictionary of ``model.train`` settings, possibly holding "auto"
+    """
+    if profile in PROFILES:
+        settings = dict(PROFILES[profile])
+    elif os.path.isfile(profile):
+        with open(profile) as f:
+            custom = yaml.safe_load(f) or {}
+        base = custom.pop('base', 'auto')
+        if base not in PROFILES:
+            raise ValueError(f"Unknown base profile {base!r} in {profile}")
+        settings = {**PROFILES[base], **custom}
+    else:
+        raise ValueError(f"Unknown profile {profile!r}; use one of {sorted(PROFILES)} "
+                         "or a YAML file")
+    settings.update(overrides or {})
+    return settings
+
+def parse_overrides(items: list) -> dict:
+    """
+    Parse ``key=value`` command line overrides, with YAML typed values.
+
+    Args:
+        items: Strings such as ``["batch=8", "cache=disk", "amp=false"]``
+
+    Returns:
+        Dictionary of settings
+    """
+    overrides = {}
+    for item in items or []:
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise ValueError(f"Override {item!r} is not of the form key=value")
+        overrides[key.strip()] = yaml.safe_load(value)
+    return overrides
+
+def gpu_count() -> int:
+    """Number of visible CUDA devices, 0 without CUDA."""
+    import torch
+    return torch.cuda.device_count() if torch.cuda.is_available() else 0
+
+def usable_cpus() -> int:
+    """CPUs this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def choose_cache(n_images: int, imgsz: int, cache_dir: str) -> object:
+    """
+    Image cache that fits: "ram" if the resized images take less than half
+    of the available memory, else "disk" if there is room, else False.
+
+    Args:
+        n_images: Training and validation images
+        imgsz: Training image size; cached images are at most imgsz x imgsz
+        cache_dir: Folder of the dataset, where "disk" caches are written
+
+    Returns:
+        Value for the ``cache`` training argument
+    """
+    import psutil
+    needed = n_images * imgsz * imgsz * 3
+    if needed < psutil.virtual_memory().available // 2:
+        return 'ram'
+    if needed < shutil.disk_usage(cache_dir).free // 2:
+        return 'disk'
+    return False
+
+def resolve_profile(settings: dict, n_images: int, imgsz: int, data_dir: str) -> dict:
+    """
+    Replace the "auto" settings of a profile with values for this machine.
+
+    Args:
+        settings: Profile from :func:`load_profile`
+        n_images: Images the run will load, for the cache decision
+        imgsz: Training image size, unless the profile sets one
+        data_dir: Dataset folder, for the disk cache decision
+
+    Returns:
+        Dictionary of concrete ``model.train`` settings
+    """
+    resolved = dict(settings)
+    gpus = gpu_count()
+    if resolved.get('device') == 'auto':
+        resolved['device'] = 'cpu' if gpus == 0 else (
+            0 if gpus == 1 else ','.join(str(i) for i in range(gpus)))
+    if resolved.get('device') not in ('cpu', 'mps') and gpus == 0:
+        print(
+            f"No CUDA device found for device={resolved.get('device')}, training on CPU"
+        )
+        resolved['device'] = 'cpu'
+        if resolved.get('batch') == -1:
+            resolved['batch'] = 'auto'      # AutoBatch needs a GPU
+    on_cpu = resolved.get('device') == 'cpu'
+    n_devices = 1 if on_cpu else len(str(resolved.get('device')).split(','))
+    if resolved.get('batch') == 'auto':
+        if on_cpu:
+            resolved['batch'] = CPU_BATCH
+        else:
+            resolved['batch'] = -1 if n_devices == 1 else DDP_BATCH_PER_GPU * n_devices
+    if resolved.get('workers') == 'auto':
+        # Ultralytics starts this many loader processes per device
+        resolved['workers'] = max(0, min(8, usable_cpus() // n_devices - 1))
+    if resolved.get('amp') == 'auto' or on_cpu:
+        resolved['amp'] = not on_cpu      # mixed precision needs CUDA
+    if resolved.get('cache') == 'auto':
+        resolved['cache'] = choose_cache(
+            n_images, resolved.get('imgsz', imgsz), data_dir
+        )
+    return resolved
@@ -0,0 +1,148 @@
+"""
+Stratified fold assignment and class-balance reporting on label indexes.
+"""
+
+import numpy as np
+
+def kfold_assign(presence: np.ndarray, k: int, seed: int = 0) -> np.ndarray:
+    """
+    Greedily deal images into *k* folds so each class is spread evenly.
+
+    Images are visited in a seeded random order; each one goes to the fold
+    holding the fewest images of its classes so far (ties go to the
+    smallest fold). Per-fold class counters live in one ``(k, C)`` array,
+    so the pass is O(N·C).
+
+    Parameters
+    ----------
+    presence : numpy.ndarray
+        ``(n, C)`` boolean matrix, True where an image contains a class.
+    k : int
+        Number of folds, at least 2.
+    seed : int
+        Seed of the visiting order.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``(n,)`` fold index of every image.
+    """
+    if k < 2:
+        raise ValueError(f"k must be at least 2, got {k}")
+    presence = np.asarray(presence, dtype=bool)
+    n = len(presence)
+    fold_classes = np.zeros((k, presence.shape[1]), dtype=np.int64)
+    fold_sizes = np.zeros(k, dtype=np.int64)
+    folds = np.empty(n, dtype=np.int64)
+    order = np.random.default_rng(seed).permutation(n)
+    class_lists = [np.flatnonzero(row) for row in presence[order]]
+    for i, classes in zip(order, class_lists):
+        # Fewest images of these classes first, then fewest images overall
+        load = fold_classes[:, classes].sum(axis=1) * n + fold_sizes
+        fold = int(load.argmin())
+        folds[i] = fold
+        fold_classes[fold, classes] += 1
+        fold_sizes[fold] += 1
+    return folds
+
+def split_balance(presence: np.ndarray, val_mask: np.ndarray, target: float) -> dict:
+    """
+    How far each class's validation share is from *target*.
+
+    Parameters
+    ----------
+    presence : numpy.ndarray
+        ``(n, C)`` boolean matrix, True where an image contains a class.
+    val_mask : numpy.ndarray
+        ``(n,)`` boolean, True for validation images.
+    target : float
+        Wanted fraction of each class's images in validation.
+
+    Returns
+    -------
+    dict
+        ``val_share``: ``(C,)`` fraction of the images containing each class
+        that are in validation (NaN for absent classes); ``error``:
+        ``val_share - target``; ``max_error``: largest absolute error over
+        the present classes.
+    """
+    presence = np.asarray(presence, dtype=bool)
+    val_mask = np.asarray(val_mask, dtype=bool)
+    totals = presence.sum(axis=0)
+    in_val = presence[val_mask].sum(axis=0)
+    val_share = np.divide(in_val, totals, out=np.full(totals.shape, np.nan),
+                          where=totals > 0)
+    error = val_share - target
+    present = totals > 0
+    max_error = float(np.abs(error[present]).max()) if present.any() else 0.0
+    return {"val_share": val_share, "error": error, "max_error": max_error}
+
+def iterative_stratify(presence: np.ndarray, ratios, seed: int = 0,
+                       assigned: np.ndarray = None) -> np.ndarray:
+    """
+    Multi-label iterative stratification (Sechidis et al., 2011).
+
+    The rarest class still to place goes first: each of its images joins
+    the subset that most lacks that class, with ties broken by the subset
+    that most lacks images overall, then at random. Wanted counts are kept
+    in ``(k, C)`` NumPy arrays, so rare classes such as ``other`` and ``ui``
+    land as close to *ratios* as the data allows, in O(N·C).
+
+    Parameters
+    ----------
+    presence : numpy.ndarray
+        ``(n, C)`` boolean matrix, True where an image contains a class.
+    ratios : sequence of float
+        Wanted fraction of the images in each of the ``k`` subsets, e.g.
+        ``(0.8, 0.2)`` for train/val or ``[1 / k] * k`` for folds.
+    seed : int
+        Seed of the visiting order and tie-breaks.
+    assigned : numpy.ndarray, optional
+        ``(n,)`` subset index of images that already have one, -1 for the
+        rest. Those keep their subset and count towards the targets.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``(n,)`` subset index of every image.
+    """
+    presence = np.asarray(presence, dtype=bool)
+    ratios = np.asarray(ratios, dtype=np.float64)
+    ratios = ratios / ratios.sum()
+    n, k = len(presence), len(ratios)
+    rng = np.random.default_rng(seed)
+
+    subset = np.full(n, -1, dtype=np.int64) if assigned is None else np.array(assigned)
+    wanted_classes = ratios[:, None] * presence.sum(axis=0)[None, :]
+    wanted_size = ratios * n
+    for j in range(k):
+        in_j = subset == j
+        wanted_classes[j] -= presence[in_j].sum(axis=0)
+        wanted_size[j] -= in_j.sum()
+
+    pending = rng.permutation(n)
+    pending = pending[subset[pending] < 0]
+    remaining = presence[pending].sum(axis=0)
+
+    def place(i: int, scores: np.ndarray) -> None:
+        best = np.flatnonzero(scores == scores.max())
+        if len(best) > 1:
+            sizes = wanted_size[best]
+            best = best[sizes == sizes.max()]
+        j = best[0] if len(best) == 1 else best[rng.integers(len(best))]
+        classes = presence[i]
+        subset[i] = j
+        wanted_classes[j, classes] -= 1
+        wanted_size[j] -= 1
+        remaining[classes] -= 1
+
+    while remaining.any():
+        rarest = int(
+            np.where(remaining > 0, remaining, np.iinfo(remaining.dtype).max).argmin()
+        )
+        for i in pending[presence[pending, rarest]]:
+            place(i, wanted_classes[:, rarest])
+        pending = pending[subset[pending] < 0]
+    for i in pending:                       # images without any box
+        place(i, wanted_size)
+    return subset
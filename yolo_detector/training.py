@@ -4,8 +4,15 @@ Functions for training the YOLO model.
 
 import os
 import yaml
+import numpy as np
 from collections import Counter
 from ultralytics import YOLO
+from .data_utils import split_image_paths, split_source, yolo_label_path
+from .image_cache import build_resized_cache
+from .labels import scan_labels
+from .profiles import load_profile, resolve_profile
+
+SAMPLING_MODES = ("none", "repeat")
 
 def compute_class_weights(class_counts: Counter) -> dict:
     """
@@ -21,21 +28,30 @@ def compute_class_weights(class_counts: Counter) -> dict:
     return {class_id: total / (len(class_counts) * count) 
             for class_id, count in class_counts.items()}
 
-def write_data_yaml(base_dir: str, class_weights: dict) -> str:
+def write_data_yaml(base_dir: str, class_weights: dict, train: str = None,
+                    val: str = None) -> str:
     """
     Write the data YAML file for YOLO training.
     
     Args:
         base_dir: Base directory containing the dataset
-        class_weights: Dictionary of class weights
+        class_weights: Dictionary of class weights, stored for reference;
+            Ultralytics does not read them, use ``train_model(sampling="repeat")``
+            to rebalance classes
+        train: Training images, as a directory or a list file of image
+            paths, relative to *base_dir*; found with :func:`split_source`
+            when not given
+        val: Validation images, same forms as *train*
         
     Returns:
         Path to the created YAML file
     """
+    train = train or split_source(base_dir, "train")
+    val = val or split_source(base_dir, "val")
     data_yaml = {
         'path': os.path.abspath(base_dir),
-        'train': 'images/train',
-        'val': 'images/val',
+        'train': train,
+        'val': val,
         'names': {
             0: "bubble",
             1: "narration",
@@ -52,17 +68,158 @@ def write_data_yaml(base_dir: str, class_weights: dict) -> str:
     
     return yaml_path
 
-def train_model(run_name: str, data_yaml_path: str) -> str:
+def label_histograms(image_paths: list, workers: int = None) -> np.ndarray:
+    """
+    Per-image class histograms from the cached label index.
+    
+    Images are grouped by the label folder Ultralytics reads for them, and
+    each folder is scanned once through :func:`scan_labels` with its
+    persistent index, so unchanged labels are never parsed again.
+    
+    Args:
+        image_paths: Image paths, e.g. from :func:`split_image_paths`
+        workers: Threads used to read label files that changed
+        
+    Returns:
+        ``(len(image_paths), C)`` instance counts; rows of images without a
+        label file are zero
+    """
+    rows_by_dir = {}
+    for i, img_path in enumerate(image_paths):
+        label_path = yolo_label_path(img_path)
+        stem = os.path.splitext(os.path.basename(label_path))[0]
+        rows_by_dir.setdefault(os.path.dirname(label_path), []).append((i, stem))
+    tables = {d: scan_labels(d, workers=workers, cache=True) for d in rows_by_dir}
+    num_classes = max((t.num_classes for t in tables.values()), default=0)
+    counts = np.zeros((len(image_paths), num_classes), dtype=np.int64)
+    for labels_dir, rows in rows_by_dir.items():
+        table = tables[labels_dir]
+        for i, stem in rows:
+            if stem in table:
+                row = table.row(stem)
+                counts[i, :len(row)] = row
+    return counts
+
+def split_class_counts(base_dir: str, split: str, workers: int = None) -> Counter:
+    """
+    Count label instances of a split, prepared either as a directory tree
+    or as a list file of image paths.
+    
+    Args:
+        base_dir: Base directory containing the dataset
+        split: Split name, e.g. 'train'
+        workers: Threads used to read label files that changed
+        
+    Returns:
+        Counter mapping class IDs to instance counts
+    """
+    paths = split_image_paths(base_dir, split_source(base_dir, split))
+    totals = label_histograms(paths, workers).sum(axis=0)
+    return Counter({cid: int(n) for cid, n in enumerate(totals) if n})
+
+def repeat_factors(presence: np.ndarray, threshold: float = 0.1) -> np.ndarray:
+    """
+    Repeat-factor sampling weights (Gupta et al., LVIS, 2019).
+    
+    A class seen in a fraction ``f`` of the images gets
+    ``max(1, sqrt(threshold / f))``; each image repeats as often as its
+    rarest class asks.
+    
+    Args:
+        presence: ``(n, C)`` boolean, True where an image contains a class
+        threshold: Image frequency below which a class is oversampled
+        
+    Returns:
+        ``(n,)`` repeat factor of every image, at least 1
+    """
+    presence = np.asarray(presence, dtype=bool)
+    freq = presence.mean(axis=0) if len(presence) else np.zeros(presence.shape[1])
+    class_factor = np.maximum(1.0, np.sqrt(threshold / np.maximum(freq, 1e-12)))
+    return np.where(presence, class_factor, 1.0).max(axis=1, initial=1.0)
+
+def write_repeat_factor_yaml(
+    data_yaml_path: str, threshold: float = 0.1, seed: int = 42, workers: int = None
+) -> str:
+    """
+    Derive a data YAML whose training list repeats images of rare classes.
+    
+    Ultralytics samples each list entry once per epoch, so writing an image
+    ``k`` times is a repeat-factor sampler that needs no dataloader changes.
+    Fractional factors are rounded up or down at random (seeded), keeping
+    the expected repeat count.
+    
+    Args:
+        data_yaml_path: Data YAML whose ``train`` entry is resampled
+        threshold: See :func:`repeat_factors`
+        seed: Seed of the rounding
+        workers: Threads used to read label files that changed
+        
+    Returns:
+        Path to the new ``<name>_rfs.yaml`` next to *data_yaml_path*
+    """
+    with open(data_yaml_path) as f:
+        data = yaml.safe_load(f)
+    base_dir = data['path']
+    paths = split_image_paths(base_dir, data['train'])
+    presence = label_histograms(paths, workers) > 0
+    factors = repeat_factors(presence, threshold)
+    rng = np.random.default_rng(seed)
+    repeats = np.floor(factors).astype(np.int64)
+    repeats += rng.random(len(factors)) < factors - repeats
+    
+    train_name = os.path.splitext(os.path.basename(os.path.normpath(data['train'])))[0]
+    list_rel = os.path.join('images', f'{train_name}_rfs.txt')
+    with open(os.path.join(base_dir, list_rel), 'w') as f:
+        f.writelines(path + '\n' for path, k in zip(paths, repeats) for _ in range(k))
+    
+    before = presence.sum(axis=0)
+    after = (presence * repeats[:, None]).sum(axis=0)
+    print(
+        f"Repeat-factor sampling: {len(paths)} images -> "
+        f"{int(repeats.sum())} entries per epoch"
+    )
+    for cid, (b, a) in enumerate(zip(before, after)):
+        if b:
+            print(
+                f"  class {cid}: {b / len(paths):6.1%} -> "
+                f"{a / repeats.sum():6.1%} of samples"
+            )
+    
+    data['train'] = list_rel
+    rfs_yaml_path = os.path.splitext(data_yaml_path)[0] + '_rfs.yaml'
+    with open(rfs_yaml_path, 'w') as f:
+        yaml.dump(data, f)
+    return rfs_yaml_path
+
+def train_model(run_name: str, data_yaml_path: str, sampling: str = "none",
+                repeat_threshold: float = 0.1, profile: str = "auto",
+                overrides: dict = None, resize_cache: bool = False) -> str:
     """
     Train a YOLOv8 model on the prepared dataset.
     
     Args:
         run_name: Name of this training run
         data_yaml_path: Path to the data YAML file
+        sampling: "none", or "repeat" to oversample images holding rare
+            classes (see :func:`write_repeat_factor_yaml`)
+        repeat_threshold: Image frequency below which a class is
+            oversampled in "repeat" mode
+        profile: Training profile name (see ``profiles.PROFILES``) or YAML
+            file; "auto" picks device, batch, workers, cache and AMP for
+            this machine
+        overrides: ``model.train`` settings applied on top of the profile
+        resize_cache: Train on a copy of the dataset resized to ``imgsz``
+            (see :func:`image_cache.build_resized_cache`), so images are
+            loaded from ``.npy`` arrays instead of decoded and resized
         
     Returns:
         Path to the best model weights
     """
+    if sampling not in SAMPLING_MODES:
+        raise ValueError(f"sampling must be one of {SAMPLING_MODES}, got {sampling!r}")
+    if sampling == "repeat":
+        data_yaml_path = write_repeat_factor_yaml(data_yaml_path, repeat_threshold)
+    
     # Initialize model
     model = YOLO('yolov8n.pt')
     
@@ -72,13 +229,11 @@ def train_model(run_name: str, data_yaml_path: str) -> str:
         'epochs': 50,
         'imgsz': 512,
         'patience': 15,
-        'batch': 2,  # Reduced batch size
         'cos_lr': True,
         'mixup': 0.1,
         'copy_paste': 0.1,
         'degrees': 10.0,
         'scale': 0.5,
-        'workers': 0,  # Reduced workers
         'project': 'models',  # Save directly in models directory
         'name': run_name,
         'exist_ok': True,
@@ -87,11 +242,26 @@ def train_model(run_name: str, data_yaml_path: str) -> str:
         'verbose': True,
         'seed': 42,
         'deterministic': True,
-        'cache': False,  # Disable caching
-        'amp': False,    # Disable mixed precision
-        'device': 0     # Force GPU
     }
     
+    # Device, batch, workers, cache and AMP come from the profile
+    with open(data_yaml_path) as f:
+        data = yaml.safe_load(f)
+    # Every list entry, repeats included: Ultralytics caches each one separately
+    n_images = sum(len(split_image_paths(data['path'], data[split]))
+                   for split in ('train', 'val'))
+    settings = resolve_profile(load_profile(profile, overrides), n_images,
+                               training_args['imgsz'], data['path'])
+    training_args.update(settings)
+    print(f"Training profile {profile}: " + ", ".join(
+        f"{key}={settings[key]}" for key in sorted(settings)))
+    if resize_cache:
+        training_args['data'] = build_resized_cache(
+            data_yaml_path,
+            training_args['imgsz'],
+            workers=training_args['workers'] or None,
+        )
+    
     # Train the model
     results = model.train(**training_args)
     